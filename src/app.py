@@ -2,12 +2,13 @@ import streamlit as st
 from utils.logger import get_logger
 import requests
 import random
-import time
+import json
 
 # Set up logger
 logger = get_logger(__name__)
 
 API_URL = "http://localhost:5000/api/v1/chatbot/answer"  # Replace with your actual URL
+STREAM_API_URL = "http://localhost:5000/api/v1/chatbot/answer/stream"
 
 # Custom CSS styling
 st.markdown("""
@@ -70,11 +71,30 @@ for message in st.session_state.messages:
         st.markdown(message["content"])
 
 
-def response_generator(response: str):
-
-    for word in response.split():
-        yield word + " "
-        time.sleep(0.05)
+def stream_answer(payload: dict):
+    """Yield answer tokens from the server-sent events of the streaming endpoint."""
+    with requests.post(STREAM_API_URL, json=payload, stream=True) as response:
+        if response.status_code != 200:
+            yield "⚠️ حدث خطأ في الخادم."
+            return
+
+        event = None
+        # chunk_size=None hands over data as soon as it arrives instead of buffering
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line:
+                event = None
+                continue
+
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):].strip())
+                if event == "error" and data.get("partial"):
+                    yield "\n\n⚠️ انقطع الرد قبل اكتماله."
+                elif event == "error":
+                    yield "❌ لم يتم العثور على رد."
+                elif "token" in data:
+                    yield data["token"]
 
 def generate_user_id(length=6):
     return str(random.randint(10**(length-1), 10**length - 1))
@@ -91,26 +111,17 @@ if query:
     with st.chat_message("user"):
         st.markdown(query)
 
-    # Send query to your FastAPI endpoint
-    try:
-        with st.spinner("🧠 Processing..."):
-            response = requests.post(API_URL, json={
+    # Stream the answer from your FastAPI endpoint
+    with st.chat_message("assistant"):
+        try:
+            assistant_reply = st.write_stream(stream_answer({
                 "user_id": user_id,
                 "session_id": session_id,
                 "query": query
-            })
-
-            if response.status_code == 200:
-                data = response.json()
-                assistant_reply = data.get("answer", "❌ لم يتم العثور على رد.")
-            else:
-                assistant_reply = "⚠️ حدث خطأ في الخادم."
-    except Exception as e:
-        assistant_reply = f"❌ خطأ في الاتصال: {e}"
-
-    # Show assistant response
-    with st.chat_message("assistant"):
-        st.write_stream(response_generator(response=assistant_reply))
+            }))
+        except Exception as e:
+            assistant_reply = f"❌ خطأ في الاتصال: {e}"
+            st.markdown(assistant_reply)
 
     # Save display-only chat history
     st.session_state.messages.append({"role": "user", "content": query})
@@ -0,0 +1,135 @@
+from llms.providers.openai_provider import OpenAIProvider
+from utils.call_policy import CircuitBreaker
+from utils.logger import get_logger
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+import numpy as np
+import argparse
+import asyncio
+import random
+import threading
+import time
+import uvicorn
+
+
+logger = get_logger(__name__)
+
+
+def create_stand_in_app(faults: dict, seed: int = 0) -> FastAPI:
+    """An OpenAI-compatible chat completions endpoint with injected latency and errors.
+
+    Most responses take `latency` (a (low, high) range of seconds); `slow_rate` of them take
+    `slow_latency`, `error_rate` of them fail with a 503, and all of them fail while
+    `outage` is set. `faults` may be changed while the server runs.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions():
+        if faults["outage"] or rng.random() < faults["error_rate"]:
+            return JSONResponse(status_code=503,
+                                content={"error": {"message": "injected failure", "type": "server_error"}})
+
+        slow = rng.random() < faults["slow_rate"]
+        await asyncio.sleep(faults["slow_latency"] if slow else rng.uniform(*faults["latency"]))
+        return {
+            "id": "stand-in", "object": "chat.completion", "created": int(time.time()), "model": "stand-in",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "slow" if slow else "fast"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+        }
+
+    return app
+
+
+def start_server(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def run_load(provider: OpenAIProvider, requests: int, concurrency: int) -> dict:
+    """Sends `requests` generations with `concurrency` concurrent callers; returns latency percentiles."""
+    latencies, failures = [], 0
+    remaining = iter(range(requests))
+
+    async def client():
+        nonlocal failures
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                await provider.agenerate_text(prompt="ping", chat_history=[])
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 1),
+        "max_ms": round(float(latencies_ms.max()), 1),
+        "failures": failures,
+    }
+
+
+def create_provider(base_url: str, call_policy: dict = None) -> OpenAIProvider:
+    provider = OpenAIProvider(api_key="stand-in", base_url=base_url, generation_call_policy=call_policy)
+    provider.set_generation_model("stand-in")
+    return provider
+
+
+async def benchmark(base_url: str, faults: dict, requests: int, concurrency: int, timeout: float):
+    policies = {
+        # The SDK's defaults: 60s timeout, 2 retries with its own backoff
+        "sdk_default": None,
+        "timeout_retry": dict(timeout=timeout, max_retries=2, backoff_base=0.05),
+        "timeout_retry_hedge": dict(timeout=timeout, max_retries=2, backoff_base=0.05, hedge=True),
+    }
+
+    for name, call_policy in policies.items():
+        provider = create_provider(base_url, call_policy)
+        await run_load(provider, 100, concurrency)  # warm up, and fill the latency window for hedging
+        result = await run_load(provider, requests, concurrency)
+        logger.info(f"{name:<20} {result}")
+        if provider.generation_policy is not None:
+            logger.info(f"{name:<20} {provider.generation_policy.stats()}")
+        await provider.aclose()
+
+    # During an outage, the circuit breaker fails calls at once instead of retrying each of them
+    faults["outage"] = True
+    for name, breaker in (("outage", None), ("outage_with_breaker", CircuitBreaker(failure_threshold=5))):
+        provider = create_provider(base_url, dict(timeout=timeout, max_retries=2, backoff_base=0.05,
+                                                  circuit_breaker=breaker))
+        result = await run_load(provider, 200, concurrency)
+        logger.info(f"{name:<20} {result} {provider.generation_policy.stats()['circuit_breaker']}")
+        await provider.aclose()
+    faults["outage"] = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare generation call policies against a local stand-in server that injects latency.")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, nargs=2, default=[0.02, 0.06], help="Usual latency range, seconds.")
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=0.5, help="Per-attempt timeout of the policies.")
+    args = parser.parse_args()
+
+    faults = {"latency": tuple(args.latency), "slow_rate": args.slow_rate, "slow_latency": args.slow_latency,
+              "error_rate": args.error_rate, "outage": False}
+    server = start_server(create_stand_in_app(faults), args.port)
+    try:
+        asyncio.run(benchmark(f"http://127.0.0.1:{args.port}/v1", faults,
+                              args.requests, args.concurrency, args.timeout))
+    finally:
+        server.should_exit = True
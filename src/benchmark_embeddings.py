@@ -0,0 +1,140 @@
+from llms.providers import HuggingFaceProvider
+from utils.logger import get_logger
+from config.settings import settings
+import numpy as np
+import argparse
+import asyncio
+import random
+import time
+
+
+logger = get_logger(__name__)
+
+WORDS = ("price product order delivery refund account store payment service support "
+         "سعر منتج طلب توصيل استرجاع حساب متجر دفع خدمة دعم").split()
+
+
+def sample_queries(count: int, seed: int = 0) -> list:
+    """Queries of 3 to 30 words, so batches need padding as real traffic does."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(3, 30))) for _ in range(count)]
+
+
+async def run_load(provider: HuggingFaceProvider, queries: list, concurrency: int) -> dict:
+    """Embeds `queries` with `concurrency` concurrent callers; returns throughput and latency."""
+    latencies = []
+    remaining = iter(queries)
+
+    async def client():
+        for query in remaining:
+            start = time.perf_counter()
+            await provider.aembed_text(query)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "queries_per_second": round(len(queries) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+    }
+
+
+def sample_documents(count: int, seed: int = 1) -> list:
+    """Chunk-like texts of 20 to 300 words."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(20, 300))) for _ in range(count)]
+
+
+def recall_at_k(reference: np.ndarray, candidate: np.ndarray, queries: np.ndarray,
+                candidate_queries: np.ndarray, k: int = 10) -> float:
+    """Share of the reference top-k neighbours found by the candidate embeddings."""
+    def top_k(documents, query_vectors):
+        documents = documents / np.linalg.norm(documents, axis=1, keepdims=True)
+        query_vectors = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+        return np.argsort(-(query_vectors @ documents.T), axis=1)[:, :k]
+
+    expected, found = top_k(reference, queries), top_k(candidate, candidate_queries)
+    return float(np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)]))
+
+
+def compare_quantization(model_id: str, documents: int, queries: int, modes: list):
+    """Index-build throughput of each quantization mode, and its retrieval parity with fp32."""
+    corpus, query_texts = sample_documents(documents), sample_queries(queries)
+    reference = None
+
+    for mode in modes:
+        provider = HuggingFaceProvider(embedding_cache_size=0, embedding_batch_max_size=1,
+                                       embedding_batch_size=settings.HF_EMBEDDING_BATCH_SIZE,
+                                       embedding_quantization=None if mode == "fp32" else mode)
+        try:
+            provider.set_embedding_model(model_id=model_id, embedding_size=settings.EMBEDDING_MODEL_SIZE)
+        except ImportError as e:
+            logger.info(f"{mode}: skipped ({e})")
+            continue
+
+        provider.embed_many(corpus[:16])  # warm up
+        start = time.perf_counter()
+        document_vectors = provider.embed_many(corpus)
+        elapsed = time.perf_counter() - start
+        query_vectors = provider.embed_many(query_texts)
+
+        result = {"texts_per_second": round(len(corpus) / elapsed, 1)}
+        if reference is None:
+            reference = (document_vectors, query_vectors)
+        else:
+            cosine = np.sum(
+                (reference[0] / np.linalg.norm(reference[0], axis=1, keepdims=True)) *
+                (document_vectors / np.linalg.norm(document_vectors, axis=1, keepdims=True)), axis=1
+            )
+            result["mean_cosine_to_fp32"] = round(float(cosine.mean()), 4)
+            result["recall@10_vs_fp32"] = round(recall_at_k(reference[0], document_vectors,
+                                                            reference[1], query_vectors), 4)
+        logger.info(f"{mode}: {result}")
+
+
+async def benchmark(model_id: str, requests: int, concurrency_levels: list,
+                    batch_sizes: list, max_wait: float):
+    queries = sample_queries(requests)
+
+    for batch_size in batch_sizes:
+        # The embedding cache is off so every call reaches the model
+        provider = HuggingFaceProvider(embedding_cache_size=0,
+                                       embedding_batch_max_size=batch_size,
+                                       embedding_batch_max_wait=max_wait)
+        provider.set_embedding_model(model_id=model_id, embedding_size=settings.EMBEDDING_MODEL_SIZE)
+        await run_load(provider, queries[:32], concurrency=8)  # warm up
+
+        for concurrency in concurrency_levels:
+            result = await run_load(provider, queries, concurrency)
+            logger.info(f"batch_max_size={batch_size:<3} max_wait={max_wait * 1000:.1f}ms "
+                        f"concurrency={concurrency:<3} {result}")
+
+        if provider.embedding_batcher is not None:
+            logger.info(f"batch_max_size={batch_size:<3} batcher {provider.embedding_batcher.stats()}")
+        await provider.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark local embeddings on CPU: query micro-batching, or quantized index builds.")
+    parser.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32],
+                        help="Micro-batch sizes to compare; 1 embeds each query on its own.")
+    parser.add_argument("--max-wait", type=float, default=settings.HF_EMBEDDING_BATCH_MAX_WAIT)
+    parser.add_argument("--quantization", nargs="+", choices=["fp32", "int8", "onnx"],
+                        help="Instead of query batching, compare index-build throughput and "
+                             "recall@10 against fp32 for these modes.")
+    parser.add_argument("--documents", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.quantization:
+        modes = ["fp32"] + [mode for mode in args.quantization if mode != "fp32"]
+        compare_quantization(args.model, args.documents, args.requests, modes)
+    else:
+        asyncio.run(benchmark(args.model, args.requests, args.concurrency, args.batch_sizes, args.max_wait))
@@ -1,4 +1,5 @@
 from loaders.pdf_loader import PDFLoader
+from loaders.ingest_manifest import IngestManifest
 from processors.text_processor import TextProcessor
 from vector_dbs.providers.vector_store import VectorStore
 from llms.llm_provider_factory import LLMProviderFactory
@@ -7,37 +8,113 @@ from utils.exceptions import PDFLoadError
 from config.settings import settings
 from config.config import config
 from dotenv import load_dotenv
+import argparse
+import os
+import uuid
 load_dotenv()
 
 
 logger = get_logger(__name__)
 
+MANIFEST_FILE = "manifest.json"
 
-def build_and_save_vector_embeddings():
-    logger.info("Loading PDFs...")
-    pdf_loader = PDFLoader(settings.PDF_DIRECTORY)
-    pdf_docs = pdf_loader.load_pdfs()
-    if not pdf_docs:
+
+def build_and_save_vector_embeddings(full_rebuild: bool = False):
+    """Brings the vector store in line with the PDFs in `settings.PDF_DIRECTORY`.
+
+    Only new or modified PDFs are extracted and embedded; chunks of modified or deleted
+    PDFs are removed from the index by id. A full rebuild happens when there is no
+    store or manifest yet, or when `full_rebuild` is set.
+    """
+    pdf_loader = PDFLoader(settings.PDF_DIRECTORY,
+                           max_workers=settings.PDF_LOADER_MAX_WORKERS,
+                           max_in_flight=settings.PDF_LOADER_MAX_IN_FLIGHT)
+    current_hashes = {
+        file: IngestManifest.hash_file(os.path.join(settings.PDF_DIRECTORY, file))
+        for file in pdf_loader.list_pdfs()
+    }
+    if not current_hashes:
         raise PDFLoadError("No PDFs found in the directory.")
 
     llm_provider_factory = LLMProviderFactory(config, settings)
     embedding_client = llm_provider_factory.create(provider=settings.EMBEDDING_BACKEND)
     embedding_client.set_embedding_model(model_id=settings.EMBEDDING_MODEL_ID,
                                          embedding_size=settings.EMBEDDING_MODEL_SIZE)
-    
-    logger.info("Splitting text into chunks...")
+
+    manifest = IngestManifest(os.path.join(settings.VECTOR_STORE_PATH, MANIFEST_FILE))
+    vector_store = VectorStore.from_settings(settings)
+
+    incremental = not full_rebuild and manifest.exists() and VectorStore.exists(settings.VECTOR_STORE_PATH)
+    if incremental:
+        manifest.load()
+        vector_store.load_vector_store(settings.VECTOR_STORE_PATH, embedding_client.embed_text,
+                                       load_vectors=True)
+    else:
+        logger.info("Building the vector store from scratch...")
+
+    added, modified, deleted = manifest.diff(current_hashes)
+    logger.info(f"PDFs added: {len(added)}, modified: {len(modified)}, deleted: {len(deleted)}")
+    if not (added or modified or deleted):
+        logger.info("Vector store is up to date.")
+        return
+
+    stale_chunk_ids = manifest.chunk_ids(modified + deleted)
+    if incremental and stale_chunk_ids:
+        logger.info(f"Removing {len(stale_chunk_ids)} stale chunks...")
+        vector_store.delete_documents(stale_chunk_ids)
+    for file in modified + deleted:
+        manifest.remove_file(file)
+
     text_processor = TextProcessor(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
-    documents = text_processor.split_documents(pdf_docs)
-    # logger.info("Documents")
-    # logger.info(documents)
-    # logger.info(f"Len of Documents: {len(documents)}")
-    logger.info("Storing embeddings...")
-    vector_store = VectorStore()
-    vector_store.build_vector_store(documents, embedding_client.embed_text)
+    documents, chunk_ids = [], []
+
+    def flush_chunks():
+        if not documents:
+            return
+
+        logger.info(f"Storing embeddings for {len(documents)} chunks...")
+        if vector_store.vectors is None:
+            vector_store.build_vector_store(documents, embedding_client.embed_text,
+                                            embed_many_function=embedding_client.embed_many,
+                                            ids=chunk_ids)
+        else:
+            vector_store.add_documents(documents, embedding_client.embed_text,
+                                       embed_many_function=embedding_client.embed_many,
+                                       ids=chunk_ids)
+        documents.clear()
+        chunk_ids.clear()
+
+    # Extraction keeps running in the worker processes while chunks are embedded here
+    for file, pages in pdf_loader.iter_pdfs(added + modified):
+        logger.info(f"Splitting {file} into chunks...")
+        file_documents = text_processor.split_documents(pages)
+        file_chunk_ids = [uuid.uuid4().hex for _ in file_documents]
+        manifest.set_file(file, current_hashes[file], file_chunk_ids)
+
+        documents.extend(file_documents)
+        chunk_ids.extend(file_chunk_ids)
+        if len(documents) >= settings.INGEST_FLUSH_CHUNKS:
+            flush_chunks()
+
+    flush_chunks()
+
     vector_store.save_vector_store(settings.VECTOR_STORE_PATH)
+    manifest.save()
 
     logger.info(f"Saved New embeddings... to {settings.VECTOR_STORE_PATH}")
+    logger.info(f"Index {vector_store.get_index_info()} recall@10 vs exact float32 search: {vector_store.recall_at_k}")
 
 
 if __name__ == "__main__":
-    build_and_save_vector_embeddings()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build or update the vector store from the PDF directory.")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-extract and re-embed every PDF instead of only the changed ones.")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Convert a LangChain FAISS store to the memory-mapped format without re-embedding.")
+    args = parser.parse_args()
+
+    if args.migrate:
+        VectorStore.from_settings(settings).migrate_legacy_store(settings.VECTOR_STORE_PATH)
+        logger.info(f"Migrated vector store at {settings.VECTOR_STORE_PATH}")
+    else:
+        build_and_save_vector_embeddings(full_rebuild=args.full)
@@ -1,10 +1,16 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class AppSettings:
     PDF_DIRECTORY: str = "../data/docs"
     PROCESSED_DIRECTORY: str = "data/processed"
 
+    # ================================ Ingestion Settings ================================
+    PDF_LOADER_MAX_WORKERS: Optional[int] = None # extraction processes, None uses the CPU count
+    PDF_LOADER_MAX_IN_FLIGHT: Optional[int] = None # files extracted ahead of chunking, None is 2 * workers
+    INGEST_FLUSH_CHUNKS: int = 2048 # chunks buffered before they are embedded and added to the index
+
     # ================================ LLM Settings ================================
     GENERATION_MODEL_ID: str = "gpt-4o-mini"
     # GENERATION_MODEL_ID: str = "ALLaM-AI/ALLaM-7B-Instruct-preview"
@@ -21,19 +27,127 @@ class AppSettings:
     TOP_K: int = 10
     TOP_P: float = 0.95
 
+    # Batched embedding used when building the index
+    EMBEDDING_BATCH_SIZE: int = 512 # max inputs per request
+    EMBEDDING_BATCH_MAX_TOKENS: int = 200000 # max tokens per request
+    EMBEDDING_MAX_CONCURRENCY: int = 4 # requests in flight
+    EMBEDDING_MAX_RETRIES: int = 6 # retries on rate limits and transient errors
+
+    # Concurrent query embeddings of local (HuggingFace) models are run as one batch
+    HF_EMBEDDING_BATCH_MAX_SIZE: int = 32 # 1 disables batching
+    HF_EMBEDDING_BATCH_MAX_WAIT: float = 0.005 # seconds the first query waits for others
+    HF_EMBEDDING_BATCH_SIZE: int = 64 # texts per forward pass when building the index
+    HF_EMBEDDING_NORMALIZE: bool = False # L2-normalize; rebuild the index when changing it
+    HF_EMBEDDING_QUANTIZATION: Optional[str] = None # None (fp32), "int8" or "onnx"; CPU only
+
+    # ================================ HTTP Client Settings ================================
+    # Shared connection pool used by the async OpenAI client
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_KEEPALIVE_EXPIRY: float = 30.0 # seconds
+    OPENAI_REQUEST_TIMEOUT: float = 60.0 # seconds
+    # Generation and query embedding calls are cut short, retried with jittered backoff, optionally
+    # hedged, and fail fast while the API is unhealthy (the SDK's own retries are then off)
+    LLM_CALL_TIMEOUT: Optional[float] = 30.0 # seconds per generation attempt (until the stream opens)
+    EMBEDDING_CALL_TIMEOUT: Optional[float] = 5.0 # seconds per query embedding attempt
+    LLM_CALL_MAX_RETRIES: int = 2
+    LLM_CALL_BACKOFF_BASE: float = 0.2 # seconds, doubled on each retry, fully jittered
+    LLM_CALL_BACKOFF_MAX: float = 2.0 # seconds
+    LLM_CALL_HEDGE: bool = False # hedging duplicates the cost of the slowest generations
+    EMBEDDING_CALL_HEDGE: bool = True
+    CALL_HEDGE_QUANTILE: float = 0.95 # a second request is sent once the first is slower than this quantile
+    CIRCUIT_BREAKER_FAILURES: int = 5 # consecutive failures before calls fail fast, 0 to disable
+    CIRCUIT_BREAKER_RESET: float = 30.0 # seconds before a trial call is let through
+
+    # ================================ Cache Settings ================================
+    # Query embeddings keyed on normalized text + embedding model id/dimension
+    EMBEDDING_CACHE_MAX_SIZE: int = 10000 # 0 disables the cache
+    EMBEDDING_CACHE_TTL: float = 24 * 60 * 60 # seconds
+
+    # RAG answers for first-turn questions; exact tier on normalized text, semantic tier on cosine similarity
+    ANSWER_CACHE_MAX_ENTRIES: int = 2000 # 0 disables the cache
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_TTL: float = 6 * 60 * 60 # seconds
+
+    # Concurrent identical queries share one embedding, retrieval and (without history) generation
+    COALESCE_REQUESTS: bool = True
+
     # ================================ Vector DB Settings ================================
     # VECTOR_DB_BACKEND="QDRANT"
     # VECTOR_DB_PATH="qdrant_db"
     # VECTOR_DB_DISTANCE_METHOD="cosine"
     VECTOR_STORE_PATH: str = "./store/faiss_index" # ../ because we go into src directory 
+    VECTOR_DB_DISTANCE_METHOD: str = "l2" # l2, cosine or dot
+    VECTOR_INDEX_DTYPE: str = "float16" # float32, float16 or int8 storage of the search matrix
+    VECTOR_SEARCH_BLOCK_SIZE: int = 4096 # rows dequantized per matrix product
+    VECTOR_DB_BACKEND: str = "NUMPY" # NUMPY (exact search, settings above) or FAISS (index type below)
+    FAISS_INDEX_TYPE: str = "hnsw" # flat, ivf_flat, ivf_pq or hnsw
+    FAISS_IVF_NLIST: Optional[int] = None # None: 4 * sqrt(number of chunks)
+    FAISS_IVF_NPROBE: int = 16 # lists scanned per query; higher is slower with better recall
+    FAISS_PQ_M: int = 16 # sub-quantizers, must divide EMBEDDING_MODEL_SIZE
+    FAISS_PQ_NBITS: int = 8
+    FAISS_HNSW_M: int = 32 # graph links per node
+    FAISS_HNSW_EF_CONSTRUCTION: int = 200
+    FAISS_HNSW_EF_SEARCH: int = 64 # candidates explored per query; higher is slower with better recall
+    FAISS_TRAIN_SIZE: int = 100000 # vectors sampled to train IVF centroids
+    HYBRID_SEARCH: bool = True # fuse BM25 keyword search with vector search
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
+    RRF_K: int = 60 # reciprocal-rank fusion constant
+    HYBRID_CANDIDATES: int = 20 # results taken from each retriever before fusion
     TOP_SIMILARITY_K: int = 3
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
 
+    # ================================ Context Settings ================================
+    # Retrieved chunks are merged, deduplicated and packed into this many prompt tokens
+    CONTEXT_TOKEN_BUDGET: int = 2000
+    CONTEXT_NEAR_DUPLICATE_THRESHOLD: float = 0.8 # share of a passage already in the context to drop it
+    TOKEN_COUNT_CACHE_SIZE: int = 10000
+
+    # ================================ Chat History Settings ================================
+    # Recent turns are sent verbatim; older ones are folded into a rolling summary in the background
+    HISTORY_MAX_TURNS: int = 6 # user/assistant pairs kept verbatim
+    HISTORY_TOKEN_BUDGET: int = 1500 # tokens of verbatim history
+    HISTORY_SUMMARIZE_BATCH: int = 4 # messages outside the window before the summary is updated
+    HISTORY_SUMMARY_MAX_TOKENS: int = 300
+
+    # ================================ Chat Log Settings ================================
+    CHAT_LOG_BUCKET_SIZE: int = 50 # messages per MongoDB document
+    CHAT_LOG_STORE_PROMPTS: bool = True # keep the full RAG prompt of each answer for auditing
+    CHAT_LOG_TTL_DAYS: Optional[int] = 90 # delete sessions inactive this long, None to keep forever
+    # Chat logs are written behind the response, in batches
+    CHAT_LOG_WRITE_BEHIND: bool = True
+    CHAT_LOG_FLUSH_BATCH_SIZE: int = 200 # messages per bulk write
+    CHAT_LOG_FLUSH_INTERVAL: float = 0.1 # seconds a message waits for its batch to fill
+    CHAT_LOG_MAX_PENDING: int = 5000 # messages held in memory before writes wait for a flush
+    # Recently used sessions are cached in memory, so active conversations don't read MongoDB
+    CHAT_SESSION_CACHE_SIZE: int = 10000 # sessions
+    CHAT_SESSION_CACHE_BYTES: int = 64 * 1024 * 1024 # message text held, 0 to disable
+    CHAT_SESSION_CACHE_TTL: Optional[float] = 900 # seconds; bounds staleness when other workers write
+    CHAT_SESSION_CACHE_MESSAGES: int = 50 # per session, at least 2 * HISTORY_MAX_TURNS
+
+    # ================================ Deadline Settings ================================
+    # With a deadline, a stage past its share of it is cut short and degraded, and the response
+    # lists the degradations. Generation is cut short by whichever comes first, the deadline or
+    # LLM_CALL_TIMEOUT per attempt, so set the deadline above the slowest ordinary answer
+    # (streams only need their first token in time)
+    REQUEST_DEADLINE: Optional[float] = None # seconds, e.g. 30; None to wait for every stage
+    HISTORY_BUDGET: float = 0.1 # share of the deadline; past it the answer ignores earlier turns
+    EMBEDDING_BUDGET: float = 0.15 # past it only keyword search is used (needs HYBRID_SEARCH)
+    RETRIEVAL_BUDGET: float = 0.2 # past it only keyword search is used (needs HYBRID_SEARCH)
+    CHAT_LOG_WRITE_BUDGET: float = 0.05 # kept from generation; past it the write finishes after the response
+    SHRINK_K_BELOW: float = 0.5 # retrieve half the passages when less than this share is left
+    # Generation gets the rest; past it a cached answer or the retrieved passages are returned
+
+    # ================================ Metrics Settings ================================
+    # Stage latencies, cache hits, tokens and errors are served at /metrics
+    SERVER_TIMING_HEADER: bool = True # per-request stage breakdown in a Server-Timing header
 
     # ================================ Template Configs ================================
     PRIMARY_LANG = "ar"
     DEFAULT_LANG = "en"
+    TEMPLATE_RELOAD_INTERVAL: Optional[float] = None # seconds between checks for edited templates, None to disable
     # FILE_ALLOWED_TYPES=["text/plain", "application/pdf"]
     # FILE_MAX_SIZE=10
     # FILE_DEFAULT_CHUNK_SIZE=512000 # 512KB
@@ -0,0 +1,120 @@
+import numpy as np
+from utils.lru_cache import LRUCache
+from utils.cleaning import normalize_query
+
+
+class AnswerCache:
+    """Two-tier cache of RAG answers.
+
+    The exact tier matches on normalized query text. The semantic tier returns a cached
+    answer when the cosine similarity between the new query embedding and a cached one is
+    at least `similarity_threshold`.
+
+    Every entry belongs to a version (vector-store version, prompt-template version). When
+    the version changes, e.g. after the index is rebuilt, all entries are dropped.
+    """
+
+    def __init__(self, max_entries: int = 1000, similarity_threshold: float = 0.95,
+                 ttl: float = None):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+
+        # normalized query -> (slot, answer, full_prompt); capacity eviction frees the slot
+        self.entries = LRUCache(max_size=max_entries, ttl=ttl, on_evict=self._release_slot)
+
+        # Semantic tier: one unit-norm row per entry, allocated on first insert
+        self._vectors = None
+        self._active = np.zeros(max_entries, dtype=bool)
+        self._slot_keys = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+
+        self.version = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _release_slot(self, key, entry):
+        slot = entry[0]
+        if slot is None:
+            return
+
+        self._active[slot] = False
+        self._slot_keys[slot] = None
+        self._free_slots.append(slot)
+
+    def _check_version(self, version):
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+    @staticmethod
+    def _unit_vector(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get(self, query: str, query_vector, version):
+        """Return a cached `(answer, full_prompt)` for the query, or None on a miss."""
+        self._check_version(version)
+        key = normalize_query(query)
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.exact_hits += 1
+            return entry[1], entry[2]
+
+        if query_vector is not None and self._vectors is not None and self._active.any():
+            scores = self._vectors @ self._unit_vector(query_vector)
+            scores[~self._active] = -np.inf
+
+            best_slot = int(np.argmax(scores))
+            if scores[best_slot] >= self.similarity_threshold:
+                entry = self.entries.get(self._slot_keys[best_slot])
+                if entry is not None:
+                    self.semantic_hits += 1
+                    return entry[1], entry[2]
+
+        self.misses += 1
+        return None
+
+    def put(self, query: str, query_vector, version, answer: str, full_prompt: str):
+        """Store an answer for the query under the given version."""
+        self._check_version(version)
+        key = normalize_query(query)
+
+        previous = self.entries.pop(key)
+        if previous is not None:
+            self._release_slot(key, previous)
+
+        vector = self._unit_vector(query_vector) if query_vector is not None else None
+        if vector is not None and self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        # Inserting may evict the least recently used entry, which returns its slot
+        slot = None
+        self.entries.put(key, (None, answer, full_prompt))
+        if vector is not None and self._free_slots:
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._active[slot] = True
+            self._slot_keys[slot] = key
+
+        self.entries.put(key, (slot, answer, full_prompt))
+
+    def clear(self):
+        self.entries.clear()
+        self._active[:] = False
+        self._slot_keys = [None] * self.max_entries
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "similarity_threshold": self.similarity_threshold,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from utils.tokens import count_tokens
+
+
+class ChatHistoryWindow:
+    """Chooses the part of a session's history that is sent with a new question.
+
+    The last `max_turns` user/assistant turns are kept verbatim, newest first, as long as
+    they fit in `token_budget` tokens. Older turns reach the model through the session's
+    rolling summary (see `HistorySummarizer`); those the summary doesn't cover yet are
+    sent verbatim too, so no turn is left out while it catches up.
+    """
+
+    def __init__(self, max_turns: int, token_budget: int, model_id: str = None):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.model_id = model_id
+
+    @property
+    def max_messages(self) -> int:
+        return 2 * self.max_turns
+
+    def _recent(self, messages: list) -> list:
+        """The most recent messages that fit the window, oldest first."""
+        messages = [message for message in messages if message.get("role") != "system"]
+
+        selected, used_tokens = [], 0
+        for message in reversed(messages[-self.max_messages:]):
+            tokens = count_tokens(message.get("content") or "", self.model_id)
+            if used_tokens + tokens > self.token_budget:
+                break
+            selected.append(message)
+            used_tokens += tokens
+
+        selected.reverse()
+        # Never start on an answer whose question was cut off
+        while selected and selected[0].get("role") != "user":
+            selected.pop(0)
+        return selected
+
+    def window_start(self, messages: list, message_count: int) -> int:
+        """Position of the first message the window keeps; the summary is to cover the ones before."""
+        recent = self._recent(messages)
+        return recent[0]["index"] if recent else message_count
+
+    def select(self, messages: list, summarized_count: int = None) -> list:
+        """Returns the messages sent with a new question, oldest first.
+
+        With `summarized_count`, messages past it that are older than the window are kept
+        as well, since the summary doesn't cover them yet.
+        """
+        recent = self._recent(messages)
+        if summarized_count is None:
+            return recent
+
+        start = recent[0]["index"] if recent else float("inf")
+        unsummarized = [
+            message for message in messages
+            if message.get("role") != "system" and summarized_count <= message["index"] < start
+        ]
+        return unsummarized + recent
+
+
+class HistorySummarizer:
+    """Folds turns that have left the history window into a stored running summary.
+
+    Summaries are generated in background tasks after an answer is saved, so they never
+    delay a response. Each run summarizes the messages between the stored
+    `summarized_count` and the start of the window (see `ChatHistoryWindow.window_start`),
+    and is skipped until at least `batch_messages` such messages have accumulated.
+    """
+
+    def __init__(self, chat_log_manager, generation_client, template_parser,
+                 batch_messages: int = 4, max_output_tokens: int = 300):
+        self.chat_log_manager = chat_log_manager
+        self.generation_client = generation_client
+        self.template_parser = template_parser
+        self.batch_messages = batch_messages
+        self.max_output_tokens = max_output_tokens
+
+        self._tasks = set()
+        self._in_progress = set()
+        self.logger = logging.getLogger(__name__)
+
+    def maybe_schedule(self, user_id: str, session_id: str,
+                       summarize_until: int, summarized_count: int):
+        """Starts a summary update if enough messages before `summarize_until` have left the window."""
+        key = (user_id, session_id)
+        if summarize_until - summarized_count < self.batch_messages or key in self._in_progress:
+            return
+
+        self._in_progress.add(key)
+        task = asyncio.create_task(self._summarize(user_id, session_id, summarized_count, summarize_until))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._in_progress.discard(key))
+
+    def _format_messages(self, messages: list) -> str:
+        return "\n".join(
+            f"{message['role']}: {message['content']}"
+            for message in messages
+            if message.get("role") != "system" and message.get("content")
+        )
+
+    async def _summarize(self, user_id: str, session_id: str,
+                         summarized_count: int, summarize_until: int):
+        try:
+            window = await self.chat_log_manager.get_chat_window(user_id, session_id, last_n=1)
+            if window is None or window["summarized_count"] != summarized_count:
+                return  # another worker already advanced the summary
+
+            messages = await self.chat_log_manager.get_messages(
+                user_id, session_id, skip=summarized_count, limit=summarize_until - summarized_count
+            )
+            # A failed read returns nothing, and positions reserved by a write not yet done
+            # are missing; the summary must not skip over them
+            if [message.get("index") for message in messages] != list(range(summarized_count, summarize_until)):
+                self.logger.warning(f"Messages {summarized_count}-{summarize_until} of session {session_id} "
+                                    f"are not all readable yet, summary not updated")
+                return
+
+            prompt = self.template_parser.get("history", "summary_prompt", {
+                "summary": window["summary"] or "-",
+                "messages": self._format_messages(messages),
+            })
+
+            summary = await self.generation_client.agenerate_text(
+                prompt=prompt, chat_history=[], max_output_tokens=self.max_output_tokens
+            )
+            if summary:
+                await self.chat_log_manager.update_summary(
+                    user_id, session_id, summary.strip(),
+                    summarized_count=summarize_until,
+                    previous_summarized_count=summarized_count
+                )
+        except Exception as e:
+            self.logger.error(f"Failed to summarize chat history of session {session_id}: {e}")
+
+    async def aclose(self):
+        """Waits for summaries still being generated."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,144 @@
+import hashlib
+from utils.cleaning import normalize_query
+from utils.lru_cache import LRUCache
+from utils.tokens import count_tokens, truncate_to_tokens
+
+
+# Passages shorter than this are not worth truncating into the remaining budget
+MIN_TRUNCATED_TOKENS = 50
+SHINGLE_SIZE = 5
+# Shortest suffix/prefix match accepted as a chunk overlap when chunks carry no offsets
+MIN_TEXT_OVERLAP = 20
+
+
+class Passage:
+    """A span of one source page assembled from one or more retrieved chunks."""
+
+    __slots__ = ("text", "source", "page", "start", "end", "rank")
+
+    def __init__(self, text: str, source, page, start, rank: int):
+        self.text = text
+        self.source = source
+        self.page = page
+        self.start = start
+        self.end = start + len(text) if start is not None else None
+        self.rank = rank
+
+
+def _shingles(text: str) -> set:
+    words = normalize_query(text).split()
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    for size in range(min(len(left), len(right)), MIN_TEXT_OVERLAP - 1, -1):
+        if right.startswith(left[-size:]):
+            return size
+    return 0
+
+
+class ContextPacker:
+    """Assembles retrieved chunks into the context of a RAG prompt.
+
+    Chunks from the same source page that overlap or touch (by their `start_index`, or by
+    matching text when they have none) are merged into one passage, so the chunk overlap
+    is sent once. Passages whose word shingles are mostly (`near_duplicate_threshold`) found in
+    a more relevant passage are dropped as exact or near duplicates. Passages are then added in retrieval order until
+    `token_budget` tokens are used; token counts are cached by text.
+    """
+
+    def __init__(self, token_budget: int, model_id: str = None,
+                 near_duplicate_threshold: float = 0.8, token_cache_size: int = 10000):
+        self.token_budget = token_budget
+        self.model_id = model_id
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.token_cache = LRUCache(max_size=token_cache_size)
+
+    def count_tokens(self, text: str) -> int:
+        key = hashlib.sha1(text.encode("utf-8")).digest()
+        tokens = self.token_cache.get(key)
+        if tokens is None:
+            tokens = count_tokens(text, self.model_id)
+            self.token_cache.put(key, tokens)
+        return tokens
+
+    @staticmethod
+    def _merge(passage: Passage, other: Passage) -> bool:
+        """Merges `other` into `passage` if they overlap or touch; returns whether it did."""
+        if passage.start is not None and other.start is not None:
+            if other.start > passage.end or other.end < passage.start:
+                return False
+            if other.start < passage.start:
+                passage.text = other.text[:passage.start - other.start] + passage.text
+                passage.start = other.start
+            if other.end > passage.end:
+                passage.text += other.text[passage.end - other.start:]
+                passage.end = other.end
+        elif passage.text in other.text:
+            passage.text = other.text
+        elif other.text not in passage.text:
+            overlap = _text_overlap(passage.text, other.text)
+            if overlap:
+                passage.text += other.text[overlap:]
+            else:
+                overlap = _text_overlap(other.text, passage.text)
+                if not overlap:
+                    return False
+                passage.text = other.text + passage.text[overlap:]
+
+        passage.rank = min(passage.rank, other.rank)
+        return True
+
+    def _merge_neighbours(self, chunks) -> list:
+        groups = {}
+        for rank, chunk in enumerate(chunks):
+            metadata = chunk.metadata or {}
+            passage = Passage(chunk.page_content, metadata.get("source"), metadata.get("page"),
+                              metadata.get("start_index"), rank)
+            groups.setdefault((passage.source, passage.page), []).append(passage)
+
+        passages = []
+        for group in groups.values():
+            group.sort(key=lambda passage: (passage.start is None, passage.start or 0, passage.rank))
+            merged = []
+            for passage in group:
+                if not any(self._merge(existing, passage) for existing in merged):
+                    merged.append(passage)
+            passages.extend(merged)
+
+        return sorted(passages, key=lambda passage: passage.rank)
+
+    def _deduplicate(self, passages: list) -> list:
+        kept, kept_shingles = [], []
+        for passage in passages:
+            shingles = _shingles(passage.text)
+            is_duplicate = any(
+                len(shingles & other) / max(len(shingles), 1) >= self.near_duplicate_threshold
+                for other in kept_shingles
+            )
+            if not is_duplicate:
+                kept.append(passage)
+                kept_shingles.append(shingles)
+        return kept
+
+    def pack(self, chunks) -> list:
+        """Returns the passage texts to put in the prompt, most relevant first."""
+        passages = self._deduplicate(self._merge_neighbours(chunks))
+
+        texts, used_tokens = [], 0
+        for passage in passages:
+            tokens = self.count_tokens(passage.text)
+            remaining = self.token_budget - used_tokens
+            if tokens <= remaining:
+                texts.append(passage.text)
+                used_tokens += tokens
+                continue
+
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                texts.append(truncate_to_tokens(passage.text, remaining, self.model_id))
+            break
+
+        return texts
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import List, Dict
+from utils.cleaning import normalize_query
 
 
 class LLMInterface(ABC):
@@ -55,6 +56,81 @@ class LLMInterface(ABC):
         """
         pass
 
+    def embed_many(self, texts: List[str], document_type: str = None) -> list:
+        """Convert a list of texts into embedding vectors, preserving order.
+
+        Providers that support batched requests override this; the default embeds one text at a time.
+
+        Args:
+            texts (List[str]): The texts to be embedded.
+            document_type (str, optional): Specifies the type of document (e.g., 'query' or 'document'). Defaults to None.
+
+        Returns:
+            list: One embedding vector per input text.
+        """
+        return [self.embed_text(text, document_type) for text in texts]
+
+    @abstractmethod
+    async def agenerate_text(self, prompt: str, chat_history: list = None, max_output_tokens: int = None,
+                             temperature: float = None, top_p: float = None):
+        """Asynchronously generate text based on the given prompt and optional chat history.
+
+        Unlike `generate_text`, implementations must not block the event loop and must not
+        mutate the given chat history.
+
+        Args:
+            prompt (str): The input prompt for text generation.
+            chat_history (list, optional): A list of previous messages to maintain conversation context. Defaults to None.
+            max_output_tokens (int, optional): The maximum number of tokens to generate. Defaults to None, using the class default.
+            temperature (float, optional): Controls randomness in generation. Defaults to None, using the class default.
+            top_p (float, optional): Nucleus sampling threshold. Defaults to None, using the class default.
+
+        Returns:
+            str: The generated text.
+        """
+        pass
+
+    @abstractmethod
+    def astream_text(self, prompt: str, chat_history: list = None, max_output_tokens: int = None,
+                     temperature: float = None, top_p: float = None):
+        """Stream generated text as it is produced.
+
+        Implementations are async generators yielding text fragments (tokens or groups of
+        tokens) in order; joining them gives the same result as `agenerate_text`.
+
+        Args:
+            prompt (str): The input prompt for text generation.
+            chat_history (list, optional): A list of previous messages to maintain conversation context. Defaults to None.
+            max_output_tokens (int, optional): The maximum number of tokens to generate. Defaults to None, using the class default.
+            temperature (float, optional): Controls randomness in generation. Defaults to None, using the class default.
+            top_p (float, optional): Nucleus sampling threshold. Defaults to None, using the class default.
+
+        Yields:
+            str: The next fragment of generated text.
+        """
+        pass
+
+    @abstractmethod
+    async def aembed_text(self, text: str, document_type: str = None):
+        """Asynchronously convert input text into an embedding vector representation.
+
+        Args:
+            text (str): The text to be embedded.
+            document_type (str, optional): Specifies the type of document (e.g., 'query' or 'document'). Defaults to None.
+
+        Returns:
+            List[float]: The embedding vector representation of the input text.
+        """
+        pass
+
+    def get_embedding_cache_key(self, text: str, document_type: str = None) -> tuple:
+        """Build the embedding cache key for a text under the current embedding model."""
+        return (self.embedding_model_id, self.embedding_size, document_type, normalize_query(text))
+
+    async def aclose(self):
+        """Release any pooled connections held by the provider."""
+        pass
+
     def apply_prompt_template(self, context: str, query: str, chat_history: str = "") -> str:
         """
         Apply the prompt template based on the presence of chat history.
@@ -1,28 +1,94 @@
+import importlib
 from .llms_enums import LLMEnums
-from .providers import OpenAIProvider, HuggingFaceProvider
+from utils.call_policy import CircuitBreaker
+
 
 class LLMProviderFactory:
+    """Creates LLM providers by backend name.
+
+    Backends are registered by module path, so a provider's module (and its
+    dependencies, e.g. torch for HuggingFace) is only imported when it is selected.
+    """
+
+    # backend -> (provider module, provider class, name of the method building its kwargs)
+    _PROVIDERS = {
+        LLMEnums.OPENAI.value: (".providers.openai_provider", "OpenAIProvider", "_openai_kwargs"),
+        LLMEnums.HUGGINGFACE.value: (".providers.huggingface_provider", "HuggingFaceProvider", "_huggingface_kwargs"),
+    }
+
     def __init__(self, config: dict, settings: dict):
         self.config = config
         self.settings = settings
 
+    @classmethod
+    def register(cls, provider: str, module: str, class_name: str, kwargs_builder: str):
+        """Registers a backend; `kwargs_builder` names a factory method returning its constructor kwargs."""
+        cls._PROVIDERS[provider] = (module, class_name, kwargs_builder)
+
+    @classmethod
+    def get_provider_class(cls, provider: str):
+        if provider not in cls._PROVIDERS:
+            return None
+        module, class_name, _ = cls._PROVIDERS[provider]
+        return getattr(importlib.import_module(module, __package__), class_name)
+
+    def _call_policy(self, timeout: float, hedge: bool) -> dict:
+        """CallPolicy kwargs; each policy gets its own circuit breaker and latency window."""
+        return dict(
+            timeout=timeout,
+            max_retries=self.settings.LLM_CALL_MAX_RETRIES,
+            backoff_base=self.settings.LLM_CALL_BACKOFF_BASE,
+            backoff_max=self.settings.LLM_CALL_BACKOFF_MAX,
+            hedge=hedge,
+            hedge_quantile=self.settings.CALL_HEDGE_QUANTILE,
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=self.settings.CIRCUIT_BREAKER_FAILURES,
+                reset_timeout=self.settings.CIRCUIT_BREAKER_RESET
+            ) if self.settings.CIRCUIT_BREAKER_FAILURES > 0 else None
+        )
+
+    def _openai_kwargs(self) -> dict:
+        return dict(
+            api_key = self.config.OPENAI_API_KEY,
+            input_max_characters=self.settings.INPUT_DAFAULT_MAX_CHARACTERS,
+            max_output_tokens=self.settings.GENERATION_DAFAULT_MAX_TOKENS,
+            temperature=self.settings.GENERATION_DAFAULT_TEMPERATURE,
+            top_p=self.settings.TOP_P,
+            max_connections=self.settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=self.settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=self.settings.OPENAI_KEEPALIVE_EXPIRY,
+            request_timeout=self.settings.OPENAI_REQUEST_TIMEOUT,
+            embedding_cache_size=self.settings.EMBEDDING_CACHE_MAX_SIZE,
+            embedding_cache_ttl=self.settings.EMBEDDING_CACHE_TTL,
+            embedding_batch_size=self.settings.EMBEDDING_BATCH_SIZE,
+            embedding_batch_max_tokens=self.settings.EMBEDDING_BATCH_MAX_TOKENS,
+            embedding_max_concurrency=self.settings.EMBEDDING_MAX_CONCURRENCY,
+            embedding_max_retries=self.settings.EMBEDDING_MAX_RETRIES,
+            generation_call_policy=self._call_policy(self.settings.LLM_CALL_TIMEOUT, self.settings.LLM_CALL_HEDGE),
+            embedding_call_policy=self._call_policy(self.settings.EMBEDDING_CALL_TIMEOUT,
+                                                    self.settings.EMBEDDING_CALL_HEDGE)
+        )
+
+    def _huggingface_kwargs(self) -> dict:
+        return dict(
+            input_max_characters=self.settings.INPUT_DAFAULT_MAX_CHARACTERS,
+            max_output_tokens=self.settings.GENERATION_DAFAULT_MAX_TOKENS,
+            temperature=self.settings.GENERATION_DAFAULT_TEMPERATURE,
+            top_k=self.settings.TOP_K,
+            top_p=self.settings.TOP_P,
+            embedding_cache_size=self.settings.EMBEDDING_CACHE_MAX_SIZE,
+            embedding_cache_ttl=self.settings.EMBEDDING_CACHE_TTL,
+            embedding_batch_max_size=self.settings.HF_EMBEDDING_BATCH_MAX_SIZE,
+            embedding_batch_max_wait=self.settings.HF_EMBEDDING_BATCH_MAX_WAIT,
+            embedding_batch_size=self.settings.HF_EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=self.settings.HF_EMBEDDING_NORMALIZE,
+            embedding_quantization=self.settings.HF_EMBEDDING_QUANTIZATION
+        )
+
     def create(self, provider: str):
-        if provider == LLMEnums.OPENAI.value:
-            return OpenAIProvider(
-                api_key = self.config.OPENAI_API_KEY,
-                input_max_characters=self.settings.INPUT_DAFAULT_MAX_CHARACTERS,
-                max_output_tokens=self.settings.GENERATION_DAFAULT_MAX_TOKENS,
-                temperature=self.settings.GENERATION_DAFAULT_TEMPERATURE,
-                top_p=self.settings.TOP_P
-            )
-
-        if provider == LLMEnums.HUGGINGFACE.value:
-            return HuggingFaceProvider(
-                input_max_characters=self.settings.INPUT_DAFAULT_MAX_CHARACTERS,
-                max_output_tokens=self.settings.GENERATION_DAFAULT_MAX_TOKENS,
-                temperature=self.settings.GENERATION_DAFAULT_TEMPERATURE,
-                top_k=self.settings.TOP_K,
-                top_p=self.settings.TOP_P
-            )
-
-        return None
\ No newline at end of file
+        provider_class = self.get_provider_class(provider)
+        if provider_class is None:
+            return None
+
+        _, _, kwargs_builder = self._PROVIDERS[provider]
+        return provider_class(**getattr(self, kwargs_builder)())
@@ -12,4 +12,19 @@ class OpenAIEnums(Enum):
 class HuggingFaceEnums(Enum):
     SYSTEM = "system"
     USER = "user"
-    ASSISTANT = "assistant"
\ No newline at end of file
+    ASSISTANT = "assistant"
+
+class EmbeddingQuantizationEnums(Enum):
+    INT8 = "int8" # dynamic int8 quantization of the linear layers (CPU)
+    ONNX = "onnx" # ONNX Runtime export, needs `optimum[onnxruntime]`
+
+class DegradationEnums(Enum):
+    # Fallbacks taken when a stage runs out of its share of the request deadline, or the
+    # circuit breaker of its upstream is open
+    SKIPPED_HISTORY = "skipped_history" # answered without the earlier turns
+    KEYWORD_SEARCH_ONLY = "keyword_search_only" # the query was not embedded or vector search was too slow
+    SHRUNK_K = "shrunk_k" # fewer passages retrieved for a request already late
+    CACHED_ANSWER = "cached_answer" # generation was too slow; a cached answer was returned
+    RETRIEVAL_ONLY_ANSWER = "retrieval_only_answer" # generation was too slow; the passages were returned
+    NO_PASSAGES = "no_passages" # embedding or vector search was too slow and there is no keyword search to fall back on
+    CHAT_LOG_WRITE_DEFERRED = "chat_log_write_deferred" # the chat log is written after the response
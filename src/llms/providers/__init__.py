@@ -1,2 +1,13 @@
-from .huggingface_provider import HuggingFaceProvider
-from .openai_provider import OpenAIProvider
\ No newline at end of file
+import importlib
+
+_PROVIDER_MODULES = {
+    "HuggingFaceProvider": ".huggingface_provider",
+    "OpenAIProvider": ".openai_provider",
+}
+
+
+def __getattr__(name):
+    # Providers are imported on first use, so OpenAI-only deployments never import torch
+    if name in _PROVIDER_MODULES:
+        return getattr(importlib.import_module(_PROVIDER_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,28 @@
 from ..llm_interface import LLMInterface
-from ..llms_enums import HuggingFaceEnums
+from ..llms_enums import HuggingFaceEnums, EmbeddingQuantizationEnums
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, AutoModel
+import numpy as np
+from transformers import (AutoTokenizer, AutoModelForCausalLM, AutoModel, TextIteratorStreamer,
+                          StoppingCriteria, StoppingCriteriaList)
+from utils.lru_cache import LRUCache
+from utils.micro_batcher import MicroBatcher
+from utils.metrics import TOKENS, CACHE_REQUESTS
 from typing import List, Dict
 from logging import getLogger
+from threading import Thread, Event
+import asyncio
 
 
+class StopOnEvent(StoppingCriteria):
+    """Stops `generate` after the current token once `event` is set from another thread."""
+
+    def __init__(self, event: Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool,
+                          device=input_ids.device)
+
 
 class HuggingFaceProvider(LLMInterface):
     """Implementation of LLMInterface using Hugging Face models."""
@@ -15,7 +32,14 @@ class HuggingFaceProvider(LLMInterface):
                  max_output_tokens: int=1000,
                  temperature: float=0.1,
                  top_k: int=10,
-                 top_p: float=0.95):
+                 top_p: float=0.95,
+                 embedding_cache_size: int=0,
+                 embedding_cache_ttl: float=None,
+                 embedding_batch_max_size: int=32,
+                 embedding_batch_max_wait: float=0.005,
+                 embedding_batch_size: int=64,
+                 normalize_embeddings: bool=False,
+                 embedding_quantization: str=None):
 
         self.vector_store = vector_store
 
@@ -29,15 +53,27 @@ class HuggingFaceProvider(LLMInterface):
 
         self.embedding_model_id = None
         self.embedding_size = None
+        self.embedding_batch_size = embedding_batch_size
+        self.normalize_embeddings = normalize_embeddings
+        self.embedding_quantization = embedding_quantization
 
         self.tokenizer = None
         self.model = None
         self.embedding_tokenizer = None
         self.embedding_model = None
 
+        self.embedding_cache = LRUCache(max_size=embedding_cache_size, ttl=embedding_cache_ttl) \
+            if embedding_cache_size > 0 else None
+
+        # Concurrent `aembed_text` calls are embedded together in one padded forward pass
+        self.embedding_batcher = MicroBatcher(
+            self._aembed_batch, max_batch_size=embedding_batch_max_size, max_wait=embedding_batch_max_wait
+        ) if embedding_batch_max_size > 1 else None
+
         self.enums = HuggingFaceEnums
 
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.logger = getLogger(__name__)
 
     def set_generation_model(self, model_id: str) -> None:
         """Set the model for text generation."""
@@ -50,23 +86,40 @@ class HuggingFaceProvider(LLMInterface):
         self.embedding_model_id = model_id
         self.embedding_size = embedding_size
         self.embedding_tokenizer = AutoTokenizer.from_pretrained(model_id)
-        self.embedding_model = AutoModel.from_pretrained(model_id).to(self.device)
+        self.embedding_model = self._load_embedding_model(model_id)
+
+    def _load_embedding_model(self, model_id: str):
+        """The embedding model, quantized or exported to ONNX for CPU inference if configured."""
+        if self.embedding_quantization == EmbeddingQuantizationEnums.ONNX.value:
+            try:
+                from optimum.onnxruntime import ORTModelForFeatureExtraction
+            except ImportError as e:
+                raise ImportError("ONNX embeddings need `pip install optimum[onnxruntime]`") from e
+            return ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+
+        model = AutoModel.from_pretrained(model_id).eval()
+        if self.embedding_quantization == EmbeddingQuantizationEnums.INT8.value:
+            if self.device.type != "cpu":
+                self.logger.warning("int8 dynamic quantization only runs on CPU; using the fp32 model")
+            else:
+                return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif self.embedding_quantization:
+            raise ValueError(f"Unknown embedding quantization: {self.embedding_quantization}")
+
+        return model.to(self.device)
 
     def process_text(self, text: str):
         return text[:self.default_input_max_characters].strip()
     
-    def generate_text(self, messages: List[Dict[str, str]]) -> str:
-        """Generate a response from the Hugging Face model based on messages."""
-        if not self.model:
-            raise ValueError("Generation model not set. Call set_generation_model first.")
-
+    def _prepare_generation_inputs(self, messages: List[Dict[str, str]]) -> dict:
         inputs = self.tokenizer.apply_chat_template(messages, tokenize=False)
         inputs = self.tokenizer(inputs, return_tensors='pt', return_token_type_ids=False)
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        return {k: v.to(self.device) for k, v in inputs.items()}
 
+    def _generate(self, **kwargs):
         with torch.no_grad():
-            outputs = self.model.generate(
-                **inputs,
+            return self.model.generate(
+                **kwargs,
                 max_new_tokens=self.default_generation_max_output_tokens,
                 do_sample=True,
                 top_k=self.default_generation_top_k,
@@ -74,21 +127,175 @@ class HuggingFaceProvider(LLMInterface):
                 temperature=self.default_generation_temperature,
             )
 
+    @staticmethod
+    def _record_usage(inputs: dict, outputs):
+        prompt_tokens = inputs["input_ids"].shape[-1]
+        TOKENS.inc("prompt", amount=prompt_tokens)
+        TOKENS.inc("completion", amount=outputs.shape[-1] - prompt_tokens)
+
+    def _build_messages(self, prompt: str, chat_history: list = None) -> List[Dict[str, str]]:
+        messages = [
+            {"role": msg["role"], "content": msg["content"]}
+            for msg in (chat_history or [])
+        ]
+        messages.append({"role": self.enums.USER.value, "content": prompt})
+        return messages
+
+    def generate_text(self, messages: List[Dict[str, str]]) -> str:
+        """Generate a response from the Hugging Face model based on messages."""
+        if not self.model:
+            raise ValueError("Generation model not set. Call set_generation_model first.")
+
+        inputs = self._prepare_generation_inputs(messages)
+        outputs = self._generate(**inputs)
+        self._record_usage(inputs, outputs)
+
         return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+    async def agenerate_text(self, prompt: str, chat_history: list = None,
+                             max_output_tokens: int = None, temperature: float = None,
+                             top_p: float = None) -> str:
+        """Run generation in a worker thread so the event loop stays responsive."""
+        messages = self._build_messages(prompt, chat_history)
+        return await asyncio.to_thread(self.generate_text, messages)
+
+    async def astream_text(self, prompt: str, chat_history: list = None,
+                           max_output_tokens: int = None, temperature: float = None,
+                           top_p: float = None):
+        """Stream decoded text from `generate` running in a background thread."""
+        if not self.model:
+            raise ValueError("Generation model not set. Call set_generation_model first.")
+
+        inputs = self._prepare_generation_inputs(self._build_messages(prompt, chat_history))
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        stop = Event()
+        generated = {}
+
+        def generate():
+            try:
+                generated["outputs"] = self._generate(
+                    **inputs, streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([StopOnEvent(stop)]),
+                )
+            finally:
+                # Unblocks the reader if generate failed before ending the stream itself
+                if "outputs" not in generated:
+                    streamer.end()
+
+        generation_thread = Thread(target=generate)
+        generation_thread.start()
+
+        # The streamer is a blocking iterator, so each read is handed to a worker thread
+        end_of_stream = object()
+        try:
+            while True:
+                text = await asyncio.to_thread(next, streamer, end_of_stream)
+                if text is end_of_stream:
+                    break
+                if text:
+                    yield text
+        finally:
+            # On a client disconnect or cancellation, generate stops after its current
+            # token and ends the stream, which also releases a read still waiting on it
+            stop.set()
+
+        await asyncio.to_thread(generation_thread.join)
+        if "outputs" in generated:
+            self._record_usage(inputs, generated["outputs"])
     
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """One padded forward pass; returns a float32 array of shape (len(texts), dim)."""
+        inputs = self.embedding_tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+        if self.embedding_quantization != EmbeddingQuantizationEnums.ONNX.value:
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+
+        with torch.inference_mode():
+            hidden_state = self.embedding_model(**inputs).last_hidden_state
+            # Average over real tokens only, so padding added for longer texts in the batch
+            # doesn't change an embedding
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden_state.dtype)
+            embeddings = (hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            if self.normalize_embeddings:
+                embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+
+        return embeddings.float().cpu().numpy()
+
+    def _embed(self, text: str) -> np.ndarray:
+        return self._embed_batch([text])[0]
+
+    async def _aembed_batch(self, texts: List[str]) -> list:
+        embeddings = await asyncio.to_thread(self._embed_batch, texts)
+        return list(embeddings)
+
+    def embed_many(self, texts: List[str], document_type: str = None) -> np.ndarray:
+        """Embed texts in batches of `embedding_batch_size`, preserving order.
+
+        Texts are sorted by token count before batching, so each batch is padded only to
+        the length of similar texts.
+        """
+        if not self.embedding_model:
+            raise ValueError("Embedding model not set. Call set_embedding_model first.")
+        if not texts:
+            return np.empty((0, self.embedding_size), dtype=np.float32)
+
+        lengths = [len(ids) for ids in self.embedding_tokenizer(texts, truncation=True)["input_ids"]]
+        order = np.argsort(lengths, kind="stable")
+
+        embeddings = None
+        for start in range(0, len(texts), self.embedding_batch_size):
+            batch = order[start:start + self.embedding_batch_size]
+            batch_embeddings = self._embed_batch([texts[idx] for idx in batch])
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+            embeddings[batch] = batch_embeddings
+
+        return embeddings
+
     def embed_text(self, text: str, document_type: str = None):
         """Generate embeddings for the given text."""
         if not self.embedding_model:
             raise ValueError("Embedding model not set. Call set_embedding_model first.")
 
-        inputs = self.embedding_tokenizer(text, return_tensors="pt", padding=True, truncation=True)
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        cache_key = self.get_embedding_cache_key(text, document_type)
+        if self.embedding_cache is not None:
+            embedding = self.embedding_cache.get(cache_key)
+            if embedding is not None:
+                return embedding.copy()
 
-        with torch.no_grad():
-            embeddings = self.embedding_model(**inputs).last_hidden_state.mean(dim=1)
+        embedding = self._embed(text)
+        if self.embedding_cache is not None:
+            # A copy, so callers can't change the cached array (nor keep a whole batch alive)
+            self.embedding_cache.put(cache_key, embedding.copy())
+
+        return embedding
 
-        return embeddings.cpu().numpy()
+    async def aembed_text(self, text: str, document_type: str = None):
+        """Run the embedding forward pass in a worker thread; cache hits skip the thread hop."""
+        if not self.embedding_model:
+            raise ValueError("Embedding model not set. Call set_embedding_model first.")
+
+        cache_key = self.get_embedding_cache_key(text, document_type)
+        if self.embedding_cache is not None:
+            embedding = self.embedding_cache.get(cache_key)
+            CACHE_REQUESTS.inc("embedding", "miss" if embedding is None else "hit")
+            if embedding is not None:
+                return embedding.copy()
+
+        if self.embedding_batcher is not None:
+            embedding = await self.embedding_batcher.submit(text)
+        else:
+            embedding = await asyncio.to_thread(self._embed, text)
+        if self.embedding_cache is not None:
+            # A copy, so callers can't change the cached array (nor keep a whole batch alive)
+            self.embedding_cache.put(cache_key, embedding.copy())
+
+        return embedding
     
+    async def aclose(self):
+        if self.embedding_batcher is not None:
+            await self.embedding_batcher.aclose()
+
     def construct_prompt(self, role: str, prompt: str, full_prompt: str="") -> dict:
         return {
             "role": role,
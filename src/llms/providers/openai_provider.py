@@ -1,8 +1,42 @@
 from ..llm_interface import LLMInterface
 from ..llms_enums import OpenAIEnums
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient
+from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from concurrent.futures import ThreadPoolExecutor
+from utils.lru_cache import LRUCache
+from utils.tokens import count_tokens
+from utils.metrics import TOKENS, CACHE_REQUESTS
+from utils.call_policy import CallPolicy
 from typing import List, Dict
 from logging import getLogger
+from functools import partial
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import httpx
+import time
+
+
+# Errors worth retrying: the request may succeed on another attempt
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+# Longest wait between embedding retries, whatever the server asks for
+MAX_RETRY_DELAY = 60.0
+
+
+def parse_retry_after(value: str) -> float:
+    """Seconds to wait from a `retry-after` header, in seconds or as an HTTP date; None if invalid."""
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+
+    return max(0.0, seconds) if seconds == seconds else None  # NaN is invalid
 
 
 class OpenAIProvider(LLMInterface):
@@ -12,7 +46,25 @@ class OpenAIProvider(LLMInterface):
                  input_max_characters: int=1000,
                  max_output_tokens: int=1000,
                  temperature: float=0.1,
-                 top_p: float=0.95):
+                 top_p: float=0.95,
+                 max_connections: int=100,
+                 max_keepalive_connections: int=20,
+                 keepalive_expiry: float=30.0,
+                 request_timeout: float=60.0,
+                 embedding_cache_size: int=0,
+                 embedding_cache_ttl: float=None,
+                 embedding_batch_size: int=512,
+                 embedding_batch_max_tokens: int=200000,
+                 embedding_max_concurrency: int=4,
+                 embedding_max_retries: int=6,
+                 base_url: str=None,
+                 generation_call_policy: dict=None,
+                 embedding_call_policy: dict=None):
+        """
+        `generation_call_policy` and `embedding_call_policy` are CallPolicy kwargs (timeout,
+        retries, hedging, circuit breaker) for generation and query embedding calls; the
+        SDK's own retries are turned off for calls made under a policy.
+        """
 
         self.api_key = api_key
         self.vector_store = vector_store
@@ -28,9 +80,38 @@ class OpenAIProvider(LLMInterface):
         self.embedding_size = None
 
         self.client = OpenAI(
-            api_key = self.api_key
+            api_key = self.api_key,
+            base_url = base_url
         )
 
+        # One pooled async client per provider, shared by every concurrent request
+        self.async_client = AsyncOpenAI(
+            api_key = self.api_key,
+            base_url = base_url,
+            http_client = DefaultAsyncHttpxClient(
+                limits = httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry
+                ),
+                timeout = httpx.Timeout(request_timeout)
+            )
+        )
+
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_batch_max_tokens = embedding_batch_max_tokens
+        self.embedding_max_concurrency = embedding_max_concurrency
+        self.embedding_max_retries = embedding_max_retries
+
+        self.embedding_cache = LRUCache(max_size=embedding_cache_size, ttl=embedding_cache_ttl) \
+            if embedding_cache_size > 0 else None
+
+        self.generation_policy = CallPolicy(retryable=RETRYABLE_ERRORS, **generation_call_policy) \
+            if generation_call_policy is not None else None
+        self.embedding_policy = CallPolicy(retryable=RETRYABLE_ERRORS, **embedding_call_policy) \
+            if embedding_call_policy is not None else None
+        self.policy_client = self.async_client.with_options(max_retries=0)
+
         self.enums = OpenAIEnums
 
         self.logger = getLogger(__name__)
@@ -45,6 +126,24 @@ class OpenAIProvider(LLMInterface):
     def process_text(self, text: str):
         return text[:self.default_input_max_characters].strip()
 
+    async def _call(self, policy: CallPolicy, create, hedge: bool = True, **kwargs):
+        """Makes an API call under `policy`, or directly with the SDK's retries without one."""
+        if policy is None:
+            return await create(self.async_client)(**kwargs)
+        return await policy.call(partial(create(self.policy_client), **kwargs), hedge=hedge)
+
+    def call_policy_stats(self) -> dict:
+        return {
+            "generation": self.generation_policy.stats() if self.generation_policy is not None else None,
+            "embedding": self.embedding_policy.stats() if self.embedding_policy is not None else None,
+        }
+
+    @staticmethod
+    def _record_usage(usage):
+        if usage is not None:
+            TOKENS.inc("prompt", amount=usage.prompt_tokens)
+            TOKENS.inc("completion", amount=usage.completion_tokens)
+
     def generate_text(self, prompt: str, chat_history: list=[],
                       max_output_tokens: int=None, temperature: float = None,
                       top_p: float = None):
@@ -65,7 +164,13 @@ class OpenAIProvider(LLMInterface):
             self.construct_prompt(prompt=prompt, role=self.enums.USER.value)
         )
 
-        response = self.client.chat.completions.create(
+        client = self.client
+        if self.generation_policy is not None:
+            # No hedging for blocking calls, but the same bounds on time and retries
+            client = client.with_options(timeout=self.generation_policy.timeout,
+                                         max_retries=self.generation_policy.max_retries)
+
+        response = client.chat.completions.create(
             model = self.generation_model_id,
             messages = self.clean_messages(chat_history),
             max_tokens = max_output_tokens,
@@ -78,6 +183,85 @@ class OpenAIProvider(LLMInterface):
             return None
 
         return response.choices[0].message.content
+
+    async def agenerate_text(self, prompt: str, chat_history: list=None,
+                             max_output_tokens: int=None, temperature: float = None,
+                             top_p: float = None):
+
+        if not self.async_client:
+            self.logger.error("OpenAI async client was not set")
+            return None
+
+        if not self.generation_model_id:
+            self.logger.error("Generation model for OpenAI was not set")
+            return None
+
+        max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
+        temperature = temperature if temperature else self.default_generation_temperature
+        top_p = top_p if top_p else self.default_generation_top_p
+
+        # Build a new list so the caller's history is left untouched
+        messages = list(chat_history or []) + [
+            self.construct_prompt(prompt=prompt, role=self.enums.USER.value)
+        ]
+
+        response = await self._call(
+            self.generation_policy, lambda client: client.chat.completions.create,
+            model = self.generation_model_id,
+            messages = self.clean_messages(messages),
+            max_tokens = max_output_tokens,
+            temperature = temperature,
+            top_p=top_p
+        )
+
+        if not response or not response.choices or len(response.choices) == 0 or not response.choices[0].message:
+            self.logger.error("Error while generating text with OpenAI")
+            return None
+
+        self._record_usage(response.usage)
+
+        return response.choices[0].message.content
+
+    async def astream_text(self, prompt: str, chat_history: list=None,
+                           max_output_tokens: int=None, temperature: float = None,
+                           top_p: float = None):
+
+        if not self.async_client:
+            self.logger.error("OpenAI async client was not set")
+            return
+
+        if not self.generation_model_id:
+            self.logger.error("Generation model for OpenAI was not set")
+            return
+
+        max_output_tokens = max_output_tokens if max_output_tokens else self.default_generation_max_output_tokens
+        temperature = temperature if temperature else self.default_generation_temperature
+        top_p = top_p if top_p else self.default_generation_top_p
+
+        messages = list(chat_history or []) + [
+            self.construct_prompt(prompt=prompt, role=self.enums.USER.value)
+        ]
+
+        # An opened stream can't be discarded for another, so it is retried but not hedged
+        stream = await self._call(
+            self.generation_policy, lambda client: client.chat.completions.create, hedge=False,
+            model = self.generation_model_id,
+            messages = self.clean_messages(messages),
+            max_tokens = max_output_tokens,
+            temperature = temperature,
+            top_p=top_p,
+            stream=True,
+            stream_options={"include_usage": True}  # sent in a last chunk without choices
+        )
+
+        async for chunk in stream:
+            if not chunk.choices:
+                self._record_usage(chunk.usage)
+                continue
+
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
     
     def embed_text(self, text: str, document_type: str = None):
         
@@ -88,6 +272,12 @@ class OpenAIProvider(LLMInterface):
         if not self.embedding_model_id:
             self.logger.error("Embedding model for OpenAI was not set")
             return None
+
+        cache_key = self.get_embedding_cache_key(text, document_type)
+        if self.embedding_cache is not None:
+            embedding = self.embedding_cache.get(cache_key)
+            if embedding is not None:
+                return list(embedding)
         
         response = self.client.embeddings.create(
             model = self.embedding_model_id,
@@ -99,7 +289,123 @@ class OpenAIProvider(LLMInterface):
             self.logger.error("Error while embedding text with OpenAI")
             return None
 
-        return response.data[0].embedding
+        embedding = response.data[0].embedding
+        if self.embedding_cache is not None:
+            # Cached as a tuple and handed out as a new list, so callers can't change it
+            self.embedding_cache.put(cache_key, tuple(embedding))
+
+        return embedding
+
+    async def aembed_text(self, text: str, document_type: str = None):
+
+        if not self.async_client:
+            self.logger.error("OpenAI async client was not set")
+            return None
+
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for OpenAI was not set")
+            return None
+
+        cache_key = self.get_embedding_cache_key(text, document_type)
+        if self.embedding_cache is not None:
+            embedding = self.embedding_cache.get(cache_key)
+            CACHE_REQUESTS.inc("embedding", "miss" if embedding is None else "hit")
+            if embedding is not None:
+                return list(embedding)
+
+        response = await self._call(
+            self.embedding_policy, lambda client: client.embeddings.create,
+            model = self.embedding_model_id,
+            input = text,
+            dimensions=self.embedding_size
+        )
+
+        if not response or not response.data or len(response.data) == 0 or not response.data[0].embedding:
+            self.logger.error("Error while embedding text with OpenAI")
+            return None
+
+        embedding = response.data[0].embedding
+        if self.embedding_cache is not None:
+            # Cached as a tuple and handed out as a new list, so callers can't change it
+            self.embedding_cache.put(cache_key, tuple(embedding))
+
+        return embedding
+
+    def _make_embedding_batches(self, texts: List[str]) -> List[List[int]]:
+        """Group text indices into batches bounded by input count and total tokens."""
+        batches, batch, batch_tokens = [], [], 0
+        for idx, text in enumerate(texts):
+            text_tokens = count_tokens(text, self.embedding_model_id)
+            if batch and (len(batch) >= self.embedding_batch_size or
+                          batch_tokens + text_tokens > self.embedding_batch_max_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+
+            batch.append(idx)
+            batch_tokens += text_tokens
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _embed_batch(self, batch_texts: List[str]) -> list:
+        """Embed one batch, backing off on rate limits and transient errors."""
+        # Retries are handled here so the backoff can honour retry-after headers
+        client = self.client.with_options(max_retries=0)
+
+        for attempt in range(self.embedding_max_retries + 1):
+            try:
+                response = client.embeddings.create(
+                    model = self.embedding_model_id,
+                    input = batch_texts,
+                    dimensions=self.embedding_size
+                )
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError) as e:
+                if attempt == self.embedding_max_retries:
+                    raise
+
+                retry_after = None
+                response = getattr(e, "response", None)
+                if response is not None and response.headers.get("retry-after"):
+                    retry_after = parse_retry_after(response.headers["retry-after"])
+
+                delay = retry_after if retry_after else 2 ** attempt * (0.5 + random.random())
+                delay = min(delay, MAX_RETRY_DELAY)
+                self.logger.warning(f"Embedding batch failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_many(self, texts: List[str], document_type: str = None) -> list:
+        """Embed texts with batched requests sent by a bounded pool of workers.
+
+        Batches are sized by both input count and token count, and each batch retries with
+        jittered exponential backoff, so throughput is capped by the API rate limits
+        instead of per-request round trips.
+        """
+        if not self.client:
+            self.logger.error("OpenAI client was not set")
+            return None
+
+        if not self.embedding_model_id:
+            self.logger.error("Embedding model for OpenAI was not set")
+            return None
+
+        batches = self._make_embedding_batches(texts)
+        self.logger.info(f"Embedding {len(texts)} texts in {len(batches)} batches")
+
+        embeddings = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=self.embedding_max_concurrency) as executor:
+            batch_results = executor.map(
+                lambda batch: self._embed_batch([texts[idx] for idx in batch]), batches
+            )
+            for batch, batch_embeddings in zip(batches, batch_results):
+                for idx, embedding in zip(batch, batch_embeddings):
+                    embeddings[idx] = embedding
+
+        return embeddings
+
+    async def aclose(self):
+        await self.async_client.close()
 
     def construct_prompt(self, role: str, prompt: str, full_prompt: str="") -> dict:
         return {
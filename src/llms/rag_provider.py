@@ -1,47 +1,68 @@
+from utils.cleaning import normalize_query
+from utils.single_flight import SingleFlight
+from utils.stage_graph import StageGraph
+from utils.metrics import timed, record_time_to_first_token, CACHE_REQUESTS
+from utils.deadline import Deadline
+from utils.exceptions import CircuitOpenError
+from .llms_enums import DegradationEnums
+from logging import getLogger
+import asyncio
+import hashlib
+import time
+
+
+# Shares of a request's deadline each stage may take; generation gets what is left
+DEFAULT_STAGE_BUDGETS = {
+    "history": 0.1,
+    "embedding": 0.15,
+    "retrieval": 0.2,
+    "chat_log_write": 0.05,
+    "shrink_k_below": 0.5,
+}
+
+
 class RAGProvider:
-    def __init__(self, vectordb_client, chat_log_manager, generation_client, 
-                 embedding_client, template_parser):
+    def __init__(self, vectordb_client, chat_log_manager, generation_client,
+                 embedding_client, template_parser, answer_cache=None, context_packer=None,
+                 history_window=None, history_summarizer=None, coalesce_requests: bool = True,
+                 stage_budgets: dict = None):
         self.vectordb_client = vectordb_client
         self.chat_log_manager = chat_log_manager
         self.generation_client = generation_client
         self.embedding_client = embedding_client
         self.template_parser = template_parser
+        self.answer_cache = answer_cache
+        self.context_packer = context_packer
+        self.history_window = history_window
+        self.history_summarizer = history_summarizer
 
-    async def answer_rag_question(self, user_id: str, session_id: str,
-                                  query: str, limit: int = 5):
-        
-        answer, full_prompt, chat_history = None, None, None
-        
-        retrieved_documents = self.vectordb_client.query(
-            query_text=query,
-            k=limit
-        )
-
-        if not retrieved_documents or len(retrieved_documents) == 0:
-            return answer, full_prompt, chat_history
-        
-        # step2: Construct LLM prompt
-        system_prompt = self.template_parser.get("rag", "system_prompt")
+        # Concurrent identical queries share one embedding, retrieval and, for sessions
+        # without history, one generation
+        self.coalesce_requests = coalesce_requests
+        self.embedding_flight = SingleFlight()
+        self.retrieval_flight = SingleFlight()
+        self.generation_flight = SingleFlight()
 
-        documents_prompts = "\n".join([
-            self.template_parser.get("rag", "document_prompt", {
-                    "doc_num": idx + 1,
-                    "chunk_text": doc[0].page_content,#self.generation_client.process_text() if you want to cut texts
+        # With a request deadline, each stage is cut short at its budget and degraded
+        # (see DegradationEnums) instead of stalling the answer
+        self.stage_budgets = {**DEFAULT_STAGE_BUDGETS, **(stage_budgets or {})}
+        self.logger = getLogger(__name__)
 
-            })
-            for idx, doc in enumerate(retrieved_documents)
-        ])
-        footer_prompt = self.template_parser.get("rag", "footer_prompt",
-                                                 {"query": query})
+        # Stages can be added or replaced, e.g. "passages" by a reranking stage that awaits
+        # the original retrieval; each starts as soon as the stages it depends on are done
+        self.pipeline = self._build_pipeline()
 
-        mongo_chat_history = await self.chat_log_manager.get_chat_history(
-            user_id=user_id, session_id=session_id
-        )
+    @property
+    def answer_cache_version(self) -> tuple:
+        """Cached answers are only valid for the index and templates they were built from."""
+        return (self.vectordb_client.version, self.template_parser.version)
 
+    def _build_new_messages(self, query: str, chat_history: list = None) -> list:
         new_messages = []
 
         # Add the system prompt if it's a first-time user
-        if mongo_chat_history is None:
+        if chat_history is None:
+            system_prompt = self.template_parser.get("rag", "system_prompt")
             new_messages.append(
                 self.generation_client.construct_prompt(
                     prompt=system_prompt,
@@ -57,13 +78,251 @@ class RAGProvider:
             )
         )
 
-        full_prompt = "\n\n".join([documents_prompts,  footer_prompt])
+        return new_messages
 
-        # step4: Retrieve the Answer
-        answer = self.generation_client.generate_text(
-            prompt=full_prompt,
-            chat_history=mongo_chat_history if mongo_chat_history else new_messages
+    def _build_windowed_history(self, window: dict) -> list:
+        """System prompt, rolling summary and the most recent turns of a session."""
+        chat_history = [
+            self.generation_client.construct_prompt(
+                prompt=self.template_parser.get("rag", "system_prompt"),
+                role=self.generation_client.enums.SYSTEM.value,
+            )
+        ]
+
+        if window["summary"]:
+            chat_history.append(
+                self.generation_client.construct_prompt(
+                    prompt=self.template_parser.get("history", "summary_context_prompt",
+                                                    {"summary": window["summary"]}),
+                    role=self.generation_client.enums.SYSTEM.value,
+                )
+            )
+
+        # Turns older than the window that are not summarized yet are sent as they are
+        summarized_count = window["summarized_count"] if self.history_summarizer is not None else None
+        return chat_history + self.history_window.select(window["messages"], summarized_count)
+
+    async def _get_chat_history(self, user_id: str, session_id: str):
+        """Returns (chat history or None for a new session, position the summary is to
+        reach or None, summarized count)."""
+        if self.history_window is None:
+            chat_history = await self.chat_log_manager.get_chat_history(
+                user_id=user_id, session_id=session_id
+            )
+            return chat_history, None, 0
+
+        # Usually the turns the summary has yet to cover are within the last batch
+        last_n = self.history_window.max_messages
+        if self.history_summarizer is not None:
+            last_n += self.history_summarizer.batch_messages
+        window = await self.chat_log_manager.get_chat_window(
+            user_id=user_id, session_id=session_id, last_n=last_n
         )
+        if window is None:
+            return None, 0, 0
+
+        unsummarized = window["message_count"] - window["summarized_count"]
+        if self.history_summarizer is not None and unsummarized > len(window["messages"]):
+            # The summary fell behind, e.g. a run failed; read every turn it doesn't cover
+            window = await self.chat_log_manager.get_chat_window(
+                user_id=user_id, session_id=session_id, last_n=unsummarized
+            )
+
+        summarize_until = self.history_window.window_start(window["messages"], window["message_count"])
+        return self._build_windowed_history(window), summarize_until, window["summarized_count"]
+
+    async def _coalesce(self, flight: SingleFlight, key, fn, *args):
+        if not self.coalesce_requests:
+            return await fn(*args)
+        return await flight.do(key, fn, *args)
+
+    async def _embed_query(self, query: str):
+        with timed("embedding"):
+            return await self._coalesce(self.embedding_flight, normalize_query(query),
+                                        self.embedding_client.aembed_text, query)
+
+    async def _retrieve_passages(self, query: str, limit: int = 5, query_vector=None, lexical_rows=None):
+        """Retrieve documents for the query and pack them into prompt passages, or None if nothing was retrieved.
+
+        Without a `query_vector`, e.g. when embedding ran out of time, only keyword search is used.
+        """
+        if query_vector is None:
+            retrieved_documents = self.vectordb_client.lexical_query(query, limit, lexical_rows)
+        else:
+            with timed("vector_search"):
+                retrieved_documents = await self.vectordb_client.aquery(
+                    query_text=query,
+                    k=limit,
+                    query_vector=query_vector,
+                    lexical_rows=lexical_rows
+                )
+
+        if not retrieved_documents or len(retrieved_documents) == 0:
+            return None
+
+        chunks = [doc[0] for doc in retrieved_documents]
+        if self.context_packer is not None:
+            with timed("context_pack"):
+                return self.context_packer.pack(chunks)
+        return [chunk.page_content for chunk in chunks]
+
+    def _build_pipeline(self) -> StageGraph:
+        """The stages resolving what generation needs for a query.
+
+        History, query embedding and keyword search don't depend on each other and run
+        concurrently; the answer cache lookup and the vector search each start as soon as
+        their inputs are ready. Retrieval is not held back by the history fetch: when a
+        cached answer is used, the run is cancelled instead.
+        """
+        return StageGraph() \
+            .add_stage("history", self._history_stage) \
+            .add_stage("query_vector", self._query_vector_stage) \
+            .add_stage("lexical_rows", self._lexical_stage) \
+            .add_stage("new_messages", self._new_messages_stage, depends_on=("history",)) \
+            .add_stage("cached", self._answer_cache_stage, depends_on=("history", "query_vector")) \
+            .add_stage("passages", self._passages_stage, depends_on=("query_vector", "lexical_rows")) \
+            .add_stage("full_prompt", self._prompt_stage, depends_on=("passages",))
+
+    async def _history_stage(self, run):
+        deadline = run.inputs["deadline"]
+        try:
+            with timed("history"):
+                return await deadline.run(
+                    self._get_chat_history(user_id=run.inputs["user_id"], session_id=run.inputs["session_id"]),
+                    self.stage_budgets["history"]
+                )
+        except asyncio.TimeoutError:
+            # Answer without the earlier turns. The session may exist, so it is neither treated
+            # as new (no system prompt is logged again) nor summarized
+            deadline.degrade(DegradationEnums.SKIPPED_HISTORY.value)
+            system_prompt = self.generation_client.construct_prompt(
+                prompt=self.template_parser.get("rag", "system_prompt"),
+                role=self.generation_client.enums.SYSTEM.value,
+            )
+            return [system_prompt], None, None
+
+    async def _query_vector_stage(self, run):
+        deadline = run.inputs["deadline"]
+        try:
+            return await deadline.run(self._embed_query(run.inputs["query"]), self.stage_budgets["embedding"])
+        except (asyncio.TimeoutError, CircuitOpenError):
+            if getattr(self.vectordb_client, "lexical_index", None) is None:
+                deadline.degrade(DegradationEnums.NO_PASSAGES.value)
+            else:
+                deadline.degrade(DegradationEnums.KEYWORD_SEARCH_ONLY.value)
+            return None
+
+    async def _lexical_stage(self, run):
+        if getattr(self.vectordb_client, "lexical_index", None) is None:
+            return None
+        with timed("lexical_search"):
+            return await self.vectordb_client.alexical_search(run.inputs["query"], run.inputs["limit"])
+
+    async def _new_messages_stage(self, run):
+        chat_history, _, _ = await run.result("history")
+        return self._build_new_messages(run.inputs["query"], chat_history)
+
+    async def _answer_cache_stage(self, run):
+        """Cached answers are only used for sessions without history, since a follow-up
+        question may depend on earlier turns."""
+        chat_history, _, _ = await run.result("history")
+        if self.answer_cache is None or chat_history is not None:
+            return None
+        if await run.result("query_vector") is None:
+            return None
+
+        cached = self.answer_cache.get(run.inputs["query"], await run.result("query_vector"),
+                                       self.answer_cache_version)
+        CACHE_REQUESTS.inc("answer", "miss" if cached is None else "hit")
+        return cached
+
+    async def _passages_stage(self, run):
+        query, limit, deadline = run.inputs["query"], run.inputs["limit"], run.inputs["deadline"]
+        query_vector, lexical_rows = await run.result("query_vector"), await run.result("lexical_rows")
+        if query_vector is None and lexical_rows is None:
+            # Neither vector nor keyword search can run
+            return None
+
+        # Late requests retrieve fewer passages, so the prompt and its generation are shorter
+        if limit > 1 and deadline.share_left() < self.stage_budgets["shrink_k_below"]:
+            deadline.degrade(DegradationEnums.SHRUNK_K.value)
+            limit = max(1, limit // 2)
+
+        try:
+            # A coalesced request only sees the time it waited; its stages are timed by the first one
+            with timed("retrieval"):
+                return await deadline.run(
+                    self._coalesce(
+                        self.retrieval_flight,
+                        (normalize_query(query), limit, self.vectordb_client.version, query_vector is None),
+                        self._retrieve_passages, query, limit, query_vector, lexical_rows
+                    ),
+                    self.stage_budgets["retrieval"]
+                )
+        except asyncio.TimeoutError:
+            if lexical_rows is None:
+                deadline.degrade(DegradationEnums.NO_PASSAGES.value)
+                return None
+            deadline.degrade(DegradationEnums.KEYWORD_SEARCH_ONLY.value)
+            return await self._retrieve_passages(query, limit, None, lexical_rows)
+
+    async def _prompt_stage(self, run):
+        passages = await run.result("passages")
+        if passages is None:
+            return None
+
+        # step2: Construct LLM prompt
+        with timed("template_render"):
+            return self.template_parser.render_rag_prompt(passages, run.inputs["query"])
+
+    async def _prepare_rag_prompt(self, user_id: str, session_id: str,
+                                  query: str, limit: int = 5, deadline: Deadline = None):
+        """Resolve everything generation needs for a query by running the pipeline.
+
+        Returns:
+            dict: new_messages, chat_history, summarize_until, summarized_count, query_vector,
+                deadline and either `cached` (answer, full_prompt) or `full_prompt` and `passages`;
+                None if nothing was retrieved.
+        """
+        deadline = deadline or Deadline()
+
+        # Leaving the block cancels the stages whose results are not needed
+        async with self.pipeline.start(user_id=user_id, session_id=session_id,
+                                       query=query, limit=limit, deadline=deadline) as run:
+            mongo_chat_history, summarize_until, summarized_count = await run.result("history")
+
+            prepared = {
+                "new_messages": await run.result("new_messages"),
+                "chat_history": mongo_chat_history,
+                "summarize_until": summarize_until,
+                "summarized_count": summarized_count,
+                "query_vector": await run.result("query_vector"),
+                "cached": await run.result("cached"),
+                "full_prompt": None,
+                "passages": None,
+                "deadline": deadline,
+            }
+            if prepared["cached"] is not None:
+                return prepared
+
+            prepared["passages"] = await run.result("passages")
+            prepared["full_prompt"] = await run.result("full_prompt")
+            if prepared["full_prompt"] is None:
+                return None
+
+        return prepared
+
+    def _cache_answer(self, query: str, prepared: dict, answer: str):
+        # Answers to follow-up questions depend on the session, and degraded ones on the
+        # load at the time, so neither is shared
+        if self.answer_cache is not None and prepared["chat_history"] is None \
+                and not prepared["deadline"].degradations:
+            self.answer_cache.put(query, prepared["query_vector"], self.answer_cache_version,
+                                  answer, prepared["full_prompt"])
+
+    async def _save_answer(self, user_id: str, session_id: str, prepared: dict,
+                           answer: str, full_prompt: str):
+        new_messages = prepared["new_messages"]
 
         # Append the assistant's response
         new_messages.append(
@@ -75,10 +334,155 @@ class RAGProvider:
         )
 
         # Just append new messages to DB
-        await self.chat_log_manager.insert_or_update_chat_log(
+        write = asyncio.ensure_future(self.chat_log_manager.insert_or_update_chat_log(
             user_id=user_id,
             session_id=session_id,
             messages=new_messages  # only the delta, not the full history
+        ))
+        deadline = prepared["deadline"]
+        try:
+            with timed("chat_log_write"):
+                await deadline.run(asyncio.shield(write), self.stage_budgets["chat_log_write"])
+        except asyncio.TimeoutError:
+            # The answer is ready; the write completes after the response
+            deadline.degrade(DegradationEnums.CHAT_LOG_WRITE_DEFERRED.value)
+            write.add_done_callback(self._log_deferred_write_failure)
+
+        if self.history_summarizer is not None and prepared["summarize_until"] is not None:
+            self.history_summarizer.maybe_schedule(
+                user_id, session_id,
+                summarize_until=prepared["summarize_until"],
+                summarized_count=prepared["summarized_count"]
+            )
+
+    def _log_deferred_write_failure(self, write: asyncio.Future):
+        if not write.cancelled() and write.exception() is not None:
+            self.logger.error(f"Deferred chat log write failed: {write.exception()!r}")
+
+    async def _generate_answer(self, full_prompt: str, chat_history: list):
+        return await self.generation_client.agenerate_text(prompt=full_prompt, chat_history=chat_history)
+
+    def _fallback_answer(self, query: str, prepared: dict):
+        """The answer given when generation runs out of time or its circuit is open, as
+        (answer, full_prompt).
+
+        A cached answer to the same question is preferred, even in a session with history;
+        otherwise the retrieved passages are returned as they are. The prompt is always the
+        one built for this query, not the one a cached answer was generated from.
+        """
+        deadline = prepared["deadline"]
+        if self.answer_cache is not None and prepared["query_vector"] is not None:
+            cached = self.answer_cache.get(query, prepared["query_vector"], self.answer_cache_version)
+            if cached is not None:
+                deadline.degrade(DegradationEnums.CACHED_ANSWER.value)
+                return cached[0], prepared["full_prompt"]
+
+        deadline.degrade(DegradationEnums.RETRIEVAL_ONLY_ANSWER.value)
+        answer = "\n\n".join([self.template_parser.get("rag", "retrieval_only_prompt")] + prepared["passages"])
+        return answer, prepared["full_prompt"]
+
+    def coalescing_stats(self) -> dict:
+        return {
+            "enabled": self.coalesce_requests,
+            "embedding": self.embedding_flight.stats(),
+            "retrieval": self.retrieval_flight.stats(),
+            "generation": self.generation_flight.stats(),
+        }
+
+    async def answer_rag_question(self, user_id: str, session_id: str,
+                                  query: str, limit: int = 5, deadline: Deadline = None):
+        """Answers a query; with a `deadline`, the fallbacks taken are in `deadline.degradations`."""
+
+        answer, full_prompt, chat_history = None, None, None
+
+        prepared = await self._prepare_rag_prompt(user_id, session_id, query, limit, deadline)
+        if prepared is None:
+            return answer, full_prompt, chat_history
+
+        new_messages = prepared["new_messages"]
+
+        if prepared["cached"] is not None:
+            # No prompt was built for this query; the cached one may be another query's
+            answer, _ = prepared["cached"]
+            await self._save_answer(user_id, session_id, prepared, answer, None)
+            return answer, full_prompt, chat_history
+
+        full_prompt = prepared["full_prompt"]
+
+        # step4: Retrieve the Answer
+        if prepared["chat_history"] is None:
+            # Without history, the answer depends only on the prompt, which holds the query and
+            # the passages this request retrieved (fewer, or keyword-only, when degraded)
+            prompt_key = hashlib.sha256(full_prompt.encode("utf-8")).hexdigest()
+            generation = self._coalesce(
+                self.generation_flight, (prompt_key, self.answer_cache_version),
+                self._generate_answer, full_prompt, new_messages
+            )
+        else:
+            generation = self._generate_answer(full_prompt, prepared["chat_history"] or new_messages)
+
+        try:
+            with timed("generation"):
+                # Whatever is left, keeping time to write the chat log
+                answer = await prepared["deadline"].run(generation, reserve=self.stage_budgets["chat_log_write"])
+        except (asyncio.TimeoutError, CircuitOpenError):
+            answer, full_prompt = self._fallback_answer(query, prepared)
+
+        if answer:
+            self._cache_answer(query, prepared, answer)
+            await self._save_answer(user_id, session_id, prepared, answer, full_prompt)
+
+        return answer, full_prompt, chat_history
+
+    async def stream_rag_answer(self, user_id: str, session_id: str,
+                                query: str, limit: int = 5, deadline: Deadline = None):
+        """Yield the answer as it is generated, then write the chat log once it completes.
+
+        With a `deadline`, the first token must arrive in time; once it has, the rest of the
+        answer streams without a time limit.
+        """
+        prepared = await self._prepare_rag_prompt(user_id, session_id, query, limit, deadline)
+        if prepared is None:
+            return
+
+        new_messages = prepared["new_messages"]
+
+        if prepared["cached"] is not None:
+            answer, _ = prepared["cached"]
+            yield answer
+            await self._save_answer(user_id, session_id, prepared, answer, None)
+            return
+
+        full_prompt = prepared["full_prompt"]
+
+        answer_parts = []
+        start = time.perf_counter()
+        stream = self.generation_client.astream_text(
+            prompt=full_prompt,
+            chat_history=prepared["chat_history"] if prepared["chat_history"] else new_messages
         )
+        try:
+            with timed("generation"):
+                first_text = await prepared["deadline"].run(
+                    anext(stream, None), reserve=self.stage_budgets["chat_log_write"]
+                )
+                if first_text is not None:
+                    record_time_to_first_token(time.perf_counter() - start)
+                    answer_parts.append(first_text)
+                    yield first_text
+
+                async for text in stream:
+                    answer_parts.append(text)
+                    yield text
+        except (asyncio.TimeoutError, CircuitOpenError):
+            if answer_parts:
+                raise
+            answer, full_prompt = self._fallback_answer(query, prepared)
+            yield answer
+            await self._save_answer(user_id, session_id, prepared, answer, full_prompt)
+            return
 
-        return answer, full_prompt, chat_history
\ No newline at end of file
+        answer = "".join(answer_parts)
+        if answer:
+            self._cache_answer(query, prepared, answer)
+            await self._save_answer(user_id, session_id, prepared, answer, full_prompt)
@@ -0,0 +1,24 @@
+from string import Template
+
+#### CHAT HISTORY PROMPTS ####
+
+#### Summary ####
+summary_prompt = Template("\n".join([
+    "حدّث ملخص المحادثة بين المستخدم والمساعد.",
+    "احتفظ بالحقائق والأسماء والأرقام والأسئلة المفتوحة التي قد يحتاجها المساعد لاحقًا.",
+    "اكتب فقرة قصيرة على الأكثر بلغة المحادثة.",
+    "",
+    "الملخص الحالي:",
+    "$summary",
+    "",
+    "الرسائل الجديدة:",
+    "$messages",
+    "",
+    "## الملخص المحدّث:",
+]))
+
+#### Context ####
+summary_context_prompt = Template("\n".join([
+    "ملخص المحادثة السابقة مع المستخدم:",
+    "$summary",
+]))
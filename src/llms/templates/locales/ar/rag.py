@@ -22,6 +22,11 @@ document_prompt = Template(
     ])
 )
 
+#### Retrieval only ####
+retrieval_only_prompt = Template(
+    "لم أتمكن من تجهيز إجابة كاملة في الوقت المحدد. هذه أكثر المقاطع صلة بسؤالك:"
+)
+
 #### Footer ####
 footer_prompt = Template("\n".join([
     "السؤال: $query",
@@ -0,0 +1,24 @@
+from string import Template
+
+#### CHAT HISTORY PROMPTS ####
+
+#### Summary ####
+summary_prompt = Template("\n".join([
+    "Update the summary of a conversation between a user and an assistant.",
+    "Keep the facts, names, numbers and open questions the assistant may need later.",
+    "Write at most a short paragraph in the language of the conversation.",
+    "",
+    "Current summary:",
+    "$summary",
+    "",
+    "New messages:",
+    "$messages",
+    "",
+    "## Updated summary:",
+]))
+
+#### Context ####
+summary_context_prompt = Template("\n".join([
+    "Summary of the earlier conversation with the user:",
+    "$summary",
+]))
@@ -22,6 +22,12 @@ document_prompt = Template(
     ])
 )
 
+#### Retrieval only ####
+# Introduces the retrieved passages when an answer could not be generated in time
+retrieval_only_prompt = Template(
+    "I couldn't prepare a full answer in time. These are the most relevant passages I found for your question:"
+)
+
 #### Footer ####
 footer_prompt = Template("\n".join([
     "Question: $query",
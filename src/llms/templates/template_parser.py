@@ -1,18 +1,76 @@
 import os
+import asyncio
+import hashlib
+import importlib.util
+import logging
+from string import Template
+from types import MappingProxyType
+
+
+class CompiledTemplate:
+    """A `string.Template` parsed once into literal text and placeholder names.
+
+    `substitute` behaves like `Template.substitute` without re-scanning the template
+    on every call.
+    """
+
+    __slots__ = ("template", "parts")
+
+    def __init__(self, template: Template):
+        self.template = template.template
+        # Literal strings, and 1-tuples holding a placeholder name
+        self.parts = []
+
+        text, position = template.template, 0
+        for match in template.pattern.finditer(text):
+            literal = text[position:match.start()]
+            position = match.end()
+
+            if match.group("escaped") is not None:
+                literal += template.delimiter
+            elif match.group("invalid") is not None:
+                raise ValueError(f"Invalid placeholder in template at position {match.start('invalid')}")
+
+            if literal:
+                self.parts.append(literal)
+            name = match.group("named") or match.group("braced")
+            if name is not None:
+                self.parts.append((name,))
+
+        if position < len(text):
+            self.parts.append(text[position:])
+
+    def substitute(self, vars: dict) -> str:
+        return "".join(part if isinstance(part, str) else str(vars[part[0]]) for part in self.parts)
+
 
 class TemplateParser:
+    """Renders the prompt templates under `locales/<language>/<group>.py`.
+
+    All templates of the current and default languages are loaded and compiled once,
+    into a read-only registry of `group -> key -> CompiledTemplate` where keys missing in
+    the current language fall back to the default language. Rendering is then a dict
+    lookup plus a string join. With `start_watching`, the locale files are polled and
+    the registry and `version` are swapped in when they change.
+    """
 
     def __init__(self, language: str=None, default_language='en'):
         self.current_path = os.path.dirname(os.path.abspath(__file__))
         self.default_language = default_language
         self.language = None
+        self.version = None
+        self.templates = MappingProxyType({})
+
+        self._file_times = {}
+        self._watch_task = None
+        self.logger = logging.getLogger(__name__)
 
         self.set_language(language)
 
-    
+
     def set_language(self, language: str):
         if not language:
-            self.language = self.default_language
+            language = self.default_language
 
         language_path = os.path.join(self.current_path, "locales", language)
         if os.path.exists(language_path):
@@ -20,24 +78,115 @@ class TemplateParser:
         else:
             self.language = self.default_language
 
+        self.load()
+
+    def _template_files(self):
+        """(language, group, path) of every template file, default language first."""
+        languages = [self.default_language]
+        if self.language != self.default_language:
+            languages.append(self.language)
+
+        for language in languages:
+            language_path = os.path.join(self.current_path, "locales", language)
+            if not os.path.isdir(language_path):
+                continue
+
+            for file_name in sorted(os.listdir(language_path)):
+                if file_name.endswith(".py") and file_name != "__init__.py":
+                    yield language, file_name[:-3], os.path.join(language_path, file_name)
+
+    @staticmethod
+    def _load_module(language: str, group: str, path: str):
+        # Loaded from source rather than imported, so a reload picks up edits
+        spec = importlib.util.spec_from_file_location(f"llms.templates.locales.{language}.{group}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def load(self):
+        """Loads and compiles the templates, then swaps them in along with `version`."""
+        templates, file_times = {}, {}
+        for language, group, path in self._template_files():
+            file_times[path] = os.stat(path).st_mtime_ns
+            module = self._load_module(language, group, path)
+
+            group_templates = templates.setdefault(group, {})
+            for key, value in vars(module).items():
+                if isinstance(value, Template):
+                    # The current language is loaded last and overrides the default
+                    group_templates[key] = CompiledTemplate(value)
+
+        self.templates = MappingProxyType({
+            group: MappingProxyType(group_templates) for group, group_templates in templates.items()
+        })
+        self._file_times = file_times
+        self.version = self.compute_version()
+
+    def compute_version(self) -> str:
+        """Hash the template sources of the current and default languages.
+
+        Anything derived from rendered prompts (e.g. cached answers) can key on this to be
+        invalidated when a template changes.
+        """
+        digest = hashlib.sha1()
+        for language in sorted({self.language, self.default_language}):
+            language_path = os.path.join(self.current_path, "locales", language)
+            if not os.path.isdir(language_path):
+                continue
+
+            for file_name in sorted(os.listdir(language_path)):
+                if file_name.endswith(".py"):
+                    digest.update(f"{language}/{file_name}".encode("utf-8"))
+                    with open(os.path.join(language_path, file_name), "rb") as f:
+                        digest.update(f.read())
+
+        return digest.hexdigest()
+
     def get(self, group: str, key: str, vars: dict={}):
-        if not group or not key:
+        template = self.templates.get(group, {}).get(key)
+        if template is None:
             return None
 
-        group_path = os.path.join(self.current_path, "locales", self.language, f"{group}.py" )
-        targeted_language = self.language
-        if not os.path.exists(group_path):
-            group_path = os.path.join(self.current_path, "locales", self.default_language, f"{group}.py" )
-            targeted_language = self.default_language
+        return template.substitute(vars)
 
-        if not os.path.exists(group_path):
-            return None
-        
-        # import group module
-        module = __import__(f"llms.templates.locales.{targeted_language}.{group}", fromlist=[group])
+    def render_rag_prompt(self, passages: list, query: str) -> str:
+        """The documents and footer of a RAG prompt, rendered in one call."""
+        rag_templates = self.templates["rag"]
+        document_prompt = rag_templates["document_prompt"]
 
-        if not module:
-            return None
-        
-        key_attribute = getattr(module, key)
-        return key_attribute.substitute(vars)
\ No newline at end of file
+        documents_prompts = "\n".join([
+            document_prompt.substitute({"doc_num": idx + 1, "chunk_text": passage})
+            for idx, passage in enumerate(passages)
+        ])
+        footer_prompt = rag_templates["footer_prompt"].substitute({"query": query})
+
+        return "\n\n".join([documents_prompts, footer_prompt])
+
+    def _files_changed(self) -> bool:
+        current = {path: os.stat(path).st_mtime_ns for _, _, path in self._template_files()}
+        return current != self._file_times
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self._files_changed():
+                    self.load()
+                    self.logger.info(f"Reloaded prompt templates, version {self.version[:8]}")
+            except Exception as e:
+                # Keep serving the templates already loaded
+                self.logger.error(f"Failed to reload prompt templates: {e}")
+
+    def start_watching(self, interval: float):
+        """Reloads the templates whenever a locale file changes, polling every `interval` seconds."""
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(interval))
+
+    async def aclose(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+
+
+class IngestManifest:
+    """Tracks which files were ingested into the vector store.
+
+    Each file gets an entry with its content hash and the ids of the chunks it produced.
+    With that, a rebuild only needs to process new or modified files, and it can remove
+    the chunks of changed or deleted files from the index by id.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = {}  # relative file path -> {"hash": str, "chunk_ids": List[str]}
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Loads the manifest from disk; a missing manifest is treated as empty."""
+        if self.exists():
+            with open(self.path) as f:
+                self.files = json.load(f).get("files", {})
+        else:
+            self.files = {}
+        return self
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write to a temp file first so an interrupted save never leaves a truncated manifest
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": self.files}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+        """Returns the SHA-256 hex digest of a file's content."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def diff(self, current_hashes: dict):
+        """Compares the manifest with the files currently on disk.
+
+        Args:
+            current_hashes (dict): relative file path -> content hash of the files on disk.
+
+        Returns:
+            tuple: (added, modified, deleted) lists of relative file paths.
+        """
+        added = [path for path in current_hashes if path not in self.files]
+        modified = [
+            path for path, file_hash in current_hashes.items()
+            if path in self.files and self.files[path]["hash"] != file_hash
+        ]
+        deleted = [path for path in self.files if path not in current_hashes]
+        return added, modified, deleted
+
+    def chunk_ids(self, paths: list) -> list:
+        """Returns the chunk ids recorded for the given files."""
+        return [
+            chunk_id
+            for path in paths if path in self.files
+            for chunk_id in self.files[path]["chunk_ids"]
+        ]
+
+    def set_file(self, path: str, file_hash: str, chunk_ids: list):
+        self.files[path] = {"hash": file_hash, "chunk_ids": list(chunk_ids)}
+
+    def remove_file(self, path: str):
+        self.files.pop(path, None)
@@ -1,17 +1,76 @@
 import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from langchain_community.document_loaders import PyPDFLoader
 
+
+def extract_pdf(file_path: str):
+    """Extracts the pages of one PDF; runs inside the worker processes."""
+    return PyPDFLoader(file_path).load()
+
+
 class PDFLoader:
     """Loads PDF documents from a given directory."""
-    def __init__(self, directory: str):
+    def __init__(self, directory: str, max_workers: int = None, max_in_flight: int = None):
+        """
+        Args:
+            directory (str): The directory holding the PDF files.
+            max_workers (int, optional): Extraction processes. Defaults to the CPU count.
+            max_in_flight (int, optional): Files submitted but not yet consumed. Bounds memory
+                when the consumer (chunking, embedding) is slower than extraction. Defaults to 2 * max_workers.
+        """
         self.directory = directory
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or 2 * self.max_workers
         self.pdf_docs = []
 
+    def list_pdfs(self):
+        """Returns the PDF file names in the directory, sorted."""
+        return sorted(file for file in os.listdir(self.directory) if file.endswith(".pdf"))
+
+    def load_pdf(self, file: str):
+        """Loads the pages of a single PDF file, given relative to the directory."""
+        return extract_pdf(os.path.join(self.directory, file))
+
+    def iter_pdfs(self, files: list = None):
+        """Extracts PDFs across a process pool, yielding `(file, pages)` as each file finishes.
+
+        Pages keep the `source` and `page` metadata of PyPDFLoader. Files are yielded in
+        completion order, and at most `max_in_flight` files are extracted ahead of the consumer.
+        """
+        files = self.list_pdfs() if files is None else list(files)
+        if not files:
+            return
+
+        remaining_files = iter(files)
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(files))) as executor:
+            in_flight = {}
+
+            def submit_next():
+                file = next(remaining_files, None)
+                if file is not None:
+                    future = executor.submit(extract_pdf, os.path.join(self.directory, file))
+                    in_flight[future] = file
+
+            for _ in range(self.max_in_flight):
+                submit_next()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file = in_flight.pop(future)
+                    submit_next()
+                    yield file, future.result()
+
     def load_pdfs(self):
-        """Loads all PDF files from the specified directory."""
-        for file in os.listdir(self.directory):
-            if file.endswith(".pdf"):
-                loader = PyPDFLoader(os.path.join(self.directory, file))
-                self.pdf_docs.extend(loader.load())
-        return self.pdf_docs
+        """Loads all PDF files from the specified directory.
 
+        Documents are kept in directory order, and calling this again reloads them instead
+        of appending duplicates.
+        """
+        pages_by_file = dict(self.iter_pdfs())
+        self.pdf_docs = [
+            page
+            for file in self.list_pdfs() if file in pages_by_file
+            for page in pages_by_file[file]
+        ]
+        return self.pdf_docs
@@ -6,11 +6,23 @@ from config.settings import settings
 from llms.llm_provider_factory import LLMProviderFactory
 from vector_dbs.providers.vector_store import VectorStore
 from llms.rag_provider import RAGProvider
+from llms.answer_cache import AnswerCache
+from llms.context_packer import ContextPacker
+from llms.chat_history import ChatHistoryWindow, HistorySummarizer
 from llms.templates.template_parser import TemplateParser
 from mongo_db.chat_log_manager import ChatLogManager
+from mongo_db.chat_log_writer import ChatLogWriter
+from utils.readiness import ReadinessTracker
+from utils.logger import get_logger
+import asyncio
 
 
-async def lifespan(app: FastAPI):
+logger = get_logger(__name__)
+
+STARTUP_COMPONENTS = ["mongo", "templates", "generation_model", "embedding_model", "vector_store"]
+
+
+async def init_mongo(app: FastAPI):
 
     # MongoDb Connection
     app.mongo_conn = AsyncIOMotorClient(config.MONGODB_URL)
@@ -19,19 +31,34 @@ async def lifespan(app: FastAPI):
     app.chat_log_manager = ChatLogManager(
         mongo_conn=app.mongo_conn,
         db_client=app.db_client,
-        collection_name=config.MONGODB_COLLECTION
+        collection_name=config.MONGODB_COLLECTION,
+        bucket_size=settings.CHAT_LOG_BUCKET_SIZE,
+        store_prompts=settings.CHAT_LOG_STORE_PROMPTS,
+        ttl_days=settings.CHAT_LOG_TTL_DAYS,
+        session_cache_size=settings.CHAT_SESSION_CACHE_SIZE,
+        session_cache_bytes=settings.CHAT_SESSION_CACHE_BYTES,
+        session_cache_ttl=settings.CHAT_SESSION_CACHE_TTL,
+        session_cache_messages=settings.CHAT_SESSION_CACHE_MESSAGES
     )
+    await app.chat_log_manager.create_indexes()
+    await app.chat_log_manager.migrate_legacy_sessions()
+
+    app.chat_log_writer = ChatLogWriter(
+        chat_log_manager=app.chat_log_manager,
+        max_batch_size=settings.CHAT_LOG_FLUSH_BATCH_SIZE,
+        flush_interval=settings.CHAT_LOG_FLUSH_INTERVAL,
+        max_pending=settings.CHAT_LOG_MAX_PENDING
+    ) if settings.CHAT_LOG_WRITE_BEHIND else None
+
 
+def load_templates(app: FastAPI):
     app.template_parser = TemplateParser(
         language=settings.PRIMARY_LANG,
         default_language=settings.DEFAULT_LANG
     )
 
-    llm_provider_factory = LLMProviderFactory(
-        config=config,
-        settings=settings
-    )
 
+def load_generation_model(app: FastAPI, llm_provider_factory: LLMProviderFactory):
     app.generation_client = llm_provider_factory.create(
         provider=settings.GENERATION_BACKEND
     )
@@ -39,34 +66,152 @@ async def lifespan(app: FastAPI):
         model_id=settings.GENERATION_MODEL_ID
     )
 
-    app.embedding_client = llm_provider_factory.create(
-        provider=settings.EMBEDDING_BACKEND
-    )
-    app.embedding_client.set_embedding_model(
-        model_id=settings.EMBEDDING_MODEL_ID,
-        embedding_size=settings.EMBEDDING_MODEL_SIZE
+
+async def load_embedding_model(app: FastAPI, llm_provider_factory: LLMProviderFactory,
+                               client_created: asyncio.Event):
+    try:
+        app.embedding_client = await asyncio.to_thread(
+            llm_provider_factory.create, settings.EMBEDDING_BACKEND
+        )
+    finally:
+        client_created.set()
+
+    await asyncio.to_thread(
+        app.embedding_client.set_embedding_model,
+        settings.EMBEDDING_MODEL_ID,
+        settings.EMBEDDING_MODEL_SIZE
     )
 
-    app.vector_store = VectorStore()
-    app.vector_store.load_vector_store(
+
+async def load_vector_store(app: FastAPI, client_created: asyncio.Event):
+    # The store only keeps the embedding functions, so the model may still be loading
+    await client_created.wait()
+    if getattr(app, "embedding_client", None) is None:
+        raise RuntimeError("The embedding client could not be created")
+
+    app.vector_store = VectorStore.from_settings(settings)
+    await asyncio.to_thread(
+        app.vector_store.load_vector_store,
         settings.VECTOR_STORE_PATH,
-        app.embedding_client.embed_text
+        app.embedding_client.embed_text,
+        app.embedding_client.aembed_text
+    )
+
+
+async def initialize(app: FastAPI):
+    """Warms up the independent components concurrently, then wires the RAG client."""
+    llm_provider_factory = LLMProviderFactory(
+        config=config,
+        settings=settings
+    )
+    embedding_client_created = asyncio.Event()
+
+    readiness = app.readiness
+    await asyncio.gather(
+        readiness.run("mongo", init_mongo, app),
+        readiness.run_in_thread("templates", load_templates, app),
+        readiness.run_in_thread("generation_model", load_generation_model, app, llm_provider_factory),
+        readiness.run("embedding_model", load_embedding_model, app, llm_provider_factory,
+                      embedding_client_created),
+        readiness.run("vector_store", load_vector_store, app, embedding_client_created),
+    )
+
+    if settings.TEMPLATE_RELOAD_INTERVAL:
+        app.template_parser.start_watching(settings.TEMPLATE_RELOAD_INTERVAL)
+
+    app.answer_cache = AnswerCache(
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        ttl=settings.ANSWER_CACHE_TTL
+    ) if settings.ANSWER_CACHE_MAX_ENTRIES > 0 else None
+
+    history_window = ChatHistoryWindow(
+        max_turns=settings.HISTORY_MAX_TURNS,
+        token_budget=settings.HISTORY_TOKEN_BUDGET,
+        model_id=settings.GENERATION_MODEL_ID
+    )
+    app.history_summarizer = HistorySummarizer(
+        chat_log_manager=app.chat_log_manager,
+        generation_client=app.generation_client,
+        template_parser=app.template_parser,
+        batch_messages=settings.HISTORY_SUMMARIZE_BATCH,
+        max_output_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS
     )
 
     app.rag_client = RAGProvider(
         vectordb_client=app.vector_store,
-        chat_log_manager=app.chat_log_manager,
+        # The writer serves reads of the messages it has not written yet
+        chat_log_manager=app.chat_log_writer or app.chat_log_manager,
         generation_client=app.generation_client,
         embedding_client=app.embedding_client,
-        template_parser=app.template_parser
+        template_parser=app.template_parser,
+        answer_cache=app.answer_cache,
+        context_packer=ContextPacker(
+            token_budget=settings.CONTEXT_TOKEN_BUDGET,
+            model_id=settings.GENERATION_MODEL_ID,
+            near_duplicate_threshold=settings.CONTEXT_NEAR_DUPLICATE_THRESHOLD,
+            token_cache_size=settings.TOKEN_COUNT_CACHE_SIZE
+        ),
+        history_window=history_window,
+        history_summarizer=app.history_summarizer,
+        coalesce_requests=settings.COALESCE_REQUESTS,
+        stage_budgets={
+            "history": settings.HISTORY_BUDGET,
+            "embedding": settings.EMBEDDING_BUDGET,
+            "retrieval": settings.RETRIEVAL_BUDGET,
+            "chat_log_write": settings.CHAT_LOG_WRITE_BUDGET,
+            "shrink_k_below": settings.SHRINK_K_BELOW,
+        }
     )
-    
-    yield  # This is where FastAPI runs the application
+
+    app.readiness.mark_ready()
+    logger.info(f"Ready in {app.readiness.report()['startup_seconds']}s: {app.readiness.components}")
+
+
+def log_startup_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Startup failed: {task.exception()!r}")
+
+
+async def close_components(app: FastAPI):
+    """Closes whatever was initialized, in dependency order."""
+
+    # Finish pending summaries before the clients they use are closed
+    if getattr(app, "history_summarizer", None) is not None:
+        await app.history_summarizer.aclose()
+    if getattr(app, "chat_log_writer", None) is not None:
+        await app.chat_log_writer.aclose()
+
+    if getattr(app, "template_parser", None) is not None:
+        await app.template_parser.aclose()
 
     # Closing connections
-    app.mongo_conn.close()
+    if getattr(app, "generation_client", None) is not None:
+        await app.generation_client.aclose()
+    if getattr(app, "embedding_client", None) is not None:
+        await app.embedding_client.aclose()
+    if getattr(app, "mongo_conn", None) is not None:
+        app.mongo_conn.close()
+
+
+async def lifespan(app: FastAPI):
+
+    # Components warm up in the background; until they are all ready, /api/v1/ready and
+    # the chatbot routes answer 503
+    app.readiness = ReadinessTracker(STARTUP_COMPONENTS)
+    startup_task = asyncio.create_task(initialize(app))
+    startup_task.add_done_callback(log_startup_failure)
+
+    yield  # This is where FastAPI runs the application
+
+    if not startup_task.done():
+        startup_task.cancel()
+        await asyncio.gather(startup_task, return_exceptions=True)
+
+    await close_components(app)
 
 app = FastAPI(lifespan=lifespan)
 
 app.include_router(base.base_router)
-app.include_router(nlp.chatbot_router)
\ No newline at end of file
+app.include_router(base.metrics_router)
+app.include_router(nlp.chatbot_router)
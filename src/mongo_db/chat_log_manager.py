@@ -1,67 +1,409 @@
-from datetime import datetime, timezone
-from typing import List, Dict, Optional
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from utils.lru_cache import LRUCache
+
+# MongoDB error code for creating an index that exists with different options
+INDEX_OPTIONS_CONFLICT = 85
+# MongoDB error code for a write that violates a unique index
+DUPLICATE_KEY = 11000
+
+
+def _session_bytes(session: Dict) -> int:
+    """Approximate memory held by a cached session: the text of its messages and summary."""
+    return len(session["summary"] or "") + sum(
+        len(str(value)) for message in session["messages"] for value in message.values()
+    )
+
 
 class ChatLogManager:
-    def __init__(self, mongo_conn, db_client, collection_name):
+    def __init__(self, mongo_conn, db_client, collection_name,
+                 bucket_size: int = 50, store_prompts: bool = True, ttl_days: Optional[int] = None,
+                 session_cache_size: int = 10000, session_cache_bytes: int = 0,
+                 session_cache_ttl: Optional[float] = None, session_cache_messages: int = 50):
         """
         Initialize the ChatLogManager with a MongoDB database and collection name.
 
-        Collection name could be changed into a method instead of being as constructor
+        A chat log is spread over three collections:
+            - `collection_name`: one small document per session (counters, rolling summary).
+            - `<collection_name>_messages`: the messages, in buckets of `bucket_size`, so no
+              document grows with the session and reads fetch only the buckets they need.
+            - `<collection_name>_prompts`: the full RAG prompt behind each answer, only
+              written when `store_prompts` is set.
+
+        With `ttl_days`, a session and all its documents are removed by MongoDB TTL indexes
+        once it has been inactive for that many days.
+
+        With `session_cache_bytes`, the counters, summary and last `session_cache_messages`
+        messages of recently used sessions are cached in memory (LRU, expiring after
+        `session_cache_ttl` seconds), populated on read and updated on append, so an active
+        conversation is served without reading MongoDB. An append that finds the session
+        changed by another process drops the cached entry.
         """
         # Initialize MongoDB client and collection using Motor
         self.mongo_conn = mongo_conn
         self.db_client = db_client
         self.collection = self.db_client[collection_name]
+        self.messages_collection = self.db_client[f"{collection_name}_messages"]
+        self.prompts_collection = self.db_client[f"{collection_name}_prompts"]
+
+        self.bucket_size = bucket_size
+        self.store_prompts = store_prompts
+        self.ttl = timedelta(days=ttl_days) if ttl_days else None
+
+        self.session_cache = LRUCache(
+            max_size=session_cache_size, ttl=session_cache_ttl,
+            max_weight=session_cache_bytes, weigher=_session_bytes
+        ) if session_cache_bytes > 0 else None
+        self.session_cache_messages = session_cache_messages
+        # (user_id, session_id) -> token of the read filling the cache; an append revokes it
+        self._cache_loads = {}
+        self.mongo_reads = 0
+
+    async def _create_ttl_index(self, collection, field: str):
+        expire_after_seconds = int(self.ttl.total_seconds())
+        try:
+            await collection.create_index(field, name=f"{field}_ttl", expireAfterSeconds=expire_after_seconds)
+        except OperationFailure as e:
+            if e.code != INDEX_OPTIONS_CONFLICT:
+                raise
+            # The TTL changed since the index was created
+            await self.db_client.command({
+                "collMod": collection.name,
+                "index": {"name": f"{field}_ttl", "expireAfterSeconds": expire_after_seconds}
+            })
+
+    async def create_indexes(self):
+        """
+        Create the indexes chat logs are read by, and the TTL indexes if `ttl_days` is set.
+        """
+        session_key = [("user_id", ASCENDING), ("session_id", ASCENDING)]
+
+        await self.collection.create_index(session_key, unique=True)
+        await self.messages_collection.create_index(session_key + [("bucket", ASCENDING)], unique=True)
+        await self.prompts_collection.create_index(session_key + [("message_index", ASCENDING)])
+
+        if self.ttl is not None:
+            for collection in (self.collection, self.messages_collection, self.prompts_collection):
+                await self._create_ttl_index(collection, "last_activity_at")
+
+    async def migrate_legacy_sessions(self) -> int:
+        """
+        Move the messages of sessions stored as a single document into buckets.
+
+        The buckets are written first, and can be written again, so a migration that is
+        interrupted or runs in several workers at once loses nothing; only then are the
+        messages removed from the session document.
+
+        Returns:
+            int: The number of sessions migrated.
+        """
+        migrated = 0
+        legacy_sessions = self.collection.find(
+            {"messages": {"$exists": True}}, {"_id": 1, "user_id": 1, "session_id": 1, "messages": 1}
+        )
+        async for legacy in legacy_sessions:
+            await self._write_messages(legacy["user_id"], legacy["session_id"], 0, legacy["messages"])
+
+            # Set the counter and drop the messages in one step, unless another worker did
+            now = datetime.now(timezone.utc)
+            result = await self.collection.update_one(
+                {"_id": legacy["_id"], "messages": {"$exists": True}},
+                [
+                    {"$set": {
+                        "message_count": {"$add": [{"$ifNull": ["$message_count", 0]}, {"$size": "$messages"}]},
+                        "last_activity_at": now,
+                        "expiry_refreshed_at": now,
+                    }},
+                    {"$unset": "messages"},
+                ]
+            )
+            migrated += result.modified_count
+
+        if migrated:
+            print(f"✅ Migrated {migrated} chat sessions to bucketed messages")
+        return migrated
+
+    def _message_operations(self, user_id: str, session_id: str, first_index: int,
+                            messages: List[Dict], now: datetime) -> Tuple[List[UpdateOne], List[UpdateOne]]:
+        """
+        Bucket and prompt upserts that store `messages` from position `first_index`.
+
+        They can be applied again: a bucket that already holds the messages no longer
+        matches its filter, so its upsert fails on the unique bucket index instead of
+        pushing them twice, and prompts are only inserted if missing.
+        """
+        buckets, prompts = {}, []
+        for index, message in enumerate(messages, start=first_index):
+            message = dict(message)
+            full_prompt = message.pop("full_prompt", None)
+            message["index"] = index
+            buckets.setdefault(index // self.bucket_size, []).append(message)
+
+            if self.store_prompts and full_prompt:
+                prompt_key = {"user_id": user_id, "session_id": session_id, "message_index": index}
+                prompts.append(UpdateOne(
+                    prompt_key,
+                    {"$setOnInsert": {**prompt_key, "full_prompt": full_prompt, "timestamp": now,
+                                      "last_activity_at": now}},
+                    upsert=True
+                ))
+
+        operations = [
+            UpdateOne(
+                {"user_id": user_id, "session_id": session_id, "bucket": bucket,
+                 "messages.index": {"$ne": bucket_messages[0]["index"]}},
+                {
+                    "$setOnInsert": {"user_id": user_id, "session_id": session_id, "bucket": bucket},
+                    "$set": {"last_activity_at": now},
+                    # Concurrent appends may arrive out of order; keep each bucket sorted by index
+                    "$push": {"messages": {"$each": bucket_messages, "$sort": {"index": 1}}},
+                },
+                upsert=True
+            )
+            for bucket, bucket_messages in buckets.items()
+        ]
+        return operations, prompts
+
+    async def _bulk_write(self, operations: List[UpdateOne], prompts: List[UpdateOne]):
+        if operations:
+            try:
+                await self.messages_collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Duplicate keys are buckets that already hold their messages
+                if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]) \
+                        or e.details.get("writeConcernErrors"):
+                    raise
+        if prompts:
+            await self.prompts_collection.bulk_write(prompts, ordered=False)
+
+    async def _write_messages(self, user_id: str, session_id: str, first_index: int, messages: List[Dict]):
+        operations, prompts = self._message_operations(
+            user_id, session_id, first_index, messages, datetime.now(timezone.utc)
+        )
+        await self._bulk_write(operations, prompts)
+
+    async def _refresh_expiry(self, user_id: str, session_id: str, session: Dict):
+        """Keep the older buckets and prompts of an active session from expiring before it."""
+        now = datetime.now(timezone.utc)
+        refreshed_at = session.get("expiry_refreshed_at")
+        if refreshed_at is not None and refreshed_at.tzinfo is None:
+            refreshed_at = refreshed_at.replace(tzinfo=timezone.utc)
+        if refreshed_at is not None and now - refreshed_at < self.ttl / 2:
+            return
+
+        document_filter = {"user_id": user_id, "session_id": session_id}
+        update = {"$set": {"last_activity_at": now}}
+        await self.messages_collection.update_many(document_filter, update)
+        await self.prompts_collection.update_many(document_filter, update)
+        await self.collection.update_one(document_filter, {"$set": {"expiry_refreshed_at": now}})
+
+    async def _reserve_positions(self, user_id: str, session_id: str,
+                                 count: int, now: datetime) -> Optional[Dict]:
+        """
+        Reserve `count` message positions in a session, creating it if needed.
+
+        Returns the session as it was before, whose `message_count` is where the new
+        messages start, or None if the session was just created.
+        """
+        return await self.collection.find_one_and_update(
+            {"user_id": user_id, "session_id": session_id},
+            {
+                "$setOnInsert": {
+                    "timestamp": now,
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "expiry_refreshed_at": now,
+                },
+                "$set": {"last_activity_at": now},
+                "$inc": {"message_count": count},
+            },
+            projection={"message_count": 1, "expiry_refreshed_at": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
 
     async def insert_or_update_chat_log(
         self,
         user_id: str,
         session_id: str,
-        messages: List[str]
+        messages: List[Dict]
     ):
         """
         Append messages to an existing chat session, or insert a new session if not found.
 
+        The `full_prompt` of each message goes to the prompts collection, not the message.
+
         Args:
             user_id (str): The user ID
             session_id (str): The session ID
-            query_message (str): The query message sent by the user
-            rag_response (str): The response generated by the RAG model
-            full_prompt (str): The full prompt used in the RAG model for context
+            messages (List[Dict]): The new messages, in order
         """
-
-        # Filter to find the session by user_id and session_id
-        document_filter = {"user_id": user_id, "session_id": session_id}
-        
-        # Update document with new messages
-        update_doc = {
-            "$setOnInsert": {
-                "timestamp": datetime.now(timezone.utc),
-                "user_id": user_id,
-                "session_id": session_id
-            },
-            "$push": {
-                "messages": {
-                    "$each": messages
-                }
-            }
-        }
-
         try:
-            # Update the session or insert a new one if not found
-            result = await self.collection.update_one(
-                filter=document_filter,
-                update=update_doc,
-                upsert=True  # Create if it doesn't exist
-            )
+            session = await self._reserve_positions(user_id, session_id, len(messages),
+                                                    datetime.now(timezone.utc))
+
+            first_index = session.get("message_count", 0) if session else 0
+            await self._write_messages(user_id, session_id, first_index, messages)
+            self._cache_append(user_id, session_id, session, first_index, messages)
 
-            if result.matched_count:
+            if session:
+                if self.ttl is not None:
+                    await self._refresh_expiry(user_id, session_id, session)
                 print(f"✅ Appended message to existing chat for user {user_id}, session {session_id}")
             else:
                 print(f"✅ Created new chat log for user {user_id}, session {session_id}")
         except Exception as e:
             print(f"❌ Failed to update or insert chat log: {e}")
 
+    async def reserve_chat_log(self, user_id: str, session_id: str, count: int) -> Optional[Dict]:
+        """
+        Reserve positions for `count` new messages of a session, creating it if needed.
+
+        Returns the session as `write_chat_logs` and `refresh_chat_logs_expiry` take it.
+        Errors are raised so the caller can retry.
+        """
+        return await self._reserve_positions(user_id, session_id, count, datetime.now(timezone.utc))
+
+    async def write_chat_logs(self, chat_logs: List[Tuple[str, str, List[Dict]]],
+                              sessions: List[Optional[Dict]]):
+        """
+        Write the messages of several chat sessions at the positions reserved for them.
+
+        All buckets are written with a single `bulk_write` and all prompts with another.
+        Errors are raised, and the write can be retried with the same sessions: messages
+        already written are not written again.
+
+        Args:
+            chat_logs (List[Tuple[str, str, List[Dict]]]): (user_id, session_id, messages)
+                per session, each session at most once.
+            sessions (List[Optional[Dict]]): What `reserve_chat_log` returned for each.
+        """
+        now = datetime.now(timezone.utc)
+        operations, prompts = [], []
+        for (user_id, session_id, messages), session in zip(chat_logs, sessions):
+            first_index = session.get("message_count", 0) if session else 0
+            session_operations, session_prompts = self._message_operations(
+                user_id, session_id, first_index, messages, now
+            )
+            operations.extend(session_operations)
+            prompts.extend(session_prompts)
+
+        await self._bulk_write(operations, prompts)
+        for (user_id, session_id, messages), session in zip(chat_logs, sessions):
+            self._cache_append(user_id, session_id, session,
+                               session.get("message_count", 0) if session else 0, messages)
+
+    async def refresh_chat_logs_expiry(self, chat_logs: List[Tuple[str, str, List[Dict]]],
+                                       sessions: List[Optional[Dict]]):
+        """Keep the older documents of the sessions just written from expiring, if `ttl_days` is set."""
+        if self.ttl is not None:
+            await asyncio.gather(*(
+                self._refresh_expiry(user_id, session_id, session)
+                for (user_id, session_id, _), session in zip(chat_logs, sessions)
+                if session
+            ))
+
+    def _cache_append(self, user_id: str, session_id: str, session: Optional[Dict],
+                      first_index: int, messages: List[Dict]):
+        """Apply an append to the cached session, or drop the entry if it missed other appends."""
+        if self.session_cache is None:
+            return
+
+        key = (user_id, session_id)
+        # A read that started before this append must not cache what it read
+        self._cache_loads.pop(key, None)
+        cached = self.session_cache.pop(key)
+
+        if session is None:
+            cached = {"summary": None, "summarized_count": 0, "message_count": 0, "messages": []}
+        elif cached is None or cached["message_count"] != first_index:
+            return
+
+        stored = [
+            {**{field: value for field, value in message.items() if field != "full_prompt"}, "index": index}
+            for index, message in enumerate(messages, start=first_index)
+        ]
+        self.session_cache.put(key, {
+            **cached,
+            "message_count": first_index + len(messages),
+            "messages": (cached["messages"] + stored)[-self.session_cache_messages:],
+        })
+
+    async def _get_session(self, user_id: str, session_id: str) -> Optional[Dict]:
+        return await self.collection.find_one(
+            {"user_id": user_id, "session_id": session_id},
+            {"_id": 0, "message_count": 1, "summary": 1, "summarized_count": 1}
+        )
+
+    async def _read_messages(self, user_id: str, session_id: str, start: int, end: int) -> List[Dict]:
+        """Messages with `start <= index < end`, in order."""
+        if end <= start:
+            return []
+
+        cursor = self.messages_collection.find(
+            {
+                "user_id": user_id,
+                "session_id": session_id,
+                "bucket": {"$gte": start // self.bucket_size, "$lte": (end - 1) // self.bucket_size},
+            },
+            {"_id": 0, "messages": 1}
+        ).sort("bucket", ASCENDING)
+
+        messages = []
+        async for bucket in cursor:
+            messages.extend(
+                message for message in bucket.get("messages", [])
+                if start <= message.get("index", -1) < end
+            )
+        return messages
+
+    async def _load_window(self, user_id: str, session_id: str, last_n: int) -> Optional[Dict]:
+        """Read the session and its last messages from MongoDB, caching them."""
+        key = (user_id, session_id)
+        token = object()
+        if self.session_cache is not None:
+            self._cache_loads[key] = token
+            # Read enough for any later window to be served from the cache
+            last_n = max(last_n, self.session_cache_messages)
+
+        try:
+            self.mongo_reads += 1
+            session = await self._get_session(user_id, session_id)
+            if not session:
+                return None
+
+            message_count = session.get("message_count", 0)
+            window = {
+                "messages": await self._read_messages(user_id, session_id,
+                                                      max(message_count - last_n, 0), message_count),
+                "summary": session.get("summary"),
+                "summarized_count": session.get("summarized_count", 0),
+                "message_count": message_count,
+            }
+
+            if self._cache_loads.get(key) is token:
+                self.session_cache.put(key, {
+                    **window, "messages": window["messages"][-self.session_cache_messages:]
+                })
+            return window
+        finally:
+            if self._cache_loads.get(key) is token:
+                del self._cache_loads[key]
+
+    async def _get_window(self, user_id: str, session_id: str, last_n: int) -> Optional[Dict]:
+        if self.session_cache is not None:
+            cached = self.session_cache.get((user_id, session_id))
+            # The cache holds the last `session_cache_messages` messages, or all of them
+            if cached is not None and (last_n <= len(cached["messages"])
+                                       or len(cached["messages"]) == cached["message_count"]):
+                return cached
+
+        return await self._load_window(user_id, session_id, last_n)
+
     async def get_chat_history(self, user_id: str, session_id: str) -> Optional[List[Dict]]:
         """
         Fetch the chat history for a given user_id and session_id.
@@ -73,19 +415,97 @@ class ChatLogManager:
         Returns:
             List[Dict]: A list of messages for the specified chat session, or None if not found.
         """
-        # Filter to find the chat history by user_id and session_id
-        document_filter = {"user_id": user_id, "session_id": session_id}
-        
         try:
-            # Retrieve the document from the collection
-            document = await self.collection.find_one(document_filter)
+            window = await self._get_window(user_id, session_id, last_n=sys.maxsize)
 
-            if document:
+            if window:
                 # Return the messages from the chat history
-                return document.get("messages", [])
+                return list(window["messages"])
             else:
                 print(f"❌ No chat history found for user {user_id}, session {session_id}")
                 return None
         except Exception as e:
             print(f"❌ Failed to retrieve chat history: {e}")
             return None
+
+    async def get_chat_window(self, user_id: str, session_id: str, last_n: int) -> Optional[Dict]:
+        """
+        Fetch only the tail of a chat session plus its rolling summary.
+
+        Args:
+            user_id (str): The user ID
+            session_id (str): The session ID
+            last_n (int): Number of most recent messages to return
+
+        Returns:
+            Dict: `messages` (the last `last_n`), `summary`, `summarized_count` and
+                `message_count`, or None if the session is not found.
+        """
+        try:
+            window = await self._get_window(user_id, session_id, last_n)
+            if not window:
+                return None
+
+            return {**window, "messages": window["messages"][-last_n:] if last_n > 0 else []}
+        except Exception as e:
+            print(f"❌ Failed to retrieve chat window: {e}")
+            return None
+
+    async def get_messages(self, user_id: str, session_id: str, skip: int, limit: int) -> List[Dict]:
+        """
+        Fetch `limit` messages of a chat session starting at position `skip`.
+        """
+        try:
+            return await self._read_messages(user_id, session_id, skip, skip + limit)
+        except Exception as e:
+            print(f"❌ Failed to retrieve chat messages: {e}")
+            return []
+
+    async def get_prompt(self, user_id: str, session_id: str, message_index: int) -> Optional[str]:
+        """
+        Fetch the full RAG prompt stored for a message, if prompts are stored.
+        """
+        document = await self.prompts_collection.find_one(
+            {"user_id": user_id, "session_id": session_id, "message_index": message_index},
+            {"_id": 0, "full_prompt": 1}
+        )
+        return document["full_prompt"] if document else None
+
+    async def update_summary(self, user_id: str, session_id: str, summary: str,
+                             summarized_count: int, previous_summarized_count: int) -> bool:
+        """
+        Store a new rolling summary covering the first `summarized_count` messages.
+
+        The update only applies if the summary was not advanced by someone else in the
+        meantime, i.e. the stored `summarized_count` is still `previous_summarized_count`.
+        """
+        document_filter = {"user_id": user_id, "session_id": session_id}
+        if previous_summarized_count:
+            document_filter["summarized_count"] = previous_summarized_count
+        else:
+            document_filter["summarized_count"] = {"$in": [0, None]}
+
+        try:
+            result = await self.collection.update_one(
+                filter=document_filter,
+                update={"$set": {"summary": summary, "summarized_count": summarized_count}}
+            )
+            if result.modified_count == 0:
+                return False
+
+            if self.session_cache is not None:
+                key = (user_id, session_id)
+                cached = self.session_cache.pop(key)
+                if cached is not None and cached["summarized_count"] == previous_summarized_count:
+                    self.session_cache.put(key, {**cached, "summary": summary,
+                                                 "summarized_count": summarized_count})
+            return True
+        except Exception as e:
+            print(f"❌ Failed to update chat summary: {e}")
+            return False
+
+    def session_cache_stats(self) -> Optional[dict]:
+        """Session cache counters plus the number of session reads that went to MongoDB."""
+        if self.session_cache is None:
+            return None
+        return {**self.session_cache.stats(), "mongo_reads": self.mongo_reads}
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+from typing import List, Dict, Optional
+
+
+# Flush attempts made on shutdown before pending messages are given up
+CLOSE_RETRIES = 3
+
+
+class ChatLogWriter:
+    """Write-behind front of a `ChatLogManager`.
+
+    `insert_or_update_chat_log` only queues the new messages, so answering a question no
+    longer waits for MongoDB. A background task flushes the queue with
+    `ChatLogManager.write_chat_logs` once `max_batch_size` messages are pending or
+    `flush_interval` seconds after the first one was queued, whichever comes first.
+
+    A failed flush is retried at the positions it reserved in each session, so a write
+    that partly went through is completed rather than appended again.
+
+    At most `max_pending` messages are held in memory; beyond that, new writes wait for a
+    flush (backpressure). Reads of a session include its messages that are not written
+    yet, so the next turn of a conversation always sees the previous one.
+    """
+
+    def __init__(self, chat_log_manager, max_batch_size: int = 200,
+                 flush_interval: float = 0.1, max_pending: int = 5000,
+                 max_retry_delay: float = 5.0):
+        self.chat_log_manager = chat_log_manager
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retry_delay = max_retry_delay
+
+        # (user_id, session_id) -> messages waiting for a flush, in order
+        self._queued: Dict[tuple, List[Dict]] = {}
+        # Sessions of the batch being written, with their messages
+        self._in_flight: Dict[tuple, List[Dict]] = {}
+        # (user_id, session_id) -> (reserved session, count) for the first `count` queued
+        # or in-flight messages, kept until they are written
+        self._reservations: Dict[tuple, tuple] = {}
+        self._pending_count = 0
+        self._batch_seq = 0
+
+        self._wakeup = None
+        self._batch_full = None
+        self._space = None
+        self._batch_done = None
+        self._task = None
+        self._closed = False
+
+        self.flushed_batches = 0
+        self.flushed_messages = 0
+        self.failed_flushes = 0
+        self.logger = logging.getLogger(__name__)
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            self._space = asyncio.Condition()
+            self._task = asyncio.create_task(self._run())
+
+    async def insert_or_update_chat_log(self, user_id: str, session_id: str, messages: List[Dict]):
+        """
+        Queue messages to be appended to a chat session.
+
+        Waits only if `max_pending` messages are already queued. Once the writer is closed,
+        messages are written directly.
+        """
+        if self._closed:
+            await self.chat_log_manager.insert_or_update_chat_log(user_id, session_id, messages)
+            return
+
+        self._ensure_started()
+        async with self._space:
+            # A delta larger than the whole buffer is still accepted once the buffer is empty
+            await self._space.wait_for(
+                lambda: self._pending_count == 0
+                or self._pending_count + len(messages) <= self.max_pending
+                or self._closed
+            )
+        if self._closed:
+            await self.chat_log_manager.insert_or_update_chat_log(user_id, session_id, messages)
+            return
+
+        self._queued.setdefault((user_id, session_id), []).extend(messages)
+        self._pending_count += len(messages)
+        self._wakeup.set()
+        if self._queued_count() >= self.max_batch_size:
+            self._batch_full.set()
+
+    def _queued_count(self) -> int:
+        return self._pending_count - sum(len(messages) for messages in self._in_flight.values())
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._closed and self._queued_count() < self.max_batch_size:
+                # Give other requests a chance to join the batch
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            self._batch_full.clear()
+
+            if self._queued:
+                await self._flush()
+
+            if self._closed and self.failed_flushes >= CLOSE_RETRIES:
+                self.logger.error(f"Dropping {self._pending_count} chat messages that could not be written")
+                return
+            if self._queued:
+                self._wakeup.set()
+            elif self._closed:
+                return
+
+    def _take_batch(self) -> Dict[tuple, List[Dict]]:
+        batch, size = {}, 0
+        for key in list(self._queued):
+            if size >= self.max_batch_size:
+                break
+            messages = self._queued.pop(key)
+            reservation = self._reservations.get(key)
+            if reservation is not None and len(messages) > reservation[1]:
+                # Only the messages with reserved positions are retried; the rest wait
+                messages, self._queued[key] = messages[:reservation[1]], messages[reservation[1]:]
+            batch[key] = messages
+            size += len(messages)
+        return batch
+
+    async def _reserve(self, key: tuple, messages: List[Dict]):
+        session = await self.chat_log_manager.reserve_chat_log(*key, len(messages))
+        self._reservations[key] = (session, len(messages))
+
+    async def _write_batch(self):
+        results = await asyncio.gather(*(
+            self._reserve(key, messages)
+            for key, messages in self._in_flight.items()
+            if key not in self._reservations
+        ), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        await self.chat_log_manager.write_chat_logs(
+            [(user_id, session_id, messages) for (user_id, session_id), messages in self._in_flight.items()],
+            [self._reservations[key][0] for key in self._in_flight]
+        )
+
+    async def _refresh_expiry(self, chat_logs: List[tuple], sessions: List[Optional[Dict]]):
+        try:
+            await self.chat_log_manager.refresh_chat_logs_expiry(chat_logs, sessions)
+        except Exception as e:
+            # The messages are written; their expiry is refreshed again on a later append
+            self.logger.warning(f"Failed to refresh the expiry of {len(chat_logs)} chat sessions: {e}")
+
+    async def _flush(self):
+        self._in_flight = self._take_batch()
+        self._batch_seq += 1
+        self._batch_done = asyncio.get_running_loop().create_future()
+
+        batch_size = sum(len(messages) for messages in self._in_flight.values())
+        written = None
+        try:
+            await self._write_batch()
+            written = [(user_id, session_id, messages)
+                       for (user_id, session_id), messages in self._in_flight.items()]
+            sessions = [self._reservations.pop(key)[0] for key in self._in_flight]
+            self._pending_count -= batch_size
+            self.flushed_batches += 1
+            self.flushed_messages += batch_size
+            self.failed_flushes = 0
+        except Exception as e:
+            self.failed_flushes += 1
+            self.logger.error(f"Failed to write {batch_size} chat messages, retrying: {e}")
+            # Put the batch back in front of anything queued since
+            requeued = dict(self._in_flight)
+            for key, messages in self._queued.items():
+                requeued[key] = requeued.get(key, []) + messages
+            self._queued = requeued
+        finally:
+            self._in_flight = {}
+            self._batch_done.set_result(None)
+
+        async with self._space:
+            self._space.notify_all()
+
+        if written is not None:
+            await self._refresh_expiry(written, sessions)
+        if self.failed_flushes:
+            await asyncio.sleep(min(self.flush_interval * 2 ** self.failed_flushes, self.max_retry_delay))
+
+    async def _wait_in_flight(self, key: tuple):
+        while key in self._in_flight:
+            await asyncio.shield(self._batch_done)
+
+    @staticmethod
+    def _stored_form(messages: List[Dict], first_index: int) -> List[Dict]:
+        """Queued messages as `ChatLogManager` returns them, without their full prompt."""
+        stored = []
+        for index, message in enumerate(messages, start=first_index):
+            message = {key: value for key, value in message.items() if key != "full_prompt"}
+            message["index"] = index
+            stored.append(message)
+        return stored
+
+    async def get_chat_window(self, user_id: str, session_id: str, last_n: int) -> Optional[Dict]:
+        """`ChatLogManager.get_chat_window`, including the session's queued messages."""
+        key = (user_id, session_id)
+        while True:
+            await self._wait_in_flight(key)
+            batch_seq = self._batch_seq
+            had_queued = key in self._queued
+
+            window = await self.chat_log_manager.get_chat_window(user_id, session_id, last_n)
+
+            # Retry if the queued messages may have been written while reading
+            if key in self._in_flight or (had_queued and self._batch_seq != batch_seq):
+                continue
+            break
+
+        queued = self._queued.get(key, [])
+        if not queued:
+            return window
+
+        if window is None:
+            window = {"messages": [], "summary": None, "summarized_count": 0, "message_count": 0}
+
+        message_count = window["message_count"]
+        messages = window["messages"] + self._stored_form(queued, message_count)
+        reservation = self._reservations.get(key)
+        if reservation is not None:
+            # After a failed flush, the first queued messages are counted in the session
+            # already, and may be partly written
+            session, reserved = reservation
+            first_index = session.get("message_count", 0) if session else 0
+            reserved_indexes = range(first_index, first_index + reserved)
+            messages = sorted(
+                [message for message in window["messages"] if message["index"] not in reserved_indexes]
+                + self._stored_form(queued[:reserved], first_index)
+                + self._stored_form(queued[reserved:], message_count),
+                key=lambda message: message["index"]
+            )
+            message_count -= reserved
+        return {
+            **window,
+            "messages": messages[-last_n:] if last_n > 0 else [],
+            "message_count": message_count + len(queued),
+        }
+
+    async def get_chat_history(self, user_id: str, session_id: str) -> Optional[List[Dict]]:
+        """`ChatLogManager.get_chat_history`, including the session's queued messages."""
+        window = await self.get_chat_window(user_id, session_id, last_n=2 ** 31)
+        return window["messages"] if window is not None else None
+
+    async def aclose(self):
+        """Stops accepting queued writes and flushes everything still pending."""
+        self._closed = True
+        if self._task is None:
+            return
+
+        self._wakeup.set()
+        self._batch_full.set()
+        async with self._space:
+            self._space.notify_all()
+        await self._task
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._pending_count,
+            "max_pending": self.max_pending,
+            "flushed_batches": self.flushed_batches,
+            "flushed_messages": self.flushed_messages,
+            "failed_flushes": self.failed_flushes,
+        }
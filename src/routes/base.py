@@ -1,21 +1,83 @@
-from fastapi import FastAPI, APIRouter, status, Request
+from fastapi import FastAPI, APIRouter, status, Request, HTTPException, Depends
 from config.config import config
 from config.settings import settings
 from fastapi import FastAPI
 from pydantic import BaseModel
 # from retrieval.rag_pipeline import RAGPipeline
 # from embeddings.vector_store import VectorStore
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from utils.metrics import REGISTRY
 
 base_router = APIRouter(
     prefix="/api/v1",
     tags=["api_v1"]
 )
 
+# Served at the root, where Prometheus scrapes by default
+metrics_router = APIRouter(
+    tags=["metrics"]
+)
+
+
+def require_ready(request: Request):
+    """Route dependency answering 503 while the app's components are still warming up."""
+    if not request.app.readiness.ready:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Service is warming up")
+
 
 @base_router.get("/")
 async def welcome():
 
     return {
         "status": "Healthy"
-    }
\ No newline at end of file
+    }
+
+
+@base_router.get("/ready")
+async def readiness(request: Request):
+
+    report = request.app.readiness.report()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if report["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=report
+    )
+
+
+@base_router.get("/stats/cache", dependencies=[Depends(require_ready)])
+async def cache_stats(request: Request):
+
+    embedding_cache = getattr(request.app.embedding_client, "embedding_cache", None)
+    answer_cache = request.app.answer_cache
+    context_packer = request.app.rag_client.context_packer
+
+    return {
+        "embedding_cache": embedding_cache.stats() if embedding_cache is not None else None,
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "token_count_cache": context_packer.token_cache.stats() if context_packer is not None else None,
+        "chat_session_cache": request.app.chat_log_manager.session_cache_stats()
+    }
+
+
+@base_router.get("/stats/coalescing", dependencies=[Depends(require_ready)])
+async def coalescing_stats(request: Request):
+
+    return request.app.rag_client.coalescing_stats()
+
+
+@base_router.get("/stats/call_policy", dependencies=[Depends(require_ready)])
+async def call_policy_stats(request: Request):
+
+    def policy_stats(client):
+        return client.call_policy_stats() if hasattr(client, "call_policy_stats") else None
+
+    return {
+        "generation_client": policy_stats(request.app.generation_client),
+        "embedding_client": policy_stats(request.app.embedding_client)
+    }
+
+
+@metrics_router.get("/metrics")
+async def metrics():
+
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
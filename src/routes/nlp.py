@@ -1,15 +1,25 @@
-from fastapi import FastAPI, APIRouter, status, Request
+from fastapi import FastAPI, APIRouter, status, Request, Depends
 from config.config import config
 from config.settings import settings
 from pydantic import BaseModel
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from utils.response_signal  import ResponseSignal
+from utils.logger import get_logger
+from utils.metrics import track_request
+from utils.deadline import Deadline
+from llms.llms_enums import DegradationEnums
+from routes.base import require_ready
+import json
+
+
+logger = get_logger(__name__)
 
 
 chatbot_router = APIRouter(
     prefix="/api/v1/chatbot",
-    tags=["ChatBot"]
+    tags=["ChatBot"],
+    dependencies=[Depends(require_ready)]
 )
 
 class AnswerRequest(BaseModel):
@@ -26,24 +36,84 @@ async def answer_rag(request: Request, answer_request: AnswerRequest):
 
     # Call the RAG client with user_id, session_id, and query # TODO: ADD USER-ID, REPORT-ID TO
     # TO RETRIEVE HISTORY
-    answer, _, _ = await request.app.rag_client.answer_rag_question(
-        user_id=user_id,
-        session_id=session_id,
-        query=query
-    )
+    # Stages past their share of the deadline fall back to degraded answers
+    deadline = Deadline(settings.REQUEST_DEADLINE)
+    with track_request() as timings:
+        answer, _, _ = await request.app.rag_client.answer_rag_question(
+            user_id=user_id,
+            session_id=session_id,
+            query=query,
+            deadline=deadline
+        )
+
+    # Per-stage breakdown, shown by browser dev tools and readable by load tests
+    headers = {"Server-Timing": timings.server_timing()} if settings.SERVER_TIMING_HEADER else None
 
     if not answer:
+        # Retrieval that ran out of time is a timeout, not a bad request
+        timed_out = DegradationEnums.NO_PASSAGES.value in deadline.degradations
         return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT if timed_out else status.HTTP_400_BAD_REQUEST,
                 content={
-                    "signal": ResponseSignal.RAG_ANSWER_ERROR.value
-                }
+                    "signal": ResponseSignal.RAG_ANSWER_ERROR.value,
+                    "degradations": deadline.degradations
+                },
+                headers=headers
         )
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
             "signal": ResponseSignal.RAG_ANSWER_SUCCESS.value,  
             "query": query,
-            "answer": answer
-        }
+            "answer": answer,
+            "degradations": deadline.degradations
+        },
+        headers=headers
+    )
+
+
+def format_sse_event(data: dict, event: str = None) -> str:
+    """Serialize a payload as a server-sent event."""
+    lines = [f"event: {event}"] if event else []
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@chatbot_router.post("/answer/stream")
+async def answer_rag_stream(request: Request, answer_request: AnswerRequest):
+
+    async def event_stream():
+        has_answer = False
+        failed = False
+        deadline = Deadline(settings.REQUEST_DEADLINE)
+        with track_request() as timings:
+            try:
+                async for text in request.app.rag_client.stream_rag_answer(
+                    user_id=answer_request.user_id,
+                    session_id=answer_request.session_id,
+                    query=answer_request.query,
+                    deadline=deadline
+                ):
+                    has_answer = True
+                    yield format_sse_event({"token": text})
+            except Exception as e:
+                logger.error(f"Error while streaming RAG answer: {e}")
+                failed = True
+
+        # Headers are sent before the first token, so the breakdown comes with the last event
+        if has_answer and not failed:
+            end = {"signal": ResponseSignal.RAG_ANSWER_SUCCESS.value, "degradations": deadline.degradations}
+            if settings.SERVER_TIMING_HEADER:
+                end["timings"] = timings.to_dict()
+            yield format_sse_event(end, event="end")
+        else:
+            # `partial` tells the client that the tokens already sent are a truncated answer
+            yield format_sse_event({"signal": ResponseSignal.RAG_ANSWER_ERROR.value,
+                                    "partial": has_answer,
+                                    "degradations": deadline.degradations}, event="error")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
@@ -0,0 +1,212 @@
+import asyncio
+import random
+import time
+from collections import deque
+from enum import Enum
+from logging import getLogger
+
+from .exceptions import CircuitOpenError
+
+
+logger = getLogger(__name__)
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Fails calls fast while an upstream is unhealthy.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls are rejected
+    for `reset_timeout` seconds. Then one trial call is let through (half open): its success
+    closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+        self.rejected = 0
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not reach the upstream."""
+        if self.state is CircuitState.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit open for {self.reset_timeout}s after "
+                                       f"{self.consecutive_failures} consecutive failures")
+            self.state = CircuitState.HALF_OPEN
+
+        if self.state is CircuitState.HALF_OPEN:
+            if self._trial_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError("Circuit half open, waiting for the trial call")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self._trial_in_flight = False
+        self.consecutive_failures = 0
+        self.state = CircuitState.CLOSED
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.consecutive_failures += 1
+        if self.state is CircuitState.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state is not CircuitState.OPEN:
+                logger.warning(f"Circuit opened after {self.consecutive_failures} consecutive failures")
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Ends a trial call that neither succeeded nor failed, e.g. was cancelled."""
+        self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+        }
+
+
+class CallPolicy:
+    """Timeouts, jittered retries, hedging and a circuit breaker around an upstream call.
+
+    `call(fn, *args)` awaits `fn(*args)`, a coroutine function called once per attempt:
+    - each attempt is cut short after `timeout` seconds;
+    - attempts failing with a `retryable` error (or timing out) are retried up to
+      `max_retries` times, after a random delay of up to `backoff_base * 2 ** retry`
+      seconds, capped at `backoff_max` ("full jitter");
+    - with `hedge`, a second identical attempt is started when the first is slower than
+      `hedge_quantile` of the recent latencies, and the first to succeed is used;
+    - with a `circuit_breaker`, calls fail fast with CircuitOpenError while it is open.
+    Other errors are raised at once and don't count against the upstream's health.
+    """
+
+    def __init__(self, timeout: float = None, max_retries: int = 0,
+                 retryable: tuple = (), backoff_base: float = 0.1, backoff_max: float = 2.0,
+                 hedge: bool = False, hedge_quantile: float = 0.95, hedge_min_delay: float = 0.05,
+                 hedge_min_samples: int = 20, latency_window: int = 500,
+                 circuit_breaker: CircuitBreaker = None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retryable = tuple(retryable) + (asyncio.TimeoutError,)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = deque(maxlen=latency_window)  # seconds of recent successful attempts
+
+        self.circuit_breaker = circuit_breaker
+
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait before hedging, or None until enough latencies were seen."""
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))
+        return max(self.hedge_min_delay, ordered[index])
+
+    async def _attempt(self, fn, *args):
+        self.attempts += 1
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(fn(*args), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        self.latencies.append(time.monotonic() - start)
+        return result
+
+    async def _hedged_attempt(self, fn, *args):
+        delay = self.hedge_delay()
+        first = asyncio.ensure_future(self._attempt(fn, *args))
+        if delay is None:
+            return await first
+
+        attempts = [first]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done:
+                self.hedges += 1
+                attempts.append(asyncio.ensure_future(self._attempt(fn, *args)))
+
+            # The first success wins; an attempt failing leaves the other one running
+            error = None
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not first:
+                            self.hedge_wins += 1
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+    async def call(self, fn, *args, hedge: bool = True):
+        """Returns `await fn(*args)` under the policy; `hedge=False` disables hedging for
+        calls whose result can't be discarded, e.g. an opened stream."""
+        self.calls += 1
+        for retry in range(self.max_retries + 1):
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_call()
+
+            try:
+                if hedge:
+                    result = await self._hedged_attempt(fn, *args)
+                else:
+                    result = await self._attempt(fn, *args)
+            except self.retryable as e:
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_failure()
+                if retry == self.max_retries:
+                    raise
+
+                self.retries += 1
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+                logger.warning(f"Call failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.release()
+                raise
+
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+            return result
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay": self.hedge_delay(),
+            "circuit_breaker": self.circuit_breaker.stats() if self.circuit_breaker is not None else None,
+        }
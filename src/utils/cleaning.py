@@ -1,8 +1,34 @@
 import re
+import unicodedata
 
 
 def remove_think_tags(text):
     """Removes text between <think>...</think> tags, including the tags themselves."""
     cleaned_text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
     cleaned_text = cleaned_text.lstrip("\n")  # Remove leading newlines
-    return cleaned_text
\ No newline at end of file
+    return cleaned_text
+
+
+def normalize_query(text):
+    """Normalizes a query for cache lookups: unicode form, letter case and whitespace."""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.casefold().split())
+
+
+ARABIC_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
+ARABIC_LETTER_FORMS = str.maketrans({
+    "ـ": None,  # tatweel
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",  # alef forms -> ا
+    "ى": "ي",  # alef maksura -> ي
+    "ة": "ه",  # taa marbuta -> ه
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},  # Eastern Arabic-Indic digits
+})
+
+
+def normalize_arabic(text):
+    """Normalizes text for lexical matching: strips Arabic diacritics and tatweel, unifies
+    alef, yaa and taa marbuta forms and Arabic-Indic digits, and casefolds Latin text."""
+    text = unicodedata.normalize("NFKC", text)
+    text = ARABIC_DIACRITICS.sub("", text)
+    return text.translate(ARABIC_LETTER_FORMS).casefold()
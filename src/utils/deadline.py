@@ -0,0 +1,55 @@
+import asyncio
+import time
+from logging import getLogger
+from .metrics import DEGRADATIONS
+
+
+logger = getLogger(__name__)
+
+
+class Deadline:
+    """The time a request has left, shared by every stage serving it.
+
+    Stages await their work through `run`, which cuts it short at the stage's share of the
+    total budget or at the deadline, whichever comes first, by raising
+    `asyncio.TimeoutError`. The fallbacks taken instead are recorded with `degrade`. A
+    deadline of None never expires.
+    """
+
+    def __init__(self, seconds: float = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        self.degradations = []
+
+    def remaining(self) -> float:
+        """Seconds left, never negative; None without a deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def share_left(self) -> float:
+        """Share of the total budget still left, 1.0 without a deadline."""
+        if self.expires_at is None or not self.seconds:
+            return 1.0
+        return self.remaining() / self.seconds
+
+    def budget(self, share: float = None, reserve: float = 0.0) -> float:
+        """Seconds a stage may take: `share` of the total, capped by what is left after
+        keeping `reserve` of the total for later stages. None without a deadline."""
+        if self.expires_at is None:
+            return None
+
+        budget = self.remaining() - reserve * self.seconds
+        if share is not None:
+            budget = min(budget, share * self.seconds)
+        return max(0.0, budget)
+
+    async def run(self, awaitable, share: float = None, reserve: float = 0.0):
+        """Awaits `awaitable` within the stage budget; raises asyncio.TimeoutError past it."""
+        return await asyncio.wait_for(awaitable, self.budget(share, reserve))
+
+    def degrade(self, degradation: str):
+        if degradation not in self.degradations:
+            logger.warning(f"Deadline budget exceeded, degrading: {degradation}")
+            DEGRADATIONS.inc(degradation)
+            self.degradations.append(degradation)
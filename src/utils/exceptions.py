@@ -9,3 +9,7 @@ class EmbeddingError(Exception):
 class QueryError(Exception):
     """Exception raised when querying the vector store fails."""
     pass
+
+class CircuitOpenError(Exception):
+    """Exception raised when a call is rejected because its upstream is unhealthy."""
+    pass
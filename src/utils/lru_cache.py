@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe, bounded LRU cache with an optional time-to-live per entry.
+
+    Hit, miss and eviction counters are kept so the cache can be sized from
+    production traffic (see `stats`).
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = None, on_evict=None,
+                 max_weight: int = None, weigher=None):
+        """
+        Args:
+            max_size (int): Maximum number of entries before the least recently used is evicted.
+            ttl (float, optional): Seconds an entry stays valid. None keeps entries until evicted.
+            on_evict (callable, optional): Called as `on_evict(key, value)` when an entry is
+                dropped because the cache is full or the entry expired.
+            max_weight (int, optional): Maximum total weight of the entries, e.g. in bytes.
+            weigher (callable, optional): Returns the weight of a value; required with `max_weight`.
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be a positive integer.")
+        if max_weight is not None and weigher is None:
+            raise ValueError("max_weight requires a weigher.")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.max_weight = max_weight
+        self.weigher = weigher
+
+        self._entries = OrderedDict()  # key -> (expires_at, value, weight)
+        self._weight = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for `key` and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value, weight = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self._weight -= weight
+                self.misses += 1
+                if self.on_evict is not None:
+                    self.on_evict(key, value)
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Insert or refresh `key`, evicting the least recently used entries when full."""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        weight = self.weigher(value) if self.weigher is not None else 0
+
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None:
+                self._weight -= previous[2]
+            self._entries[key] = (expires_at, value, weight)
+            self._entries.move_to_end(key)
+            self._weight += weight
+
+            while len(self._entries) > self.max_size or (
+                self.max_weight is not None and self._weight > self.max_weight
+            ):
+                evicted_key, (_, evicted_value, evicted_weight) = self._entries.popitem(last=False)
+                self._weight -= evicted_weight
+                self.evictions += 1
+                if self.on_evict is not None:
+                    self.on_evict(evicted_key, evicted_value)
+
+    def pop(self, key, default=None):
+        """Remove `key` from the cache and return its value."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self._weight -= entry[2]
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def stats(self) -> dict:
+        """Return the current size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "weight": self._weight,
+            "max_weight": self.max_weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
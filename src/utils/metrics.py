@@ -0,0 +1,201 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Seconds; from a cached embedding up to a long generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A monotonically increasing value per combination of label values."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def collect(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}"
+                for labels, value in values]
+
+
+class Histogram:
+    """Counts observations into fixed buckets, per combination of label values."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts (last one is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self, *labelvalues) -> dict:
+        """Count, sum and cumulative bucket counts of one series."""
+        with self._lock:
+            counts, total = self._series.get(labelvalues, [[0] * (len(self.buckets) + 1), 0.0])
+            counts = list(counts)
+
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return {"count": running, "sum": total,
+                "buckets": dict(zip(self.buckets + (float("inf"),), cumulative))}
+
+    def collect(self) -> list:
+        with self._lock:
+            labelsets = sorted(self._series)
+
+        lines = []
+        for labels in labelsets:
+            snapshot = self.snapshot(*labels)
+            for bound, count in snapshot["buckets"].items():
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {snapshot['sum']:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {snapshot['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics of the process, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimings:
+    """Seconds spent in each stage while serving one request."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def to_dict(self) -> dict:
+        timings = {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self.started_at) * 1000, 2)
+        return timings
+
+    def server_timing(self) -> str:
+        """The stages as a `Server-Timing` header value, in milliseconds."""
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.to_dict().items())
+
+
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def track_request():
+    """Collects the stages timed while the block runs into a RequestTimings."""
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def _add_to_request(stage: str, seconds: float):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage)
+    _add_to_request(stage, seconds)
+
+
+def record_time_to_first_token(seconds: float):
+    TIME_TO_FIRST_TOKEN_SECONDS.observe(seconds)
+    _add_to_request("ttft", seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """Records the duration of the block as `stage`, and counts it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(stage)
+        raise
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+# ================================ RAG pipeline metrics ================================
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_seconds", "Time spent in each stage of answering a query.", ["stage"])
+TIME_TO_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "rag_time_to_first_token_seconds", "Time from the generation request to the first streamed token.")
+CACHE_REQUESTS = REGISTRY.counter(
+    "rag_cache_requests_total", "Cache lookups by cache and result (hit or miss).", ["cache", "result"])
+TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "Tokens sent to and generated by the generation model.", ["kind"])
+ERRORS = REGISTRY.counter(
+    "rag_errors_total", "Errors raised by each stage of answering a query.", ["stage"])
+DEGRADATIONS = REGISTRY.counter(
+    "rag_degradations_total", "Fallbacks taken because a stage ran out of its deadline budget.", ["degradation"])
@@ -0,0 +1,111 @@
+import asyncio
+
+
+class MicroBatcher:
+    """Groups concurrent async calls into batches.
+
+    Each `submit(item)` waits for its result while items are collected for up to
+    `max_wait` seconds after the first one, or until `max_batch_size` are pending. The
+    batch is then handed to `process_batch(items)`, a coroutine returning one result per
+    item in order, and each result is routed back to its caller. Batches run one at a
+    time; the next one fills up while the current one is processed.
+    """
+
+    def __init__(self, process_batch, max_batch_size: int = 32, max_wait: float = 0.005):
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be a positive integer.")
+
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._pending = []  # (item, future)
+        self._processing = []
+        self._has_pending = None
+        self._batch_full = None
+        self._task = None
+
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._has_pending = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, item):
+        """Adds `item` to the next batch and returns its result."""
+        self._ensure_started()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self._has_pending.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_full.set()
+
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._has_pending.wait()
+            if len(self._pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._has_pending.clear()
+            self._batch_full.clear()
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            if self._pending:
+                self._has_pending.set()
+
+            # Callers that were cancelled while waiting don't need their item processed
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            self._processing = batch
+            try:
+                results = await self.process_batch([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self._processing = []
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def aclose(self):
+        """Stops batching; calls still waiting are cancelled."""
+        if self._task is None:
+            return
+
+        waiting = self._pending + self._processing
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        for _, future in waiting:
+            future.cancel()
+        self._pending = []
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait": self.max_wait,
+        }
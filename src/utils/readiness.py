@@ -0,0 +1,62 @@
+import asyncio
+import time
+from enum import Enum
+
+
+class ComponentState(Enum):
+    PENDING = "pending"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class ReadinessTracker:
+    """Records the warm-up state and duration of each component initialized at startup.
+
+    The app is ready once `mark_ready` is called after every component has warmed up;
+    `report` is what the readiness endpoint returns.
+    """
+
+    def __init__(self, components: list = ()):
+        self.started_at = time.monotonic()
+        self.ready_at = None
+        self.components = {
+            name: {"state": ComponentState.PENDING.value, "seconds": None, "error": None}
+            for name in components
+        }
+
+    async def run(self, name: str, fn, *args):
+        """Awaits `fn(*args)` as the warm-up of component `name` and returns its result."""
+        component = self.components.setdefault(name, {"error": None})
+        component.update(state=ComponentState.WARMING.value, seconds=None)
+
+        start = time.monotonic()
+        try:
+            result = await fn(*args)
+        except BaseException as e:
+            component.update(state=ComponentState.FAILED.value, error=repr(e))
+            raise
+        finally:
+            component["seconds"] = round(time.monotonic() - start, 3)
+
+        component["state"] = ComponentState.READY.value
+        return result
+
+    async def run_in_thread(self, name: str, fn, *args):
+        """Like `run`, for a blocking function run in a worker thread."""
+        return await self.run(name, asyncio.to_thread, fn, *args)
+
+    def mark_ready(self):
+        self.ready_at = time.monotonic()
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "startup_seconds": round(self.ready_at - self.started_at, 3) if self.ready else None,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "components": self.components,
+        }
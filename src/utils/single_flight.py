@@ -0,0 +1,49 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesces concurrent identical async calls.
+
+    The first caller for a key starts the call; callers arriving with the same key while
+    it is in flight await the same result (or exception) instead of starting their own.
+    The call runs in its own task, so a caller that is cancelled doesn't cancel it for
+    the others. Nothing is kept once the call completes.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+
+        self.calls = 0
+        self.saved_calls = 0
+
+    @staticmethod
+    def _consume_exception(task: asyncio.Task):
+        # All waiters may have gone; don't log the exception as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Returns `await fn(*args, **kwargs)`, shared with concurrent calls for `key`."""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            task.add_done_callback(self._consume_exception)
+            self.calls += 1
+        else:
+            self.saved_calls += 1
+
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    def stats(self) -> dict:
+        requests = self.calls + self.saved_calls
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "saved_calls": self.saved_calls,
+            "saved_rate": self.saved_calls / requests if requests else 0.0,
+        }
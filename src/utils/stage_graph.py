@@ -0,0 +1,76 @@
+import asyncio
+
+
+class StageGraph:
+    """A dependency graph of named async stages.
+
+    Each stage is a coroutine function called as `fn(run)`; it starts as soon as the
+    stages it depends on have completed, so independent stages run concurrently. Inside
+    a stage, `await run.result(name)` returns the result of another stage (immediately
+    for a dependency) and `run.inputs` holds the arguments the run was started with.
+    A stage may only depend on stages added before it, which keeps the graph acyclic.
+    """
+
+    def __init__(self):
+        self.stages = {}  # name -> (fn, depends_on)
+
+    def add_stage(self, name: str, fn, depends_on: tuple = ()):
+        if name in self.stages:
+            raise ValueError(f"Stage {name} already exists.")
+        missing = [dependency for dependency in depends_on if dependency not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages: {missing}")
+
+        self.stages[name] = (fn, tuple(depends_on))
+        return self
+
+    def replace_stage(self, name: str, fn, depends_on: tuple = ()):
+        """Swaps the function of a stage, e.g. to rerank the retrieved passages; stages that
+        depend on it receive the new result."""
+        if name not in self.stages:
+            raise ValueError(f"Stage {name} does not exist.")
+        earlier = list(self.stages)[:list(self.stages).index(name)]
+        missing = [dependency for dependency in depends_on if dependency not in earlier]
+        if missing:
+            raise ValueError(f"Stage {name} can only depend on stages added before it, not {missing}")
+
+        self.stages[name] = (fn, tuple(depends_on))
+        return self
+
+    def start(self, **inputs) -> "StageRun":
+        """Starts every stage; use the run as an async context manager to cancel what is left."""
+        return StageRun(self, inputs)
+
+
+class StageRun:
+    """One execution of a StageGraph."""
+
+    def __init__(self, graph: StageGraph, inputs: dict):
+        self.inputs = inputs
+        self._tasks = {}
+        for name, (fn, depends_on) in graph.stages.items():
+            self._tasks[name] = asyncio.ensure_future(self._run_stage(fn, depends_on))
+
+    async def _run_stage(self, fn, depends_on: tuple):
+        for dependency in depends_on:
+            await asyncio.shield(self._tasks[dependency])
+        return await fn(self)
+
+    async def result(self, name: str):
+        # Shielded, so a caller that is cancelled doesn't cancel the stage for the others
+        return await asyncio.shield(self._tasks[name])
+
+    def cancel(self):
+        """Cancels the stages still running; their results are no longer needed."""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.cancel()
+        # Wait for the cancellations, and retrieve exceptions nobody asked for so they
+        # aren't logged as never retrieved
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
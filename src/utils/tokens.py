@@ -0,0 +1,47 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional, fall back to a character based estimate
+    tiktoken = None
+
+
+# Conservative characters-per-token ratio for mixed Arabic/English text
+APPROX_CHARS_PER_TOKEN = 3
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model_id: str = None):
+    """Returns the tiktoken encoding for a model, or None if tiktoken is not available."""
+    if tiktoken is None:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_id)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # the encoding file could not be downloaded; estimate instead
+        return None
+
+
+def count_tokens(text: str, model_id: str = None) -> int:
+    """Counts the tokens of a text for the given model."""
+    encoding = get_encoding(model_id)
+    if encoding is None:
+        return len(text) // APPROX_CHARS_PER_TOKEN + 1
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_id: str = None) -> str:
+    """Cuts a text down to at most `max_tokens` tokens."""
+    if max_tokens <= 0:
+        return ""
+
+    encoding = get_encoding(model_id)
+    if encoding is None:
+        return text[:max_tokens * APPROX_CHARS_PER_TOKEN]
+
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[:max_tokens]) if len(tokens) > max_tokens else text
@@ -0,0 +1,85 @@
+import json
+import os
+import pyarrow as pa
+
+
+class Chunk:
+    """A stored chunk of text; mirrors the `page_content`/`metadata` interface of LangChain documents."""
+
+    __slots__ = ("id", "page_content", "metadata")
+
+    def __init__(self, page_content: str, metadata: dict = None, id: str = None):
+        self.id = id
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+    def __repr__(self):
+        return f"Chunk(id={self.id!r}, metadata={self.metadata!r}, page_content={self.page_content[:40]!r})"
+
+
+class ChunkStore:
+    """Chunk ids, text and metadata in a columnar Arrow table.
+
+    On disk the table is an uncompressed Arrow IPC file. `open` memory-maps it, so rows are
+    read lazily by row id, and several workers share the OS page cache instead of each
+    unpickling a private copy.
+    """
+
+    SCHEMA = pa.schema([
+        ("id", pa.string()),
+        ("text", pa.string()),
+        ("metadata", pa.string()),  # JSON encoded
+    ])
+
+    def __init__(self, table: pa.Table = None):
+        self.table = table if table is not None else self.SCHEMA.empty_table()
+
+    @classmethod
+    def from_documents(cls, documents, ids: list):
+        return cls(cls._to_table(documents, ids))
+
+    @classmethod
+    def _to_table(cls, documents, ids: list) -> pa.Table:
+        return pa.Table.from_pydict({
+            "id": [str(chunk_id) for chunk_id in ids],
+            "text": [doc.page_content for doc in documents],
+            "metadata": [json.dumps(doc.metadata or {}, ensure_ascii=False, default=str) for doc in documents],
+        }, schema=cls.SCHEMA)
+
+    def append(self, documents, ids: list):
+        self.table = pa.concat_tables([self.table, self._to_table(documents, ids)])
+
+    def filter(self, keep_mask):
+        """Keep only the rows where `keep_mask` is true."""
+        self.table = self.table.filter(pa.array(keep_mask, type=pa.bool_()))
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def ids(self) -> list:
+        return self.table.column("id").to_pylist()
+
+    def get(self, rows: list) -> list:
+        """Materialize the chunks at the given row positions, in order."""
+        subset = self.table.take(pa.array(rows, type=pa.int64()))
+        return [
+            Chunk(page_content=text, metadata=json.loads(metadata), id=chunk_id)
+            for chunk_id, text, metadata in zip(
+                subset.column("id").to_pylist(),
+                subset.column("text").to_pylist(),
+                subset.column("metadata").to_pylist(),
+            )
+        ]
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, self.SCHEMA) as writer:
+                writer.write_table(self.table)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str):
+        """Memory-map a saved chunk store; no row data is read until it is accessed."""
+        source = pa.memory_map(path, "r")
+        return cls(pa.ipc.open_file(source).read_all())
@@ -0,0 +1,188 @@
+import json
+import os
+import re
+import numpy as np
+from utils.cleaning import normalize_arabic
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+OFFSETS_FILE = "offsets.npy"
+POSTINGS_FILE = "postings.npy"
+TERM_FREQS_FILE = "term_freqs.npy"
+DOC_LENGTHS_FILE = "doc_lengths.npy"
+VOCABULARY_FILE = "vocabulary.json"
+
+
+def tokenize(text: str) -> list:
+    """Splits Arabic-normalized text into word and number tokens."""
+    return TOKEN_PATTERN.findall(normalize_arabic(text))
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60, limit: int = None):
+    """Fuses several ranked lists of row ids with reciprocal-rank fusion.
+
+    Each row scores sum(1 / (k + rank)) over the lists it appears in, so rows ranked well by
+    several retrievers rise to the top without having to calibrate their raw scores.
+    Negative row ids (padding) are ignored.
+
+    Returns:
+        tuple: (rows, scores), best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(int(row) for row in ranking if row >= 0):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank + 1)
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [row for row, _ in ranked], [score for _, score in ranked]
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index stored in flat arrays.
+
+    Postings are kept in CSR form: the documents containing term `t` are
+    `postings[offsets[t]:offsets[t + 1]]`, with their term frequencies at the same positions
+    in `term_freqs`. Document ids are row numbers of the vector store, so results can be
+    fused with vector search directly. Saved indexes are memory-mapped on load.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.empty(0, dtype=np.int32)
+        self.term_freqs = np.empty(0, dtype=np.int32)
+        self.doc_lengths = np.empty(0, dtype=np.int32)
+        self.average_length = 1.0
+
+    def __len__(self):
+        return self.doc_lengths.shape[0]
+
+    def _term_rows(self) -> np.ndarray:
+        """Term id of every posting."""
+        return np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets))
+
+    def _set_postings(self, terms: np.ndarray, docs: np.ndarray, freqs: np.ndarray):
+        order = np.lexsort((docs, terms))
+        self.postings = docs[order].astype(np.int32)
+        self.term_freqs = freqs[order].astype(np.int32)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)))]).astype(np.int64)
+
+    def _merge_postings(self, terms: np.ndarray, docs: np.ndarray, freqs: np.ndarray):
+        """Appends new rows' postings to each term's list.
+
+        New rows come after every indexed row, so each of their postings belongs at the end
+        of its term's list; only the new postings are sorted, not the whole index.
+        """
+        order = np.lexsort((docs, terms))
+        terms, docs, freqs = terms[order], docs[order], freqs[order]
+
+        # Where each term's list ends now; terms first seen in this batch end at the very end
+        ends = np.full(len(self.vocabulary), self.offsets[-1], dtype=np.int64)
+        ends[:len(self.offsets) - 1] = self.offsets[1:]
+        positions = ends[terms]
+
+        self.postings = np.insert(self.postings, positions, docs).astype(np.int32)
+        self.term_freqs = np.insert(self.term_freqs, positions, freqs).astype(np.int32)
+        # Each list now ends further on by the new postings of its own and every earlier term
+        self.offsets = np.concatenate([[0], ends + np.cumsum(np.bincount(terms, minlength=len(ends)))])
+
+    def add(self, texts: list):
+        """Indexes texts as the next rows."""
+        if not texts:
+            return
+
+        terms, docs, freqs, lengths = [], [], [], []
+        for row, text in enumerate(texts, start=len(self)):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+
+            counts = {}
+            for token in tokens:
+                term = self.vocabulary.setdefault(token, len(self.vocabulary))
+                counts[term] = counts.get(term, 0) + 1
+
+            terms.extend(counts)
+            docs.extend([row] * len(counts))
+            freqs.extend(counts.values())
+
+        self._merge_postings(np.asarray(terms, dtype=np.int64), np.asarray(docs, dtype=np.int32),
+                             np.asarray(freqs, dtype=np.int32))
+        self.doc_lengths = np.concatenate([self.doc_lengths, np.asarray(lengths, dtype=np.int32)])
+        self._update_average_length()
+
+    def filter(self, keep_mask):
+        """Keep only the rows where `keep_mask` is true; the remaining rows are renumbered in order."""
+        keep_mask = np.asarray(keep_mask, dtype=bool)
+        new_rows = np.cumsum(keep_mask) - 1
+
+        kept = keep_mask[self.postings]
+        self._set_postings(self._term_rows()[kept], new_rows[self.postings[kept]], self.term_freqs[kept])
+        self.doc_lengths = np.asarray(self.doc_lengths)[keep_mask]
+        self._update_average_length()
+
+    def _update_average_length(self):
+        self.average_length = max(float(self.doc_lengths.mean()), 1.0) if len(self) else 1.0
+
+    def search(self, query: str, k: int = 5):
+        """Top-k (scores, rows) for a query, best first; only rows sharing a term are returned."""
+        term_ids = {self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary}
+        if not term_ids or len(self) == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        n_docs = len(self)
+        scores = np.zeros(n_docs, dtype=np.float32)
+
+        for term in term_ids:
+            start, end = self.offsets[term], self.offsets[term + 1]
+            docs = self.postings[start:end]
+            freqs = self.term_freqs[start:end].astype(np.float32)
+
+            idf = np.log1p((n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norms = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / self.average_length)
+            scores[docs] += idf * freqs * (self.k1 + 1.0) / (freqs + norms)
+
+        candidates = np.flatnonzero(scores)
+        if candidates.shape[0] > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return scores[candidates], candidates
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            OFFSETS_FILE: self.offsets,
+            POSTINGS_FILE: self.postings,
+            TERM_FREQS_FILE: self.term_freqs,
+            DOC_LENGTHS_FILE: self.doc_lengths,
+        }
+        for file_name, array in arrays.items():
+            file_path = os.path.join(path, file_name)
+            with open(file_path + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(file_path + ".tmp", file_path)
+
+        # Terms in id order
+        with open(os.path.join(path, VOCABULARY_FILE), "w", encoding="utf-8") as f:
+            json.dump(list(self.vocabulary), f, ensure_ascii=False)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, VOCABULARY_FILE))
+
+    @classmethod
+    def load(cls, path: str, k1: float = 1.5, b: float = 0.75):
+        """Memory-maps a saved index."""
+        with open(os.path.join(path, VOCABULARY_FILE), encoding="utf-8") as f:
+            terms = json.load(f)
+
+        index = cls(k1=k1, b=b)
+        index.vocabulary = {term: term_id for term_id, term in enumerate(terms)}
+        index.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        index.postings = np.load(os.path.join(path, POSTINGS_FILE), mmap_mode="r")
+        index.term_freqs = np.load(os.path.join(path, TERM_FREQS_FILE), mmap_mode="r")
+        index.doc_lengths = np.load(os.path.join(path, DOC_LENGTHS_FILE), mmap_mode="r")
+        index._update_average_length()
+        return index
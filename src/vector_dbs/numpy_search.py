@@ -0,0 +1,114 @@
+import numpy as np
+from .vector_db_enums import DistanceMethodEnums, VectorDTypeEnums
+
+
+def quantize(vectors, dtype: str = VectorDTypeEnums.FLOAT16.value):
+    """Encode float vectors for storage.
+
+    float16 halves the memory of float32. int8 quarters it using a symmetric scale per
+    row (max |x| -> 127), so rows can be appended without re-quantizing the others.
+
+    Returns:
+        tuple: (codes, scales); scales is None unless dtype is int8.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+
+    if dtype == VectorDTypeEnums.FLOAT32.value:
+        return np.ascontiguousarray(vectors), None
+
+    if dtype == VectorDTypeEnums.FLOAT16.value:
+        return vectors.astype(np.float16), None
+
+    if dtype == VectorDTypeEnums.INT8.value:
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+
+def dequantize(codes, scales=None) -> np.ndarray:
+    vectors = np.asarray(codes, dtype=np.float32)
+    if scales is not None:
+        vectors = vectors * np.asarray(scales, dtype=np.float32)[:, None]
+    return vectors
+
+
+def blocked_top_k(codes, queries, k: int, scales=None, squared_norms=None,
+                  distance_method: str = DistanceMethodEnums.L2.value, block_size: int = 4096):
+    """Exact top-k search as a blocked matrix product.
+
+    The stored matrix is dequantized one block at a time, so the float32 working set is
+    bounded by `block_size` rows no matter how large (or memory-mapped) `codes` is. Each
+    block is reduced to its own top-k with `argpartition` and merged into the running
+    top-k, and all queries are answered in the same pass.
+
+    Args:
+        codes: (n, d) stored vectors in float32, float16 or int8.
+        queries: (m, d) query vectors.
+        k (int): Number of neighbours per query.
+        scales: (n,) per-row int8 scales, or None.
+        squared_norms: (n,) squared norms of the dequantized rows; needed for l2 and cosine.
+        distance_method (str): l2 (smaller is better), dot or cosine (larger is better).
+        block_size (int): Rows dequantized per matrix product.
+
+    Returns:
+        tuple: (scores, rows), both (m, k), best first.
+    """
+    queries = np.asarray(queries, dtype=np.float32).reshape(-1, codes.shape[1])
+    n_queries = queries.shape[0]
+    k = min(k, codes.shape[0])
+    if k == 0:
+        return np.empty((n_queries, 0), dtype=np.float32), np.empty((n_queries, 0), dtype=np.int64)
+
+    if squared_norms is None and distance_method != DistanceMethodEnums.DOT.value:
+        squared_norms = np.concatenate([
+            np.einsum("ij,ij->i", block, block)
+            for block in (dequantize(codes[start:start + block_size],
+                                     None if scales is None else scales[start:start + block_size])
+                          for start in range(0, codes.shape[0], block_size))
+        ])
+
+    query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+
+    # Keys are ordered so that smaller is always better
+    best_keys = np.empty((n_queries, 0), dtype=np.float32)
+    best_rows = np.empty((n_queries, 0), dtype=np.int64)
+
+    for start in range(0, codes.shape[0], block_size):
+        block = np.asarray(codes[start:start + block_size], dtype=np.float32)
+        dots = queries @ block.T
+        if scales is not None:
+            dots *= scales[start:start + block.shape[0]][None, :]
+
+        if distance_method == DistanceMethodEnums.L2.value:
+            keys = squared_norms[None, start:start + block.shape[0]] - 2.0 * dots + query_norms
+        elif distance_method == DistanceMethodEnums.COSINE.value:
+            norms = np.sqrt(squared_norms[None, start:start + block.shape[0]] * query_norms)
+            keys = -dots / np.maximum(norms, 1e-12)
+        else:
+            keys = -dots
+
+        block_k = min(k, keys.shape[1])
+        if keys.shape[1] > block_k:
+            selected = np.argpartition(keys, block_k - 1, axis=1)[:, :block_k]
+        else:
+            selected = np.broadcast_to(np.arange(keys.shape[1]), keys.shape)
+
+        keys = np.concatenate([best_keys, np.take_along_axis(keys, selected, axis=1)], axis=1)
+        rows = np.concatenate([best_rows, selected + start], axis=1)
+        if keys.shape[1] > k:
+            selected = np.argpartition(keys, k - 1, axis=1)[:, :k]
+            keys = np.take_along_axis(keys, selected, axis=1)
+            rows = np.take_along_axis(rows, selected, axis=1)
+        best_keys, best_rows = keys, rows
+
+    order = np.argsort(best_keys, axis=1)
+    best_keys = np.take_along_axis(best_keys, order, axis=1)
+    best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+    scores = best_keys if distance_method == DistanceMethodEnums.L2.value else -best_keys
+    return scores, best_rows
@@ -1,3 +1,15 @@
-from .faiss_db_provider import FaissDBProvider
-from .qdrant_db_provider import QdrantDBProvider
-from .vector_store import VectorStore
\ No newline at end of file
+import importlib
+
+_PROVIDER_MODULES = {
+    "FaissDBProvider": ".faiss_db_provider",
+    "QdrantDBProvider": ".qdrant_db_provider",
+    "NumpyDBProvider": ".numpy_db_provider",
+    "VectorStore": ".vector_store",
+}
+
+
+def __getattr__(name):
+    # Backends are imported on first use, so the serving path never imports faiss or qdrant
+    if name in _PROVIDER_MODULES:
+        return getattr(importlib.import_module(_PROVIDER_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
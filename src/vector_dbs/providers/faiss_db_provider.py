@@ -1,123 +1,339 @@
 import faiss
+import json
+import logging
+import math
 import os
-import pickle
-from typing import List, Tuple
+import shutil
+import numpy as np
+from typing import List
 from ..vector_db_interface import VectorDBInterface
-from ..vector_db_enums import DistanceMethodEnums
+from ..vector_db_enums import DistanceMethodEnums, FaissIndexTypeEnums
+from ..chunk_store import Chunk, ChunkStore
+
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.arrow"
+COLLECTION_INFO_FILE = "collection_info.json"
+
+IVF_INDEX_TYPES = (FaissIndexTypeEnums.IVF_FLAT.value, FaissIndexTypeEnums.IVF_PQ.value)
+# FAISS wants at least this many training points per k-means centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+class FaissCollection:
+    """A FAISS index plus its row-aligned chunks."""
+
+    def __init__(self, embedding_size: int):
+        self.embedding_size = embedding_size
+        # Built on the first insert, once there is data to train on
+        self.index = None
+        self.index_type = None  # the type actually built; small corpora fall back to flat
+        self.index_config = None  # provider configuration the index was built with
+        self.trained_on = 0
+        self.chunk_store = ChunkStore()
+
+    def __len__(self):
+        return self.index.ntotal if self.index is not None else 0
 
 
 class FaissDBProvider(VectorDBInterface):
-    """FAISS-based vector database that assumes embeddings are generated externally."""
-    ## NOTE: NOT USED
-    def __init__(self, db_path: str):
+    """FAISS-based vector database that assumes embeddings are generated externally.
+
+    `index_type` selects the index built for each collection:
+        - flat: exact brute-force search, O(N) per query.
+        - ivf_flat: k-means partitions (`nlist`), of which `nprobe` are scanned per query.
+        - ivf_pq: as ivf_flat, but vectors are product-quantized to `pq_m` x `pq_nbits` bits.
+        - hnsw: a navigable small-world graph (`hnsw_m` links per node) searched with `ef_search`.
+
+    IVF indexes are trained on up to `train_size` vectors of the first insert. `nprobe` and
+    `ef_search` trade recall for latency and can be changed on a loaded index with
+    `set_search_params`.
+    """
+
+    def __init__(self, db_path: str, distance_method: str = DistanceMethodEnums.L2.value,
+                 index_type: str = FaissIndexTypeEnums.FLAT.value, nlist: int = None,
+                 nprobe: int = 16, pq_m: int = 16, pq_nbits: int = 8, hnsw_m: int = 32,
+                 ef_construction: int = 200, ef_search: int = 64, train_size: int = 100_000):
         self.db_path = db_path
-        self.index = None
-        self.metadata_store = {}  # To store metadata alongside vectors
+        self.distance_method = distance_method
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.train_size = train_size
+        self.collections = {}
+
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def metric(self) -> int:
+        if self.distance_method == DistanceMethodEnums.L2.value:
+            return faiss.METRIC_L2
+        return faiss.METRIC_INNER_PRODUCT
+
+    @property
+    def index_config(self) -> dict:
+        return {
+            "index_type": self.index_type,
+            "distance_method": self.distance_method,
+            "nlist": self.nlist,
+            "pq_m": self.pq_m,
+            "pq_nbits": self.pq_nbits,
+            "hnsw_m": self.hnsw_m,
+        }
+
+    def _collection_path(self, collection_name: str) -> str:
+        return os.path.join(self.db_path, collection_name) if self.db_path else None
+
+    def _get_collection(self, collection_name: str) -> FaissCollection:
+        if collection_name not in self.collections:
+            raise ValueError(f"Collection {collection_name} does not exist.")
+        return self.collections[collection_name]
+
+    def _prepare_vectors(self, vectors) -> np.ndarray:
+        vectors = np.array(vectors, dtype=np.float32, copy=True)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if self.distance_method == DistanceMethodEnums.COSINE.value:
+            faiss.normalize_L2(vectors)
+        return np.ascontiguousarray(vectors)
+
+    def _index_description(self, n_vectors: int, embedding_size: int):
+        """Returns the index type to build and its `faiss.index_factory` description."""
+        if self.index_type == FaissIndexTypeEnums.HNSW.value:
+            return self.index_type, f"HNSW{self.hnsw_m},Flat"
+
+        if self.index_type in IVF_INDEX_TYPES:
+            nlist = self.nlist or max(1, min(int(4 * math.sqrt(n_vectors)),
+                                             n_vectors // MIN_POINTS_PER_CENTROID))
+            if self.index_type == FaissIndexTypeEnums.IVF_FLAT.value and n_vectors >= nlist:
+                return self.index_type, f"IVF{nlist},Flat"
+
+            if self.index_type == FaissIndexTypeEnums.IVF_PQ.value:
+                if embedding_size % self.pq_m != 0:
+                    raise ValueError(f"pq_m={self.pq_m} must divide the embedding size {embedding_size}.")
+                if n_vectors >= max(nlist, MIN_POINTS_PER_CENTROID * 2 ** self.pq_nbits):
+                    return self.index_type, f"IVF{nlist},PQ{self.pq_m}x{self.pq_nbits}"
+
+            self.logger.warning(f"Too few vectors ({n_vectors}) to train a {self.index_type} index, using flat.")
+            return FaissIndexTypeEnums.FLAT.value, "Flat"
+
+        if self.index_type == FaissIndexTypeEnums.FLAT.value:
+            return self.index_type, "Flat"
+
+        raise ValueError(f"Unsupported FAISS index type: {self.index_type}")
+
+    def _build_index(self, collection: FaissCollection, vectors: np.ndarray):
+        index_type, description = self._index_description(vectors.shape[0], collection.embedding_size)
+        index = faiss.index_factory(collection.embedding_size, description, self.metric)
+
+        if index_type == FaissIndexTypeEnums.HNSW.value:
+            index.hnsw.efConstruction = self.ef_construction
+
+        if not index.is_trained:
+            training_set = vectors
+            if vectors.shape[0] > self.train_size:
+                rows = np.random.default_rng(0).choice(vectors.shape[0], size=self.train_size, replace=False)
+                training_set = vectors[np.sort(rows)]
+            self.logger.info(f"Training {description} on {training_set.shape[0]} vectors...")
+            index.train(training_set)
+
+        collection.index = index
+        collection.index_type = index_type
+        collection.index_config = self.index_config
+        collection.trained_on = vectors.shape[0]
+        self._apply_search_params(index)
+
+    def _apply_search_params(self, index):
+        ivf_index = faiss.try_extract_index_ivf(index)
+        if ivf_index is not None:
+            ivf_index.nprobe = min(self.nprobe, ivf_index.nlist)
+        if hasattr(index, "hnsw"):
+            index.hnsw.efSearch = self.ef_search
+
+    def set_search_params(self, nprobe: int = None, ef_search: int = None):
+        """Changes the recall/latency trade-off of every loaded index."""
+        self.nprobe = nprobe if nprobe is not None else self.nprobe
+        self.ef_search = ef_search if ef_search is not None else self.ef_search
+        for collection in self.collections.values():
+            if collection.index is not None:
+                self._apply_search_params(collection.index)
+
+    def needs_rebuild(self, collection_name: str) -> bool:
+        """True when the index no longer matches the configuration, or an IVF index has
+        doubled in size since its centroids were trained."""
+        collection = self._get_collection(collection_name)
+        if collection.index is None:
+            return False
+
+        if collection.index_config != self.index_config:
+            return True
+
+        return self.index_type in IVF_INDEX_TYPES and len(collection) > 2 * collection.trained_on
 
     def connect(self):
-        """Loads an existing FAISS index if available."""
-        if os.path.exists(self.db_path):
-            self.load_vector_store()
-        else:
-            raise FileNotFoundError(f"FAISS index not found at {self.db_path}")
+        """Loads every saved collection under `db_path`."""
+        if not self.db_path or not os.path.isdir(self.db_path):
+            raise FileNotFoundError(f"FAISS store not found at {self.db_path}")
+
+        for collection_name in os.listdir(self.db_path):
+            if os.path.exists(os.path.join(self._collection_path(collection_name), COLLECTION_INFO_FILE)):
+                self.load_collection(collection_name)
 
     def disconnect(self):
-        """Clears the FAISS index from memory."""
-        self.index = None
-        self.metadata_store = {}
+        """Clears the FAISS indexes from memory."""
+        self.collections = {}
 
     def is_collection_existed(self, collection_name: str) -> bool:
-        """FAISS does not support multiple collections, so always return True if index exists."""
-        return self.index is not None
+        return collection_name in self.collections
 
     def list_all_collections(self) -> List:
-        """FAISS does not support named collections, return a placeholder."""
-        return ["default_collection"]
+        return list(self.collections)
 
     def get_collection_info(self, collection_name: str) -> dict:
         """Returns metadata about the FAISS index."""
-        if self.index is None:
-            raise ValueError("No FAISS index loaded.")
-        return {"index_size": self.index.ntotal}
+        collection = self._get_collection(collection_name)
+        info = {
+            "index_size": len(collection),
+            "embedding_size": collection.embedding_size,
+            "index_type": collection.index_type,
+            "distance_method": self.distance_method,
+            "trained_on": collection.trained_on,
+        }
+
+        if collection.index is not None:
+            ivf_index = faiss.try_extract_index_ivf(collection.index)
+            if ivf_index is not None:
+                info.update(nlist=ivf_index.nlist, nprobe=ivf_index.nprobe)
+            if hasattr(collection.index, "hnsw"):
+                info.update(ef_search=collection.index.hnsw.efSearch)
+        return info
 
     def delete_collection(self, collection_name: str):
         """Deletes the FAISS index."""
-        if os.path.exists(self.db_path):
-            os.remove(self.db_path)
-        self.index = None
-        self.metadata_store = {}
+        self.collections.pop(collection_name, None)
+        collection_path = self._collection_path(collection_name)
+        if collection_path and os.path.isdir(collection_path):
+            shutil.rmtree(collection_path)
 
     def create_collection(self, collection_name: str, embedding_size: int, do_reset: bool = False):
-        """Creates a new FAISS index."""
+        """Creates a new collection; its FAISS index is built and trained on the first insert."""
         if do_reset:
             self.delete_collection(collection_name)
 
-        self.index = faiss.IndexFlatL2(embedding_size)
-        self.metadata_store = {}
+        if not self.is_collection_existed(collection_name):
+            self.collections[collection_name] = FaissCollection(embedding_size)
+            return True
 
-    def insert_one(self, collection_name: str, vector: list, metadata: dict = None, record_id: str = None):
-        """Inserts a single vector into the FAISS index."""
-        if self.index is None:
-            raise ValueError("FAISS index has not been created.")
+        return False
 
-        vector = faiss.vector_to_array(vector).reshape(1, -1)  # Ensure correct shape
-        self.index.add(vector)
-        
-        record_id = record_id or str(self.index.ntotal - 1)
-        self.metadata_store[record_id] = metadata
+    def insert_one(self, collection_name: str, text: str, vector: list,
+                   metadata: dict = None, record_id: str = None):
+        """Inserts a single vector into the FAISS index."""
+        return self.insert_many(collection_name, [text], [vector],
+                                metadata=[metadata] if metadata is not None else None,
+                                record_ids=[record_id] if record_id is not None else None)
 
-    def insert_many(self, collection_name: str, vectors: List[list], metadata: List[dict] = None, record_ids: List[str] = None):
+    def insert_many(self, collection_name: str, texts: list, vectors: list,
+                    metadata: list = None, record_ids: list = None, batch_size: int = 50):
         """Inserts multiple vectors into the FAISS index."""
-        if self.index is None:
-            raise ValueError("FAISS index has not been created.")
+        collection = self._get_collection(collection_name)
+        if len(texts) == 0:
+            return True
+
+        vectors = self._prepare_vectors(vectors)
+        if collection.index is None:
+            self._build_index(collection, vectors)
 
-        vectors = faiss.vector_to_array(vectors).reshape(len(vectors), -1)
-        self.index.add(vectors)
+        start = len(collection)
+        collection.index.add(vectors)
 
         if metadata is None:
-            metadata = [{}] * len(vectors)
+            metadata = [{}] * len(texts)
 
         if record_ids is None:
-            record_ids = [str(i) for i in range(self.index.ntotal - len(vectors), self.index.ntotal)]
+            record_ids = [str(i) for i in range(start, len(collection))]
 
-        for rid, meta in zip(record_ids, metadata):
-            self.metadata_store[rid] = meta
+        collection.chunk_store.append(
+            [Chunk(page_content=text, metadata=meta) for text, meta in zip(texts, metadata)],
+            record_ids
+        )
+        return True
 
-    def search_by_vector(self, collection_name: str, vector: list, limit: int = 5) -> List[Tuple[int, float, dict]]:
-        """Searches the FAISS index for the most similar vectors."""
-        if self.index is None:
-            raise ValueError("FAISS index has not been created.")
+    def search_rows(self, collection_name: str, vectors, limit: int = 5):
+        """Top-k (scores, rows) arrays, both (n_queries, k); rows are -1 where fewer than k were found."""
+        collection = self._get_collection(collection_name)
+        queries = self._prepare_vectors(vectors)
+        limit = min(limit, len(collection))
+        if limit == 0:
+            return np.empty((queries.shape[0], 0), dtype=np.float32), np.empty((queries.shape[0], 0), dtype=np.int64)
 
-        vector = faiss.vector_to_array(vector).reshape(1, -1)
-        distances, indices = self.index.search(vector, limit)
+        return collection.index.search(queries, limit)
 
-        results = []
-        for i in range(len(indices[0])):
-            record_id = str(indices[0][i])
-            metadata = self.metadata_store.get(record_id, {})
-            results.append((indices[0][i], distances[0][i], metadata))
+    def search_many(self, collection_name: str, vectors, limit: int = 5) -> List[List[tuple]]:
+        """Answers several queries in one call; returns a list of (chunk, score) lists."""
+        collection = self._get_collection(collection_name)
+        scores, rows = self.search_rows(collection_name, vectors, limit)
 
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            found = query_rows >= 0
+            chunks = collection.chunk_store.get(query_rows[found].tolist())
+            results.append([(chunk, float(score)) for chunk, score in zip(chunks, query_scores[found])])
         return results
 
-    def save_vector_store(self):
-        """Saves the FAISS index and metadata to disk."""
-        if self.index is None:
+    def search_by_vector(self, collection_name: str, vector: list, limit: int = 5) -> List[tuple]:
+        """Searches the FAISS index for the most similar vectors."""
+        return self.search_many(collection_name, [vector], limit)[0]
+
+    def save_collection(self, collection_name: str, path: str = None):
+        """Writes a collection to `path` (default `db_path/collection_name`)."""
+        collection = self._get_collection(collection_name)
+        if collection.index is None:
             raise ValueError("No FAISS index to save.")
 
-        faiss.write_index(self.index, self.db_path)
-        with open(self.db_path + "_metadata.pkl", "wb") as f:
-            pickle.dump(self.metadata_store, f)
+        path = path or self._collection_path(collection_name)
+        os.makedirs(path, exist_ok=True)
+
+        index_path = os.path.join(path, INDEX_FILE)
+        faiss.write_index(collection.index, index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+
+        collection.chunk_store.save(os.path.join(path, CHUNKS_FILE))
+
+        with open(os.path.join(path, COLLECTION_INFO_FILE), "w") as f:
+            json.dump({
+                "embedding_size": collection.embedding_size,
+                "index_type": collection.index_type,
+                "index_config": collection.index_config,
+                "trained_on": collection.trained_on,
+                "count": len(collection),
+            }, f)
+
+    def load_collection(self, collection_name: str, path: str = None, writable: bool = False):
+        """Loads a saved collection.
 
-    def load_vector_store(self):
-        """Loads the FAISS index and metadata from disk."""
-        if not os.path.exists(self.db_path):
-            raise FileNotFoundError("FAISS index file not found.")
+        For serving, the index is opened with the mmap IO flag, so index types that support
+        it (IVF inverted lists) are paged in on demand, and the chunks are memory-mapped
+        Arrow. Memory-mapped inverted lists are read-only, so a collection loaded to insert
+        into (`writable`) is read into memory instead.
+        """
+        path = path or self._collection_path(collection_name)
+        with open(os.path.join(path, COLLECTION_INFO_FILE)) as f:
+            info = json.load(f)
 
-        self.index = faiss.read_index(self.db_path)
+        collection = FaissCollection(info["embedding_size"])
+        io_flags = 0 if writable else faiss.IO_FLAG_MMAP
+        collection.index = faiss.read_index(os.path.join(path, INDEX_FILE), io_flags)
+        collection.index_type = info["index_type"]
+        collection.index_config = info["index_config"]
+        collection.trained_on = info["trained_on"]
+        collection.chunk_store = ChunkStore.open(os.path.join(path, CHUNKS_FILE))
+        self._apply_search_params(collection.index)
 
-        metadata_path = self.db_path + "_metadata.pkl"
-        if os.path.exists(metadata_path):
-            with open(metadata_path, "rb") as f:
-                self.metadata_store = pickle.load(f)
-        else:
-            self.metadata_store = {}
\ No newline at end of file
+        self.collections[collection_name] = collection
+        return collection
@@ -0,0 +1,220 @@
+import json
+import os
+import shutil
+import numpy as np
+from typing import List
+from ..vector_db_interface import VectorDBInterface
+from ..vector_db_enums import DistanceMethodEnums, VectorDTypeEnums
+from ..chunk_store import Chunk, ChunkStore
+from ..numpy_search import quantize, dequantize, blocked_top_k
+
+
+CODES_FILE = "codes.npy"
+SCALES_FILE = "scales.npy"
+NORMS_FILE = "norms.npy"
+CHUNKS_FILE = "chunks.arrow"
+COLLECTION_INFO_FILE = "collection_info.json"
+
+
+class NumpyCollection:
+    """Quantized vectors of one collection plus their row-aligned chunks."""
+
+    def __init__(self, embedding_size: int, dtype: str):
+        self.embedding_size = embedding_size
+        self.dtype = dtype
+
+        self.codes, self.scales = quantize(np.empty((0, embedding_size), dtype=np.float32), dtype)
+        self.squared_norms = np.empty(0, dtype=np.float32)  # of the dequantized rows
+        self.chunk_store = ChunkStore()
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+
+class NumpyDBProvider(VectorDBInterface):
+    """Exact vector search in pure NumPy, without FAISS.
+
+    Each collection keeps its embeddings as one contiguous float16 or int8-scaled matrix
+    (2x / 4x smaller than float32). Search is a blocked matrix product with `argpartition`
+    top-k, and several queries can be answered in one call (`search_many`). Saved
+    collections are memory-mapped on load.
+    """
+
+    def __init__(self, db_path: str, distance_method: str = DistanceMethodEnums.L2.value,
+                 dtype: str = VectorDTypeEnums.FLOAT16.value, block_size: int = 4096):
+        self.db_path = db_path
+        self.distance_method = distance_method
+        self.dtype = dtype
+        self.block_size = block_size
+        self.collections = {}
+
+    def _collection_path(self, collection_name: str) -> str:
+        return os.path.join(self.db_path, collection_name) if self.db_path else None
+
+    def _get_collection(self, collection_name: str) -> NumpyCollection:
+        if collection_name not in self.collections:
+            raise ValueError(f"Collection {collection_name} does not exist.")
+        return self.collections[collection_name]
+
+    def needs_rebuild(self, collection_name: str) -> bool:
+        """True when the collection is stored in a different dtype than configured."""
+        return self._get_collection(collection_name).dtype != self.dtype
+
+    def connect(self):
+        """Memory-maps every saved collection under `db_path`."""
+        if not self.db_path or not os.path.isdir(self.db_path):
+            return
+
+        for collection_name in os.listdir(self.db_path):
+            if os.path.exists(os.path.join(self._collection_path(collection_name), COLLECTION_INFO_FILE)):
+                self.load_collection(collection_name)
+
+    def disconnect(self):
+        self.collections = {}
+
+    def is_collection_existed(self, collection_name: str) -> bool:
+        return collection_name in self.collections
+
+    def list_all_collections(self) -> List:
+        return list(self.collections)
+
+    def get_collection_info(self, collection_name: str) -> dict:
+        collection = self._get_collection(collection_name)
+        return {
+            "index_size": len(collection),
+            "embedding_size": collection.embedding_size,
+            "dtype": collection.dtype,
+            "distance_method": self.distance_method,
+            "memory_bytes": collection.codes.nbytes + collection.squared_norms.nbytes +
+                (collection.scales.nbytes if collection.scales is not None else 0),
+        }
+
+    def delete_collection(self, collection_name: str):
+        self.collections.pop(collection_name, None)
+        collection_path = self._collection_path(collection_name)
+        if collection_path and os.path.isdir(collection_path):
+            shutil.rmtree(collection_path)
+
+    def create_collection(self, collection_name: str, embedding_size: int,
+                          do_reset: bool = False):
+        if do_reset:
+            self.delete_collection(collection_name)
+
+        if not self.is_collection_existed(collection_name):
+            self.collections[collection_name] = NumpyCollection(embedding_size, self.dtype)
+            return True
+
+        return False
+
+    def insert_one(self, collection_name: str, text: str, vector: list,
+                   metadata: dict = None, record_id: str = None):
+        return self.insert_many(collection_name, [text], [vector],
+                                metadata=[metadata] if metadata is not None else None,
+                                record_ids=[record_id] if record_id is not None else None)
+
+    def insert_many(self, collection_name: str, texts: list, vectors: list,
+                    metadata: list = None, record_ids: list = None, batch_size: int = 50):
+        collection = self._get_collection(collection_name)
+        if len(texts) == 0:
+            return True
+
+        if metadata is None:
+            metadata = [{}] * len(texts)
+
+        if record_ids is None:
+            record_ids = [str(i) for i in range(len(collection), len(collection) + len(texts))]
+
+        codes, scales = quantize(vectors, collection.dtype)
+        dequantized = dequantize(codes, scales)
+
+        collection.codes = np.concatenate([collection.codes, codes])
+        if scales is not None:
+            collection.scales = np.concatenate([collection.scales, scales])
+        collection.squared_norms = np.concatenate([
+            collection.squared_norms, np.einsum("ij,ij->i", dequantized, dequantized)
+        ])
+        collection.chunk_store.append(
+            [Chunk(page_content=text, metadata=meta) for text, meta in zip(texts, metadata)],
+            record_ids
+        )
+        return True
+
+    def delete_records(self, collection_name: str, record_ids: list):
+        """Removes records by id; the remaining rows keep their order."""
+        collection = self._get_collection(collection_name)
+        record_ids = set(record_ids)
+        keep_mask = np.array([record_id not in record_ids for record_id in collection.chunk_store.ids()], dtype=bool)
+
+        collection.codes = np.asarray(collection.codes)[keep_mask]
+        if collection.scales is not None:
+            collection.scales = np.asarray(collection.scales)[keep_mask]
+        collection.squared_norms = np.asarray(collection.squared_norms)[keep_mask]
+        collection.chunk_store.filter(keep_mask)
+
+    def search_rows(self, collection_name: str, vectors, limit: int = 5):
+        """Top-k (scores, rows) arrays, both (n_queries, k); scores are l2 distances or similarities."""
+        collection = self._get_collection(collection_name)
+        return blocked_top_k(
+            collection.codes, vectors, limit,
+            scales=collection.scales,
+            squared_norms=collection.squared_norms,
+            distance_method=self.distance_method,
+            block_size=self.block_size
+        )
+
+    def search_many(self, collection_name: str, vectors, limit: int = 5) -> List[List[tuple]]:
+        """Answers several queries in one pass; returns a list of (chunk, score) lists."""
+        collection = self._get_collection(collection_name)
+        scores, rows = self.search_rows(collection_name, vectors, limit)
+
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            chunks = collection.chunk_store.get(query_rows.tolist())
+            results.append([(chunk, float(score)) for chunk, score in zip(chunks, query_scores)])
+        return results
+
+    def search_by_vector(self, collection_name: str, vector: list, limit: int = 5):
+        return self.search_many(collection_name, [vector], limit)[0]
+
+    def save_collection(self, collection_name: str, path: str = None):
+        """Writes a collection to `path` (default `db_path/collection_name`)."""
+        collection = self._get_collection(collection_name)
+        path = path or self._collection_path(collection_name)
+        os.makedirs(path, exist_ok=True)
+
+        arrays = {CODES_FILE: collection.codes, NORMS_FILE: collection.squared_norms}
+        if collection.scales is not None:
+            arrays[SCALES_FILE] = collection.scales
+
+        # Write next to the target and swap in, so running workers keep their mapping of the old files
+        for file_name, array in arrays.items():
+            file_path = os.path.join(path, file_name)
+            with open(file_path + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(file_path + ".tmp", file_path)
+
+        collection.chunk_store.save(os.path.join(path, CHUNKS_FILE))
+
+        with open(os.path.join(path, COLLECTION_INFO_FILE), "w") as f:
+            json.dump({
+                "embedding_size": collection.embedding_size,
+                "dtype": collection.dtype,
+                "count": len(collection),
+            }, f)
+
+    def load_collection(self, collection_name: str, path: str = None, writable: bool = False):
+        """Memory-maps a saved collection, or reads it into memory when it is `writable`."""
+        path = path or self._collection_path(collection_name)
+        with open(os.path.join(path, COLLECTION_INFO_FILE)) as f:
+            info = json.load(f)
+
+        mmap_mode = None if writable else "r"
+        collection = NumpyCollection(info["embedding_size"], info["dtype"])
+        collection.codes = np.load(os.path.join(path, CODES_FILE), mmap_mode=mmap_mode)
+        collection.squared_norms = np.load(os.path.join(path, NORMS_FILE), mmap_mode=mmap_mode)
+        if os.path.exists(os.path.join(path, SCALES_FILE)):
+            collection.scales = np.load(os.path.join(path, SCALES_FILE), mmap_mode=mmap_mode)
+        collection.chunk_store = ChunkStore.open(os.path.join(path, CHUNKS_FILE))
+
+        self.collections[collection_name] = collection
+        return collection
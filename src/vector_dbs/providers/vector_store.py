@@ -1,41 +1,444 @@
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from datetime import datetime, timezone
+from .numpy_db_provider import CHUNKS_FILE
+from ..chunk_store import Chunk, ChunkStore
+from ..vector_db_enums import DistanceMethodEnums, VectorDTypeEnums, VectorDBEnums
+from ..vector_db_factory import VectorDBProviderFactory
+from ..recall import exact_top_k, recall_at_k, sample_queries
+from ..lexical_index import BM25Index, reciprocal_rank_fusion
 import numpy as np
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import struct
+import uuid
+
+
+STORE_INFO_FILE = "store_info.json"
+VECTORS_FILE = "vectors.npy"
+LEGACY_INDEX_FILE = "index.faiss"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+COLLECTION_NAME = "chunks"
+LEXICAL_INDEX_DIR = "lexical"
+
+# FAISS file headers of the flat indexes LangChain builds: fourcc, dimension, vector count,
+# two unused counts, is_trained, metric type, then the number of floats that follow
+LEGACY_FLAT_FOURCCS = (b"IxF2", b"IxFI")
+LEGACY_FLAT_HEADER = struct.Struct("<4siqqq?iQ")
+
+
+class _LegacyObject:
+    """Stands in for the LangChain docstore and documents pickled in a legacy store."""
+
+    def __setstate__(self, state):
+        # Pydantic models (documents) pickle their fields under "__dict__"
+        self.__dict__.update(state.get("__dict__", state))
+
+
+class _LegacyDocstoreUnpickler(pickle.Unpickler):
+    """Reads a LangChain `index.pkl` without LangChain, and refuses any other class."""
+
+    ALLOWED_CLASSES = {
+        ("langchain_community.docstore.in_memory", "InMemoryDocstore"),
+        ("langchain_core.documents.base", "Document"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) in self.ALLOWED_CLASSES:
+            return _LegacyObject
+        raise pickle.UnpicklingError(f"{module}.{name} is not allowed in a legacy vector store")
+
+
+def _read_legacy_vectors(path: str) -> np.ndarray:
+    """The vectors of a LangChain `index.faiss`; flat indexes are read without FAISS."""
+    with open(path, "rb") as f:
+        header = f.read(LEGACY_FLAT_HEADER.size)
+
+    if header[:4] not in LEGACY_FLAT_FOURCCS:
+        import faiss
+
+        index = faiss.read_index(path)
+        return index.reconstruct_n(0, index.ntotal)
+
+    _, dimension, count, _, _, _, _, floats = LEGACY_FLAT_HEADER.unpack(header)
+    if floats != dimension * count:
+        raise ValueError(f"{path} is not a valid flat FAISS index.")
+    return np.fromfile(path, dtype="<f4", count=floats,
+                       offset=LEGACY_FLAT_HEADER.size).reshape(count, dimension)
 
 
 class VectorStore:
-    """Handles storing and retrieving document embeddings in FAISS."""
+    """Handles storing and retrieving document embeddings.
+
+    On disk a store is the canonical float32 `vectors.npy` plus a search collection with a
+    columnar Arrow file of the chunk ids, text and metadata. The collection is either a
+    `NumpyDBProvider` (exact search over a float16 / int8 matrix) or, with the FAISS backend,
+    a `FaissDBProvider` approximate index (IVF / HNSW) configured by `index_options`.
+    Serving maps only the search collection, so startup does not deserialize anything and
+    every worker shares the same page cache; the float32 vectors are only read by index builds.
+
+    With `hybrid_search`, a BM25 index over the Arabic-normalized chunk text is kept
+    row-aligned with the vectors, and queries fuse the lexical and vector rankings with
+    reciprocal-rank fusion, so exact names and numbers are found even when the embedding
+    misses them.
+    """
+
+    def __init__(self, index_dtype: str = VectorDTypeEnums.FLOAT16.value,
+                 distance_method: str = DistanceMethodEnums.L2.value,
+                 block_size: int = 4096, backend: str = VectorDBEnums.NUMPY.value,
+                 index_options: dict = None, hybrid_search: bool = False,
+                 bm25_k1: float = 1.5, bm25_b: float = 0.75, rrf_k: int = 60,
+                 hybrid_candidates: int = 20):
+        # Canonical float32 embeddings, used to (re)build the search index and check its recall
+        self.vectors = None
+        self.backend = backend
+        if backend == VectorDBEnums.FAISS.value:
+            options = index_options or {}
+        elif backend == VectorDBEnums.NUMPY.value:
+            options = {"dtype": index_dtype, "block_size": block_size}
+        else:
+            raise ValueError(f"Unsupported vector store backend: {backend}")
+        self.index = VectorDBProviderFactory.get_provider_class(backend)(
+            db_path=None, distance_method=distance_method, **options
+        )
 
-    def __init__(self):
-        self.vector_db = None
+        self.hybrid_search = hybrid_search
+        self.bm25_k1 = bm25_k1
+        self.bm25_b = bm25_b
+        self.rrf_k = rrf_k
+        self.hybrid_candidates = hybrid_candidates  # taken from each retriever before fusion
+        self.lexical_index = None
 
-    def build_vector_store(self, documents, embeddings_function):
-        """Stores document embeddings in FAISS using an external embedding function."""
+        self.embeddings_function = None
+        self.async_embeddings_function = None
+        # Changes every time the store is saved; caches derived from the index key on it
+        self.version = None
+        self.recall_at_k = None
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            index_dtype=settings.VECTOR_INDEX_DTYPE,
+            distance_method=settings.VECTOR_DB_DISTANCE_METHOD,
+            block_size=settings.VECTOR_SEARCH_BLOCK_SIZE,
+            backend=settings.VECTOR_DB_BACKEND,
+            index_options={
+                "index_type": settings.FAISS_INDEX_TYPE,
+                "nlist": settings.FAISS_IVF_NLIST,
+                "nprobe": settings.FAISS_IVF_NPROBE,
+                "pq_m": settings.FAISS_PQ_M,
+                "pq_nbits": settings.FAISS_PQ_NBITS,
+                "hnsw_m": settings.FAISS_HNSW_M,
+                "ef_construction": settings.FAISS_HNSW_EF_CONSTRUCTION,
+                "ef_search": settings.FAISS_HNSW_EF_SEARCH,
+                "train_size": settings.FAISS_TRAIN_SIZE,
+            },
+            hybrid_search=settings.HYBRID_SEARCH,
+            bm25_k1=settings.BM25_K1,
+            bm25_b=settings.BM25_B,
+            rrf_k=settings.RRF_K,
+            hybrid_candidates=settings.HYBRID_CANDIDATES,
+        )
+
+    @property
+    def chunk_store(self) -> ChunkStore:
+        return self.index.collections[COLLECTION_NAME].chunk_store
+
+    def get_index_info(self) -> dict:
+        return self.index.get_collection_info(COLLECTION_NAME)
+
+    @staticmethod
+    def _embed_documents(documents, embeddings_function, embed_many_function=None) -> np.ndarray:
         texts = [doc.page_content for doc in documents]  # Extract text content
-        embeddings = [embeddings_function(text) for text in texts]  # Generate embeddings using the provided function
-        embeddings = list(embeddings)
+        if embed_many_function is not None:
+            embeddings = embed_many_function(texts)
+        else:
+            embeddings = [embeddings_function(text) for text in texts]  # Generate embeddings using the provided function
+
+        return np.vstack([
+            np.asarray(embedding, dtype=np.float32).reshape(-1)
+            for embedding in embeddings
+        ])
+
+    def _insert(self, documents, embeddings: np.ndarray, ids: list):
+        self.index.insert_many(
+            COLLECTION_NAME,
+            texts=[doc.page_content for doc in documents],
+            vectors=embeddings,
+            metadata=[doc.metadata for doc in documents],
+            record_ids=ids
+        )
+
+    def _build_lexical_index(self, texts=None):
+        """Rebuilds the BM25 index from `texts`, or from all stored chunks."""
+        if texts is None:
+            texts = [chunk.page_content for chunk in self.chunk_store.get(list(range(len(self.chunk_store))))]
+
+        self.lexical_index = BM25Index(k1=self.bm25_k1, b=self.bm25_b)
+        self.lexical_index.add(texts)
+
+    def build_vector_store(self, documents, embeddings_function, embed_many_function=None, ids=None):
+        """Stores document embeddings using an external embedding function.
+
+        When `embed_many_function` is given, all texts are embedded through it in batches
+        instead of one call per chunk. `ids` optionally assigns a stable id to each chunk.
+        """
+        ids = ids if ids is not None else [uuid.uuid4().hex for _ in documents]
+
+        self.vectors = self._embed_documents(documents, embeddings_function, embed_many_function)
+        self.index.create_collection(COLLECTION_NAME, self.vectors.shape[1], do_reset=True)
+        self._insert(documents, self.vectors, ids)
+        if self.hybrid_search:
+            self._build_lexical_index([doc.page_content for doc in documents])
+        self.embeddings_function = embeddings_function
+
+    def add_documents(self, documents, embeddings_function, embed_many_function=None, ids=None):
+        """Embeds and appends documents to an existing store."""
+        if not documents:
+            return []
+
+        ids = ids if ids is not None else [uuid.uuid4().hex for _ in documents]
+
+        embeddings = self._embed_documents(documents, embeddings_function, embed_many_function)
+        self.vectors = np.vstack([self.vectors, embeddings])
+        self._insert(documents, embeddings, ids)
+        if self.lexical_index is not None:
+            self.lexical_index.add([doc.page_content for doc in documents])
+        return ids
+
+    def delete_documents(self, ids):
+        """Removes chunks from the store by id."""
+        if not ids:
+            return
+
+        ids = set(ids)
+        keep_mask = np.array([chunk_id not in ids for chunk_id in self.chunk_store.ids()], dtype=bool)
+        self.vectors = np.asarray(self.vectors)[keep_mask]
+        if self.lexical_index is not None:
+            self.lexical_index.filter(keep_mask)
+
+        if self.backend == VectorDBEnums.FAISS.value:
+            # Approximate indexes cannot drop rows in place, so rebuild from the remaining vectors
+            self._rebuild_index(self.chunk_store.get(np.flatnonzero(keep_mask).tolist()))
+        else:
+            self.index.delete_records(COLLECTION_NAME, ids)
 
-        # Ensure embeddings are in a list of lists format
-        if isinstance(embeddings, np.ndarray):
-            embeddings = embeddings.tolist()
-        text_embedding_pairs = zip(texts, embeddings)
-        # Store in FAISS
-        self.vector_db = FAISS.from_embeddings(text_embedding_pairs, documents)
+    def _rebuild_index(self, chunks=None):
+        """Rebuild the search index from the float32 vectors (and retrain it, if it trains)."""
+        if chunks is None:
+            chunks = self.chunk_store.get(list(range(len(self.chunk_store))))
+
+        self.index.create_collection(COLLECTION_NAME, self.vectors.shape[1], do_reset=True)
+        self._insert(chunks, self.vectors, [chunk.id for chunk in chunks])
+
+    def measure_recall(self, k: int = 10, n_queries: int = 100) -> float:
+        """Recall@k of the quantized search index against exact float32 search."""
+        if self.vectors is None or self.vectors.shape[0] == 0:
+            return None
+
+        queries = sample_queries(self.vectors, n_queries)
+        exact_rows = exact_top_k(self.vectors, queries, k, distance_method=self.index.distance_method)
+        _, approx_rows = self.index.search_rows(COLLECTION_NAME, queries, k)
+        return recall_at_k(exact_rows, approx_rows)
+
+    @staticmethod
+    def exists(path="faiss_index") -> bool:
+        return os.path.exists(os.path.join(path, VECTORS_FILE)) and \
+            os.path.isdir(os.path.join(path, COLLECTION_NAME))
 
     def save_vector_store(self, path="faiss_index"):
-        """Saves the FAISS index to disk."""
-        self.vector_db.save_local(path)
+        """Saves the vectors, search index and chunks to disk along with a fresh store version."""
+        os.makedirs(path, exist_ok=True)
+        if self.index.needs_rebuild(COLLECTION_NAME):
+            self._rebuild_index()
+
+        # Write next to the target and swap in, so running workers keep their mapping of the old file
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        os.replace(vectors_path + ".tmp", vectors_path)
+
+        self.index.save_collection(COLLECTION_NAME, os.path.join(path, COLLECTION_NAME))
+        self.recall_at_k = self.measure_recall()
+
+        lexical_path = os.path.join(path, LEXICAL_INDEX_DIR)
+        if self.hybrid_search:
+            if self.lexical_index is None:
+                self._build_lexical_index()
+            self.lexical_index.save(lexical_path)
+        elif os.path.isdir(lexical_path):
+            # Would go stale while hybrid search is off
+            shutil.rmtree(lexical_path)
+
+        self.version = uuid.uuid4().hex
+        with open(os.path.join(path, STORE_INFO_FILE), "w") as f:
+            json.dump({
+                "version": self.version,
+                "saved_at": datetime.now(timezone.utc).isoformat(),
+                "count": int(self.vectors.shape[0]),
+                "dimension": int(self.vectors.shape[1]),
+                "backend": self.backend,
+                "hybrid_search": self.hybrid_search,
+                "index": self.get_index_info(),
+                "recall_at_10": self.recall_at_k,
+            }, f)
+
+    @staticmethod
+    def read_version(path="faiss_index") -> str:
+        """Reads the store version, falling back to a fingerprint of the index files."""
+        info_path = os.path.join(path, STORE_INFO_FILE)
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                return json.load(f)["version"]
 
-    def load_vector_store(self, path="faiss_index", embeddings_function=None):
-        """Loads a FAISS index from disk."""
-        """Retrieves the top-k most relevant chunks."""
+        digest = hashlib.sha1()
+        for file_name in sorted(os.listdir(path)):
+            stat = os.stat(os.path.join(path, file_name))
+            digest.update(f"{file_name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def load_vector_store(self, path="faiss_index", embeddings_function=None,
+                          async_embeddings_function=None, load_vectors: bool = False):
+        """Memory-maps a store from disk.
+
+        `async_embeddings_function` is an optional coroutine function used by `aquery`
+        to embed the query without blocking the event loop. `load_vectors` also maps the
+        float32 vectors, which only index builds need; with them, a store saved by another
+        backend is re-indexed instead of rejected, and the index is loaded writable so
+        documents can be added.
+        """
         if embeddings_function is None:
             raise ValueError("An embedding function must be provided for load_vector_store.")
-        self.vector_db = FAISS.load_local(path, embeddings_function,
-                                          allow_dangerous_deserialization=True)
+
+        if not self.exists(path):
+            if not self.is_legacy(path):
+                raise FileNotFoundError(f"No vector store found at {path}")
+            self.logger.warning(f"{path} holds a LangChain FAISS index, migrating it...")
+            self.migrate_legacy_store(path)
+
+        saved_backend = VectorDBEnums.NUMPY.value
+        info_path = os.path.join(path, STORE_INFO_FILE)
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                saved_backend = json.load(f).get("backend", saved_backend)
+
+        if load_vectors:
+            self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+
+        if saved_backend == self.backend:
+            self.index.load_collection(COLLECTION_NAME, os.path.join(path, COLLECTION_NAME),
+                                       writable=load_vectors)
+        elif load_vectors:
+            chunk_store = ChunkStore.open(os.path.join(path, COLLECTION_NAME, CHUNKS_FILE))
+            self._rebuild_index(chunk_store.get(list(range(len(chunk_store)))))
+        else:
+            raise ValueError(
+                f"{path} was built with the {saved_backend} backend but {self.backend} is configured. "
+                "Re-index it with `python build_vector_store.py`."
+            )
+
+        if self.hybrid_search:
+            lexical_path = os.path.join(path, LEXICAL_INDEX_DIR)
+            if BM25Index.exists(lexical_path):
+                self.lexical_index = BM25Index.load(lexical_path, k1=self.bm25_k1, b=self.bm25_b)
+            if self.lexical_index is None or len(self.lexical_index) != len(self.chunk_store):
+                # Stores saved without hybrid search get their lexical index built here
+                self._build_lexical_index()
+
+        self.embeddings_function = embeddings_function
+        self.async_embeddings_function = async_embeddings_function
+        self.version = self.read_version(path)
+
+    @staticmethod
+    def is_legacy(path="faiss_index") -> bool:
+        """Whether `path` holds a LangChain FAISS store (index.faiss + index.pkl)."""
+        return os.path.exists(os.path.join(path, LEGACY_INDEX_FILE)) and \
+            os.path.exists(os.path.join(path, LEGACY_DOCSTORE_FILE))
+
+    def migrate_legacy_store(self, path="faiss_index"):
+        """Converts a LangChain FAISS store (index.faiss + index.pkl) in place, without re-embedding.
+
+        Neither LangChain nor, for the flat indexes LangChain builds, FAISS is needed.
+        """
+        with open(os.path.join(path, LEGACY_DOCSTORE_FILE), "rb") as f:
+            docstore, index_to_docstore_id = _LegacyDocstoreUnpickler(f).load()
+
+        vectors = _read_legacy_vectors(os.path.join(path, LEGACY_INDEX_FILE))
+        ids = [index_to_docstore_id[row] for row in range(len(vectors))]
+        documents = [
+            Chunk(page_content=docstore._dict[chunk_id].page_content,
+                  metadata=docstore._dict[chunk_id].metadata, id=chunk_id)
+            for chunk_id in ids
+        ]
+
+        self.vectors = vectors
+        self.index.create_collection(COLLECTION_NAME, self.vectors.shape[1], do_reset=True)
+        self._insert(documents, self.vectors, ids)
+        self.save_vector_store(path)
+
+    def lexical_search(self, query_text: str, k=5):
+        """Rows of the keyword candidates fused by hybrid search, or None without hybrid search."""
+        if self.lexical_index is None:
+            return None
+
+        _, lexical_rows = self.lexical_index.search(query_text, max(k, self.hybrid_candidates))
+        return lexical_rows
+
+    async def alexical_search(self, query_text: str, k=5):
+        """Like `lexical_search`, in a worker thread; it doesn't need the query embedding."""
+        if self.lexical_index is None:
+            return None
+        return await asyncio.to_thread(self.lexical_search, query_text, k)
+
+    def search(self, query_text: str, query_vector, k=5, lexical_rows=None):
+        """Top-k chunks for an embedded query as (chunk, score) pairs.
+
+        Scores are the index's distances / similarities, or fused RRF scores (higher is
+        better) with hybrid search. `lexical_rows` may be passed in when `lexical_search`
+        already ran, e.g. while the query was being embedded.
+        """
+        if self.lexical_index is None:
+            return self.index.search_by_vector(COLLECTION_NAME, query_vector, k)
+
+        candidates = max(k, self.hybrid_candidates)
+        _, vector_rows = self.index.search_rows(COLLECTION_NAME, [query_vector], candidates)
+        if lexical_rows is None:
+            lexical_rows = self.lexical_search(query_text, k)
+
+        rows, scores = reciprocal_rank_fusion([vector_rows[0], lexical_rows], k=self.rrf_k, limit=k)
+        return list(zip(self.chunk_store.get(rows), scores))
+
+    def lexical_query(self, query_text: str, k=5, lexical_rows=None):
+        """Top-k chunks by keyword search alone as (chunk, score) pairs, for when the query
+        could not be embedded in time. Empty without hybrid search."""
+        if lexical_rows is None:
+            lexical_rows = self.lexical_search(query_text, k)
+        if lexical_rows is None:
+            return []
+
+        rows, scores = reciprocal_rank_fusion([lexical_rows], k=self.rrf_k, limit=k)
+        return list(zip(self.chunk_store.get(rows), scores))
 
     def query(self, query_text: str, k=5):
-        """Retrieves the top-k most relevant chunks."""
+        """Retrieves the top-k most relevant chunks as (chunk, score) pairs."""
+
+        query_vector = self.embeddings_function(query_text)
+        return self.search(query_text, query_vector, k)
+
+    async def aquery(self, query_text: str, k=5, query_vector=None, lexical_rows=None):
+        """Retrieves the top-k most relevant chunks without blocking the event loop.
+
+        The query is embedded with the async embedding function (unless `query_vector` is
+        already known), and the CPU-bound search runs in a worker thread.
+        """
+        if query_vector is None:
+            if self.async_embeddings_function is None:
+                return await asyncio.to_thread(self.query, query_text, k)
+
+            query_vector = await self.async_embeddings_function(query_text)
 
-        results = self.vector_db.similarity_search_with_score(query_text, k=k)
-        return results
\ No newline at end of file
+        return await asyncio.to_thread(self.search, query_text, query_vector, k, lexical_rows)
@@ -0,0 +1,30 @@
+import numpy as np
+from .vector_db_enums import DistanceMethodEnums
+from .numpy_search import blocked_top_k
+
+
+def exact_top_k(vectors, queries, k: int, distance_method: str = DistanceMethodEnums.L2.value) -> np.ndarray:
+    """Brute-force float32 top-k rows for each query; the baseline for recall checks."""
+    _, rows = blocked_top_k(vectors, queries, k, distance_method=distance_method)
+    return rows
+
+
+def recall_at_k(exact_rows, approx_rows) -> float:
+    """Mean fraction of the exact top-k rows that the approximate search also returned."""
+    exact_rows = np.asarray(exact_rows)
+    approx_rows = np.asarray(approx_rows)
+    if exact_rows.size == 0:
+        return 1.0
+
+    hits = [
+        len(np.intersect1d(exact, approx[approx >= 0]))
+        for exact, approx in zip(exact_rows, approx_rows)
+    ]
+    return float(np.mean(hits) / exact_rows.shape[1])
+
+
+def sample_queries(vectors, n_queries: int = 100, seed: int = 0) -> np.ndarray:
+    """Sample stored vectors as recall-check queries."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(vectors.shape[0], size=min(n_queries, vectors.shape[0]), replace=False)
+    return np.asarray(vectors[np.sort(rows)], dtype=np.float32)
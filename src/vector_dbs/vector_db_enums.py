@@ -3,7 +3,20 @@ from enum import Enum
 class VectorDBEnums(Enum):
     FAISS = "FAISS"
     QDRANT = "QDRANT"
+    NUMPY = "NUMPY"
 
 class DistanceMethodEnums(Enum):
     COSINE = "cosine"
-    DOT = "dot"
\ No newline at end of file
+    DOT = "dot"
+    L2 = "l2"
+
+class VectorDTypeEnums(Enum):
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+    INT8 = "int8"
+
+class FaissIndexTypeEnums(Enum):
+    FLAT = "flat"
+    IVF_FLAT = "ivf_flat"
+    IVF_PQ = "ivf_pq"
+    HNSW = "hnsw"
@@ -1,28 +1,46 @@
-from .providers import FaissDBProvider, QdrantDBProvider
+import importlib
 from .vector_db_enums import VectorDBEnums
-# from controllers.BaseController import BaseController
+
 
 class VectorDBProviderFactory:
+    """Creates vector DB providers by backend name.
+
+    Backends are registered by module path, so faiss or qdrant are only imported when
+    their backend is selected.
+    """
+
+    # backend -> (provider module, provider class)
+    _PROVIDERS = {
+        VectorDBEnums.NUMPY.value: (".providers.numpy_db_provider", "NumpyDBProvider"),
+        VectorDBEnums.FAISS.value: (".providers.faiss_db_provider", "FaissDBProvider"),
+        VectorDBEnums.QDRANT.value: (".providers.qdrant_db_provider", "QdrantDBProvider"),
+    }
+
     def __init__(self, config):
         self.config = config
-        # self.base_controller = BaseController()
-    ## NOTE: NOT USED
-    def create(self, provider: str):
-
-        if provider == VectorDBEnums.FAISS.value:
-            db_path = self.base_controller.get_database_path(db_name=self.config.VECTOR_DB_PATH)
-
-            return FaissDBProvider(
-                db_path=db_path,
-                distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
-            )
-        
-        if provider == VectorDBEnums.QDRANT.value:
-            db_path = self.base_controller.get_database_path(db_name=self.config.VECTOR_DB_PATH)
-
-            return QdrantDBProvider(
-                db_path=db_path,
-                distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
-            )
-        
-        return None
\ No newline at end of file
+
+    @classmethod
+    def register(cls, provider: str, module: str, class_name: str):
+        cls._PROVIDERS[provider] = (module, class_name)
+
+    @classmethod
+    def get_provider_class(cls, provider: str):
+        if provider not in cls._PROVIDERS:
+            return None
+        module, class_name = cls._PROVIDERS[provider]
+        return getattr(importlib.import_module(module, __package__), class_name)
+
+    def create(self, provider: str, db_path: str = None, **options):
+        """
+        Create a provider; `options` are passed on to its constructor, e.g. the FAISS index
+        options or the NumPy index dtype.
+        """
+        provider_class = self.get_provider_class(provider)
+        if provider_class is None:
+            return None
+
+        return provider_class(
+            db_path=db_path,
+            distance_method=self.config.VECTOR_DB_DISTANCE_METHOD,
+            **options
+        )
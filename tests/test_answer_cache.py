@@ -0,0 +1,49 @@
+import sys
+import os
+
+import numpy as np
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# answer_cache imports `utils` the way the app does, from inside src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from src.llms.answer_cache import AnswerCache
+
+
+def _axis(i, d=8):
+    vector = np.zeros(d, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+def test_evicted_entry_slot_gives_no_semantic_hit():
+    cache = AnswerCache(max_entries=2, similarity_threshold=0.9)
+    cache.put("first question", _axis(0), "v1", "first answer", "prompt")
+    cache.put("second question", _axis(1), "v1", "second answer", "prompt")
+    cache.put("third question", _axis(2), "v1", "third answer", "prompt")  # evicts the first
+
+    assert cache.get("first question reworded", _axis(0), "v1") is None
+    # The freed slot now holds the third entry
+    assert cache.get("third question reworded", _axis(2), "v1") == ("third answer", "prompt")
+    assert cache.stats()["size"] == 2
+
+def test_version_change_misses():
+    cache = AnswerCache(similarity_threshold=0.9)
+    cache.put("question", _axis(0), "v1", "answer", "prompt")
+
+    assert cache.get("question", _axis(0), "v2") is None
+    assert cache.get("question", _axis(0), "v1") is None  # entries of older versions are dropped
+    assert cache.stats()["misses"] == 2
+
+def test_semantic_hit_threshold():
+    cache = AnswerCache(similarity_threshold=0.8)
+    cache.put("question", [0.0, 1.0], "v1", "answer", "prompt")
+
+    # Cosine similarities of 0.8 (3-4-5 triangle), 0.96 and 0.6 with the cached query
+    assert cache.get("similar question", [0.6, 0.8], "v1") == ("answer", "prompt")
+    assert cache.get("close question", [0.28, 0.96], "v1") == ("answer", "prompt")
+    assert cache.get("other question", [0.8, 0.6], "v1") is None
+
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 2
+    assert stats["misses"] == 1
@@ -0,0 +1,80 @@
+import sys
+import os
+import asyncio
+import time
+
+import pytest
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.call_policy import CallPolicy, CircuitBreaker, CircuitState
+from src.utils.exceptions import CircuitOpenError
+
+
+class Upstream:
+    """Answers after the given delays, one per call; an exception instance is raised instead."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def __call__(self):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        await asyncio.sleep(outcome)
+        return outcome
+
+
+def test_timeouts_and_retryable_errors_are_retried():
+    policy = CallPolicy(timeout=0.05, max_retries=2, retryable=(ConnectionError,), backoff_base=0.001)
+    upstream = Upstream(1.0, ConnectionError("reset"), 0.01)
+
+    assert asyncio.run(policy.call(upstream)) == 0.01
+    assert upstream.calls == 3
+    assert policy.stats()["retries"] == 2 and policy.stats()["timeouts"] == 1
+
+
+def test_other_errors_are_raised_without_retry():
+    policy = CallPolicy(max_retries=3, retryable=(ConnectionError,))
+    upstream = Upstream(ValueError("bad request"))
+
+    with pytest.raises(ValueError):
+        asyncio.run(policy.call(upstream))
+    assert upstream.calls == 1
+
+
+def test_slow_calls_are_hedged_and_the_first_success_wins():
+    policy = CallPolicy(hedge=True, hedge_quantile=0.95, hedge_min_delay=0.01, hedge_min_samples=5)
+    policy.latencies.extend([0.02] * 5)
+    upstream = Upstream(0.5, 0.02)
+
+    start = time.perf_counter()
+    result = asyncio.run(policy.call(upstream))
+
+    assert result == 0.02
+    assert time.perf_counter() - start < 0.2
+    assert policy.hedges == 1 and policy.hedge_wins == 1
+
+
+def test_circuit_opens_fails_fast_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    policy = CallPolicy(retryable=(ConnectionError,), circuit_breaker=breaker)
+    upstream = Upstream(ConnectionError("down"), ConnectionError("down"), 0.0)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await policy.call(upstream)
+        with pytest.raises(CircuitOpenError):
+            await policy.call(upstream)
+        assert breaker.state is CircuitState.OPEN
+
+        await asyncio.sleep(0.06)
+        return await policy.call(upstream)  # the trial call
+
+    assert asyncio.run(scenario()) == 0.0
+    assert upstream.calls == 3
+    assert breaker.state is CircuitState.CLOSED and breaker.rejected == 1
@@ -0,0 +1,112 @@
+import sys
+import os
+import asyncio
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# chat_history imports `utils` the way the app does, from inside src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from src.llms.chat_history import ChatHistoryWindow, HistorySummarizer
+
+
+class InMemorySession:
+    """Stands in for ChatLogManager for a single session, and for the summarizing model."""
+
+    def __init__(self):
+        self.messages = []
+        self.summary = None
+        self.summarized_count = 0
+
+    def append(self, role, content):
+        self.messages.append({"role": role, "content": content, "index": len(self.messages)})
+
+    async def get_chat_window(self, user_id, session_id, last_n):
+        return {"messages": self.messages[-last_n:], "summary": self.summary,
+                "summarized_count": self.summarized_count, "message_count": len(self.messages)}
+
+    async def get_messages(self, user_id, session_id, skip, limit):
+        return self.messages[skip:skip + limit]
+
+    async def update_summary(self, user_id, session_id, summary, summarized_count, previous_summarized_count):
+        self.summary, self.summarized_count = summary, summarized_count
+        return True
+
+    def get(self, group, key, vars={}):
+        return key
+
+    async def agenerate_text(self, prompt, chat_history=None, max_output_tokens=None):
+        return "summary"
+
+
+def _session(turns):
+    messages = [{"role": "system", "content": "system prompt"}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"question {i}"})
+        messages.append({"role": "assistant", "content": f"answer {i}"})
+    return messages
+
+def test_window_keeps_last_turns():
+    window = ChatHistoryWindow(max_turns=2, token_budget=1000)
+    selected = window.select(_session(5))
+    assert [message["content"] for message in selected] == ["question 3", "answer 3", "question 4", "answer 4"]
+
+def test_window_respects_token_budget_and_starts_on_a_question():
+    window = ChatHistoryWindow(max_turns=5, token_budget=20)
+    selected = window.select(_session(5)[:-1] + [{"role": "assistant", "content": "a" * 24}])
+
+    assert selected[0]["role"] == "user"
+    assert selected[-1]["content"] == "a" * 24
+    assert len(selected) < 10
+
+def test_every_turn_is_in_the_window_or_the_summary():
+    async def scenario():
+        session = InMemorySession()
+        window = ChatHistoryWindow(max_turns=2, token_budget=40)
+        summarizer = HistorySummarizer(session, session, session, batch_messages=4)
+
+        for turn in range(12):
+            # Some answers are too long for the token budget, so the window drops them early
+            window_messages = await session.get_chat_window("user", "session", window.max_messages + 4)
+            selected = window.select(window_messages["messages"], session.summarized_count)
+            selected_indexes = {message["index"] for message in selected}
+            for index in range(len(session.messages)):
+                assert index in selected_indexes or index < session.summarized_count, (turn, index)
+
+            session.append("user", f"question {turn}")
+            session.append("assistant", "a" * 90 if turn % 3 == 0 else f"answer {turn}")
+            summarizer.maybe_schedule(
+                "user", "session",
+                summarize_until=window.window_start(window_messages["messages"], window_messages["message_count"]),
+                summarized_count=session.summarized_count
+            )
+            await summarizer.aclose()
+        return session
+
+    session = asyncio.run(scenario())
+    assert session.summarized_count > 0
+
+
+def test_summary_waits_for_missing_messages():
+    async def scenario():
+        session = InMemorySession()
+        for turn in range(4):
+            session.append("user", f"question {turn}")
+            session.append("assistant", f"answer {turn}")
+        del session.messages[2]  # reserved by a write that is not done yet
+
+        summarizer = HistorySummarizer(session, session, session, batch_messages=4)
+        summarizer.maybe_schedule("user", "session", summarize_until=6, summarized_count=0)
+        await summarizer.aclose()
+
+        async def failed_read(user_id, session_id, skip, limit):
+            return []  # as ChatLogManager.get_messages does on a MongoDB error
+
+        session.get_messages = failed_read
+        summarizer.maybe_schedule("user", "session", summarize_until=6, summarized_count=0)
+        await summarizer.aclose()
+        return session
+
+    session = asyncio.run(scenario())
+    assert session.summary is None
+    assert session.summarized_count == 0
@@ -0,0 +1,207 @@
+import sys
+import os
+import asyncio
+from collections import defaultdict
+from types import SimpleNamespace
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# chat_log_manager imports `utils` the way the app does, from inside src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from pymongo.errors import BulkWriteError
+from src.mongo_db.chat_log_manager import ChatLogManager
+
+
+def _matches(document, query):
+    for field, condition in query.items():
+        if field == "messages.index":
+            if condition["$ne"] in [message["index"] for message in document.get("messages", [])]:
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(field)
+            if value < condition.get("$gte", value) or value > condition.get("$lte", value):
+                return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+class InMemoryCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, field, direction):
+        self.documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class InMemoryCollection:
+    """The upserts and finds ChatLogManager makes on its messages and prompts collections."""
+
+    def __init__(self, unique=()):
+        self.documents = []
+        self.unique = unique
+        self.failures = 0
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection lost")
+
+        write_errors = []
+        for i, operation in enumerate(operations):
+            query, update = operation._filter, operation._doc
+            document = next((document for document in self.documents if _matches(document, query)), None)
+            if document is None:
+                key = {field: query[field] for field in self.unique}
+                if self.unique and any(_matches(existing, key) for existing in self.documents):
+                    write_errors.append({"index": i, "code": 11000, "errmsg": "duplicate key"})
+                    continue
+                document = dict(update.get("$setOnInsert", {}))
+                self.documents.append(document)
+
+            document.update(update.get("$set", {}))
+            if "$push" in update:
+                pushed = update["$push"]["messages"]["$each"]
+                document["messages"] = sorted(document.get("messages", []) + pushed,
+                                              key=lambda message: message["index"])
+
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "writeConcernErrors": []})
+
+    def find(self, query, projection=None):
+        return InMemoryCursor([document for document in self.documents if _matches(document, query)])
+
+
+class InMemorySessions:
+    """The session documents, as the legacy migration reads and updates them."""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    def find(self, query, projection=None):
+        return InMemoryCursor([{"_id": key, **session} for key, session in self.sessions.items()
+                               if "messages" in session])
+
+    async def update_one(self, query, update):
+        session = self.sessions[query["_id"]]
+        if "messages" not in session:
+            return SimpleNamespace(modified_count=0)
+        session["message_count"] = session.get("message_count", 0) + len(session.pop("messages"))
+        return SimpleNamespace(modified_count=1)
+
+
+class InMemoryChatLogManager(ChatLogManager):
+    """ChatLogManager with its MongoDB collections replaced by in-memory ones."""
+
+    def __init__(self, **kwargs):
+        super().__init__(mongo_conn=None, db_client=defaultdict(lambda: None),
+                         collection_name="chatbot", **kwargs)
+        self.sessions = {}
+        self.collection = InMemorySessions(self.sessions)
+        self.messages_collection = InMemoryCollection(unique=("user_id", "session_id", "bucket"))
+        self.prompts_collection = InMemoryCollection()
+
+    async def _reserve_positions(self, user_id, session_id, count, now):
+        session = self.sessions.get((user_id, session_id))
+        before = dict(session) if session else None
+        if session is None:
+            session = self.sessions[(user_id, session_id)] = {"message_count": 0}
+        session["message_count"] += count
+        return before
+
+    async def _get_session(self, user_id, session_id):
+        session = self.sessions.get((user_id, session_id))
+        return {"message_count": session["message_count"]} if session else None
+
+
+def _turn(i):
+    return [{"role": "user", "content": f"question {i}"},
+            {"role": "assistant", "content": f"answer {i}", "full_prompt": "prompt"}]
+
+
+def test_active_session_is_served_from_cache():
+    async def scenario():
+        manager = InMemoryChatLogManager(session_cache_bytes=10000, session_cache_messages=4)
+        for i in range(3):
+            await manager.insert_or_update_chat_log("user", "session", _turn(i))
+            window = await manager.get_chat_window("user", "session", last_n=4)
+        return manager, window
+
+    manager, window = asyncio.run(scenario())
+    assert manager.mongo_reads == 0
+    assert window["message_count"] == 6
+    assert [message["index"] for message in window["messages"]] == [2, 3, 4, 5]
+    assert "full_prompt" not in window["messages"][-1]
+    assert manager.session_cache_stats()["hit_rate"] == 1.0
+
+
+def test_append_from_another_worker_drops_cached_session():
+    async def scenario():
+        manager = InMemoryChatLogManager(session_cache_bytes=10000)
+        other_worker = InMemoryChatLogManager()
+        other_worker.sessions = manager.sessions
+        other_worker.messages_collection = manager.messages_collection
+
+        await manager.insert_or_update_chat_log("user", "session", _turn(0))
+        await other_worker.insert_or_update_chat_log("user", "session", _turn(1))
+        await manager.insert_or_update_chat_log("user", "session", _turn(2))
+        return manager, await manager.get_chat_history("user", "session")
+
+    manager, history = asyncio.run(scenario())
+    assert manager.mongo_reads == 1
+    assert [message["content"] for message in history][2:4] == ["question 1", "answer 1"]
+    assert len(history) == 6
+
+
+def test_messages_are_bucketed_across_bucket_boundaries():
+    async def scenario():
+        manager = InMemoryChatLogManager(bucket_size=3)
+        for i in range(3):
+            await manager.insert_or_update_chat_log("user", "session", _turn(i))
+        return manager, await manager.get_messages("user", "session", skip=2, limit=3)
+
+    manager, messages = asyncio.run(scenario())
+    buckets = {bucket["bucket"]: [message["index"] for message in bucket["messages"]]
+               for bucket in manager.messages_collection.documents}
+    assert buckets == {0: [0, 1, 2], 1: [3, 4, 5]}
+    assert [message["index"] for message in messages] == [2, 3, 4]
+    assert [message["content"] for message in messages] == ["question 1", "answer 1", "question 2"]
+    assert len(manager.prompts_collection.documents) == 3
+
+
+def test_legacy_migration_survives_interruption():
+    async def scenario():
+        manager = InMemoryChatLogManager(bucket_size=2)
+        legacy_messages = _turn(0) + _turn(1) + [{"role": "user", "content": "question 2"}]
+        manager.sessions[("user", "session")] = {"user_id": "user", "session_id": "session",
+                                                  "messages": legacy_messages}
+
+        # Interrupted before any bucket is written: the session keeps its messages
+        manager.messages_collection.failures = 1
+        try:
+            await manager.migrate_legacy_sessions()
+        except ConnectionError:
+            pass
+        assert "messages" in manager.sessions[("user", "session")]
+
+        # Interrupted after the buckets are written: they are not written twice
+        await manager._write_messages("user", "session", 0, legacy_messages)
+        migrated = await manager.migrate_legacy_sessions()
+        return manager, migrated, await manager.get_chat_history("user", "session")
+
+    manager, migrated, history = asyncio.run(scenario())
+    assert migrated == 1
+    assert "messages" not in manager.sessions[("user", "session")]
+    assert manager.sessions[("user", "session")]["message_count"] == 5
+    assert [message["index"] for message in history] == [0, 1, 2, 3, 4]
+    assert history[-1]["content"] == "question 2"
+    assert len(manager.prompts_collection.documents) == 2
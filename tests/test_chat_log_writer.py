@@ -0,0 +1,157 @@
+import sys
+import os
+import asyncio
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.mongo_db.chat_log_writer import ChatLogWriter
+
+
+class InMemoryChatLogs:
+    """Stands in for ChatLogManager, recording each bulk write."""
+
+    def __init__(self):
+        self.message_counts = {}
+        self.sessions = {}
+        self.batches = []
+        self.expiry_refreshes = 0
+
+    async def reserve_chat_log(self, user_id, session_id, count):
+        key = (user_id, session_id)
+        before = {"message_count": self.message_counts[key]} if key in self.message_counts else None
+        self.message_counts[key] = self.message_counts.get(key, 0) + count
+        return before
+
+    async def write_chat_logs(self, chat_logs, sessions):
+        await asyncio.sleep(0.01)
+        self.batches.append(chat_logs)
+        for (user_id, session_id, messages), session in zip(chat_logs, sessions):
+            self._write(user_id, session_id, messages, session["message_count"] if session else 0)
+
+    def _write(self, user_id, session_id, messages, first_index):
+        stored = self.sessions.setdefault((user_id, session_id), {})
+        for index, message in enumerate(messages, start=first_index):
+            stored[index] = {**message, "index": index}
+
+    async def refresh_chat_logs_expiry(self, chat_logs, sessions):
+        self.expiry_refreshes += 1
+
+    def messages(self, user_id, session_id):
+        stored = self.sessions.get((user_id, session_id), {})
+        return [stored[index] for index in sorted(stored)]
+
+    async def get_chat_window(self, user_id, session_id, last_n):
+        key = (user_id, session_id)
+        if key not in self.message_counts:
+            return None
+        return {"messages": self.messages(user_id, session_id)[-last_n:], "summary": None,
+                "summarized_count": 0, "message_count": self.message_counts[key]}
+
+
+class PartlyFailingChatLogs(InMemoryChatLogs):
+    """Writes only the first session of the first batch before failing, and fails every
+    expiry refresh."""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = 1
+
+    async def write_chat_logs(self, chat_logs, sessions):
+        if self.failures:
+            self.failures -= 1
+            (user_id, session_id, messages), session = chat_logs[0], sessions[0]
+            self._write(user_id, session_id, messages, session["message_count"] if session else 0)
+            raise ConnectionError("connection lost")
+        await super().write_chat_logs(chat_logs, sessions)
+
+    async def refresh_chat_logs_expiry(self, chat_logs, sessions):
+        raise ConnectionError("connection lost")
+
+
+def _turn(i):
+    return [{"role": "user", "content": f"question {i}"},
+            {"role": "assistant", "content": f"answer {i}", "full_prompt": "prompt"}]
+
+
+def test_writes_are_batched_and_flushed_on_close():
+    async def scenario():
+        store = InMemoryChatLogs()
+        writer = ChatLogWriter(store, max_batch_size=100, flush_interval=0.05)
+        await asyncio.gather(*(writer.insert_or_update_chat_log("user", f"session {i}", _turn(i))
+                               for i in range(10)))
+        assert store.batches == []
+
+        await writer.aclose()
+        return store, writer
+
+    store, writer = asyncio.run(scenario())
+    assert len(store.batches) == 1
+    assert len(store.sessions) == 10
+    assert writer.stats()["pending"] == 0
+
+
+def test_reads_include_queued_messages():
+    async def scenario():
+        store = InMemoryChatLogs()
+        writer = ChatLogWriter(store, max_batch_size=100, flush_interval=10)
+        await writer.insert_or_update_chat_log("user", "session", _turn(0))
+        await writer.insert_or_update_chat_log("user", "session", _turn(1))
+
+        window = await writer.get_chat_window("user", "session", last_n=3)
+        await writer.aclose()
+        return window, store
+
+    window, store = asyncio.run(scenario())
+    assert window["message_count"] == 4
+    assert [message["content"] for message in window["messages"]] == ["answer 0", "question 1", "answer 1"]
+    assert "full_prompt" not in window["messages"][-1]
+    assert len(store.messages("user", "session")) == 4
+
+
+def test_backpressure_bounds_pending_messages():
+    async def scenario():
+        store = InMemoryChatLogs()
+        writer = ChatLogWriter(store, max_batch_size=4, flush_interval=0.01, max_pending=4)
+        peak = 0
+
+        async def write(i):
+            nonlocal peak
+            await writer.insert_or_update_chat_log("user", f"session {i}", _turn(i))
+            peak = max(peak, writer.stats()["pending"])
+
+        await asyncio.gather(*(write(i) for i in range(12)))
+        await writer.aclose()
+        return store, peak
+
+    store, peak = asyncio.run(scenario())
+    assert peak <= 4
+    assert sum(len(messages) for messages in store.sessions.values()) == 24
+
+
+def test_failed_flush_is_retried_at_the_reserved_positions():
+    async def scenario():
+        store = PartlyFailingChatLogs()
+        writer = ChatLogWriter(store, max_batch_size=100, flush_interval=0.05)
+        for i in range(3):
+            await writer.insert_or_update_chat_log("user", f"session {i}", _turn(i))
+        await asyncio.sleep(0.08)
+        assert writer.stats()["failed_flushes"] == 1
+
+        # A turn queued while the failed batch waits for its retry
+        await writer.insert_or_update_chat_log("user", "session 0", _turn(3))
+        window = await writer.get_chat_window("user", "session 0", last_n=10)
+        await writer.aclose()
+        return store, writer, window
+
+    store, writer, window = asyncio.run(scenario())
+    assert window["message_count"] == 4
+    assert [message["index"] for message in window["messages"]] == [0, 1, 2, 3]
+    for i in range(3):
+        messages = store.messages("user", f"session {i}")
+        assert [message["index"] for message in messages] == list(range(len(messages)))
+        assert store.message_counts[("user", f"session {i}")] == len(messages)
+    assert [message["content"] for message in store.messages("user", "session 0")] == \
+        ["question 0", "answer 0", "question 3", "answer 3"]
+    assert writer.stats()["pending"] == 0
+    assert writer.stats()["failed_flushes"] == 0
@@ -0,0 +1,43 @@
+import sys
+import os
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# context_packer imports `utils` the way the app does, from inside src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from src.llms.context_packer import ContextPacker
+from src.vector_dbs.chunk_store import Chunk
+
+
+PAGE = " ".join(f"word{i}" for i in range(300))
+
+def _chunk(start, end, page=0, with_offsets=True):
+    metadata = {"source": "pricing.pdf", "page": page}
+    if with_offsets:
+        metadata["start_index"] = start
+    return Chunk(page_content=PAGE[start:end], metadata=metadata)
+
+def test_overlapping_chunks_are_merged():
+    packer = ContextPacker(token_budget=10000)
+    # Retrieved out of order, overlapping by 200 characters
+    passages = packer.pack([_chunk(800, 1800), _chunk(0, 1000)])
+    assert passages == [PAGE[0:1800]]
+
+def test_overlap_found_from_text_without_offsets():
+    packer = ContextPacker(token_budget=10000)
+    passages = packer.pack([_chunk(0, 1000, with_offsets=False), _chunk(800, 1800, with_offsets=False)])
+    assert passages == [PAGE[0:1800]]
+
+def test_near_duplicates_are_dropped():
+    packer = ContextPacker(token_budget=10000)
+    passages = packer.pack([_chunk(0, 1000, page=1), _chunk(0, 1000, page=2), _chunk(1500, 2000, page=3)])
+    assert passages == [PAGE[0:1000], PAGE[1500:2000]]
+
+def test_token_budget_is_respected():
+    packer = ContextPacker(token_budget=120)
+    passages = packer.pack([_chunk(0, 300, page=1), _chunk(1000, 1300, page=2), _chunk(2000, 2300, page=3)])
+
+    assert sum(packer.count_tokens(passage) for passage in passages) <= 120
+    assert passages[0] == PAGE[0:300]
+    assert packer.token_cache.stats()["hits"] > 0
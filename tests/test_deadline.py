@@ -0,0 +1,183 @@
+import sys
+import os
+import asyncio
+import time
+
+import pytest
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# rag_provider imports `utils` the way the app does, from inside src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from src.llms.rag_provider import RAGProvider
+from src.llms.llms_enums import OpenAIEnums, DegradationEnums
+from src.llms.answer_cache import AnswerCache
+from src.utils.deadline import Deadline
+
+
+class Chunk:
+    def __init__(self, page_content):
+        self.page_content = page_content
+
+
+class FakeVectorStore:
+    version = "v1"
+    lexical_index = object()
+
+    async def alexical_search(self, query_text, k=5):
+        return [0]
+
+    def lexical_query(self, query_text, k=5, lexical_rows=None):
+        return [(Chunk("keyword passage"), 1.0)]
+
+    async def aquery(self, query_text, k=5, query_vector=None, lexical_rows=None):
+        return [(Chunk("vector passage"), 1.0)]
+
+
+class SlowChatLogs:
+    def __init__(self, delay):
+        self.delay = delay
+        self.saved = []
+
+    async def get_chat_history(self, user_id, session_id):
+        await asyncio.sleep(self.delay)
+        return None
+
+    async def insert_or_update_chat_log(self, user_id, session_id, messages):
+        await asyncio.sleep(self.delay)
+        self.saved.extend(messages)
+
+
+class FakeClient:
+    enums = OpenAIEnums
+
+    def __init__(self, embedding_delay=0.0, generation_delay=0.0):
+        self.embedding_delay = embedding_delay
+        self.generation_delay = generation_delay
+
+    def construct_prompt(self, role, prompt, full_prompt=""):
+        return {"role": role, "content": prompt, "full_prompt": full_prompt}
+
+    async def aembed_text(self, text):
+        await asyncio.sleep(self.embedding_delay)
+        return [1.0, 0.0]
+
+    async def agenerate_text(self, prompt, chat_history=None):
+        await asyncio.sleep(self.generation_delay)
+        return f"generated from: {prompt}"
+
+
+class FakeTemplates:
+    version = "t1"
+
+    def get(self, group, key, vars={}):
+        return key
+
+    def render_rag_prompt(self, passages, query):
+        return " | ".join(passages)
+
+
+class VectorOnlyStore(FakeVectorStore):
+    lexical_index = None
+
+    async def alexical_search(self, query_text, k=5):
+        return None
+
+    def lexical_query(self, query_text, k=5, lexical_rows=None):
+        return []
+
+
+def answer(chat_logs, client, seconds=0.5, vector_store=None):
+    rag = RAGProvider(vector_store or FakeVectorStore(), chat_logs, client, client, FakeTemplates(),
+                      coalesce_requests=False)
+    deadline = Deadline(seconds)
+
+    async def scenario():
+        start = time.perf_counter()
+        result = await rag.answer_rag_question("user", "session", "query", deadline=deadline)
+        return result[0], time.perf_counter() - start
+
+    text, elapsed = asyncio.run(scenario())
+    return text, elapsed, deadline.degradations
+
+
+def test_healthy_upstreams_are_not_degraded():
+    text, _, degradations = answer(SlowChatLogs(0.0), FakeClient())
+
+    assert text == "generated from: vector passage"
+    assert degradations == []
+
+
+def test_brownout_degrades_within_the_deadline():
+    chat_logs = SlowChatLogs(1.0)
+    text, elapsed, degradations = answer(chat_logs, FakeClient(embedding_delay=1.0, generation_delay=1.0))
+
+    assert elapsed < 0.6
+    assert degradations == [
+        DegradationEnums.SKIPPED_HISTORY.value,
+        DegradationEnums.KEYWORD_SEARCH_ONLY.value,
+        DegradationEnums.RETRIEVAL_ONLY_ANSWER.value,
+        DegradationEnums.CHAT_LOG_WRITE_DEFERRED.value,
+    ]
+    assert text == "retrieval_only_prompt\n\nkeyword passage"
+
+
+def test_slow_embedding_without_keyword_search_gives_no_answer():
+    text, elapsed, degradations = answer(SlowChatLogs(0.0), FakeClient(embedding_delay=1.0),
+                                         vector_store=VectorOnlyStore())
+
+    assert elapsed < 0.6
+    assert text is None
+    assert degradations == [DegradationEnums.NO_PASSAGES.value]
+
+
+def test_cache_hit_does_not_log_the_cached_prompt():
+    chat_logs = SlowChatLogs(0.0)
+    cache = AnswerCache(similarity_threshold=0.9)
+    rag = RAGProvider(FakeVectorStore(), chat_logs, FakeClient(), FakeClient(), FakeTemplates(),
+                      answer_cache=cache, coalesce_requests=False)
+    cache.put("another query", [1.0, 0.0], rag.answer_cache_version, "cached answer", "another prompt")
+
+    async def scenario():
+        return await rag.answer_rag_question("user", "session", "query")
+
+    text, full_prompt, _ = asyncio.run(scenario())
+
+    assert text == "cached answer" and cache.semantic_hits == 1
+    assert full_prompt is None
+    assert chat_logs.saved[-1]["content"] == "cached answer" and chat_logs.saved[-1]["full_prompt"] is None
+
+
+class LimitedVectorStore(FakeVectorStore):
+    async def aquery(self, query_text, k=5, query_vector=None, lexical_rows=None):
+        return [(Chunk(f"passage {row}"), 1.0) for row in range(k)]
+
+
+def test_coalesced_generation_uses_each_request_passages():
+    client = FakeClient(generation_delay=0.2)
+    # Any request with a deadline retrieves half the passages
+    rag = RAGProvider(LimitedVectorStore(), SlowChatLogs(0.0), client, client, FakeTemplates(),
+                      stage_budgets={"shrink_k_below": 1.0})
+
+    async def scenario():
+        return await asyncio.gather(
+            rag.answer_rag_question("user", "a", "query", limit=4, deadline=Deadline(5.0)),
+            rag.answer_rag_question("user", "b", "query", limit=4),
+            rag.answer_rag_question("user", "c", "query", limit=4),
+        )
+
+    shrunk, full, same = [result[0] for result in asyncio.run(scenario())]
+
+    assert shrunk == "generated from: passage 0 | passage 1"
+    assert full == same == "generated from: passage 0 | passage 1 | passage 2 | passage 3"
+    assert rag.generation_flight.stats()["saved_calls"] == 1
+
+
+def test_request_without_a_deadline_waits_for_every_stage():
+    deadline = Deadline()
+    assert deadline.remaining() is None and deadline.budget(0.1) is None
+
+    deadline = Deadline(1.0)
+    assert deadline.budget(0.1) == pytest.approx(0.1)
+    assert deadline.budget(reserve=0.25) <= 0.75
@@ -0,0 +1,173 @@
+import sys
+import os
+import hashlib
+
+import numpy as np
+import pytest
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# build_vector_store imports `loaders`, `utils` and `config` the way the app does, from inside src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from src.loaders.ingest_manifest import IngestManifest
+
+
+class Page:
+    def __init__(self, page_content, metadata):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+class FakePDFLoader:
+    """Reads each "PDF" as one page of plain text."""
+
+    def __init__(self, directory, max_workers=None, max_in_flight=None):
+        self.directory = directory
+
+    def list_pdfs(self):
+        return sorted(file for file in os.listdir(self.directory) if file.endswith(".pdf"))
+
+    def iter_pdfs(self, files):
+        for file in files:
+            with open(os.path.join(self.directory, file), encoding="utf-8") as f:
+                yield file, [Page(f.read(), {"source": file})]
+
+
+class FakeTextProcessor:
+    """One chunk per line."""
+
+    def __init__(self, chunk_size=1000, chunk_overlap=100):
+        pass
+
+    def split_documents(self, pages):
+        return [Page(line, page.metadata) for page in pages for line in page.page_content.splitlines()]
+
+
+class FakeEmbeddingClient:
+    def __init__(self):
+        self.embedded = []
+
+    def set_embedding_model(self, model_id, embedding_size):
+        pass
+
+    def embed_text(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        return np.random.default_rng(seed).normal(size=8).astype(np.float32)
+
+    def embed_many(self, texts):
+        self.embedded.extend(texts)
+        return [self.embed_text(text) for text in texts]
+
+
+class FakeProviderFactory:
+    client = None
+
+    def __init__(self, config, settings):
+        pass
+
+    def create(self, provider):
+        return self.client
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_manifest_diff_and_chunk_ids(tmp_path):
+    for name, text in (("a.pdf", "alpha"), ("b.pdf", "beta"), ("c.pdf", "gamma")):
+        _write(tmp_path / name, text)
+    hashes = {name: IngestManifest.hash_file(str(tmp_path / name)) for name in ("a.pdf", "b.pdf", "c.pdf")}
+
+    manifest = IngestManifest(str(tmp_path / "store" / "manifest.json"))
+    assert not manifest.exists() and manifest.load().files == {}
+    for name, chunk_ids in (("a.pdf", ["a0"]), ("b.pdf", ["b0", "b1"]), ("c.pdf", ["c0"])):
+        manifest.set_file(name, hashes[name], chunk_ids)
+    manifest.save()
+
+    _write(tmp_path / "b.pdf", "beta, revised")
+    _write(tmp_path / "d.pdf", "delta")
+    current = {name: IngestManifest.hash_file(str(tmp_path / name)) for name in ("a.pdf", "b.pdf", "d.pdf")}
+    assert current["a.pdf"] == hashes["a.pdf"] and current["b.pdf"] != hashes["b.pdf"]
+
+    loaded = IngestManifest(manifest.path).load()
+    added, modified, deleted = loaded.diff(current)
+    assert (added, modified, deleted) == (["d.pdf"], ["b.pdf"], ["c.pdf"])
+    assert loaded.chunk_ids(modified + deleted + ["unknown.pdf"]) == ["b0", "b1", "c0"]
+
+    loaded.remove_file("c.pdf")
+    assert loaded.diff({"a.pdf": hashes["a.pdf"], "b.pdf": hashes["b.pdf"]}) == ([], [], [])
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    """Runs `build_and_save_vector_embeddings` over `tmp_path/docs` with fake extraction,
+    chunking and embedding; returns (run, docs directory, store path)."""
+    pytest.importorskip("langchain_community")
+    pytest.importorskip("langchain")
+    # The app's config requires these, though building the store uses none of them
+    for name in ("OPENAI_API_KEY", "MONGODB_URL", "MONGODB_DATABASE", "MONGODB_COLLECTION"):
+        monkeypatch.setenv(name, os.environ.get(name, "unused"))
+    from src import build_vector_store
+    from src.vector_dbs.providers.vector_store import VectorStore
+
+    docs, store_path = tmp_path / "docs", str(tmp_path / "store")
+    docs.mkdir()
+    for name, value in (("PDF_DIRECTORY", str(docs)), ("VECTOR_STORE_PATH", store_path),
+                        ("VECTOR_DB_BACKEND", "NUMPY"), ("HYBRID_SEARCH", True),
+                        ("INGEST_FLUSH_CHUNKS", 2)):
+        monkeypatch.setattr(build_vector_store.settings, name, value)
+    monkeypatch.setattr(build_vector_store, "PDFLoader", FakePDFLoader)
+    monkeypatch.setattr(build_vector_store, "TextProcessor", FakeTextProcessor)
+    monkeypatch.setattr(build_vector_store, "LLMProviderFactory", FakeProviderFactory)
+
+    def run(full_rebuild=False):
+        """The texts embedded by the run, and the (id, text) of every chunk in the saved store."""
+        client = FakeProviderFactory.client = FakeEmbeddingClient()
+        build_vector_store.build_and_save_vector_embeddings(full_rebuild=full_rebuild)
+
+        store = VectorStore.from_settings(build_vector_store.settings)
+        store.load_vector_store(store_path, client.embed_text, load_vectors=True)
+        chunks = store.chunk_store.get(list(range(len(store.chunk_store))))
+        assert store.vectors.shape[0] == len(chunks) == len(store.lexical_index)
+        return client.embedded, [(chunk.id, chunk.page_content) for chunk in chunks]
+
+    return run, docs, store_path
+
+
+def test_incremental_build_skips_unchanged_files_and_drops_stale_chunks(build):
+    run, docs, store_path = build
+    _write(docs / "a.pdf", "a one\na two")
+    _write(docs / "b.pdf", "b one\nb two\nb three")
+    _write(docs / "c.pdf", "c one")
+    embedded, _ = run()
+    assert sorted(embedded) == ["a one", "a two", "b one", "b three", "b two", "c one"]
+
+    _write(docs / "b.pdf", "b one\nb four")
+    os.remove(docs / "c.pdf")
+    embedded, chunks = run()
+
+    assert sorted(embedded) == ["b four", "b one"]
+    assert sorted(text for _, text in chunks) == ["a one", "a two", "b four", "b one"]
+    manifest = IngestManifest(os.path.join(store_path, "manifest.json")).load()
+    assert sorted(manifest.files) == ["a.pdf", "b.pdf"]
+    assert sorted(manifest.chunk_ids(["a.pdf", "b.pdf"])) == sorted(chunk_id for chunk_id, _ in chunks)
+
+    embedded, unchanged = run()
+    assert embedded == [] and unchanged == chunks
+
+
+def test_full_rebuild_reembeds_every_file(build):
+    run, docs, store_path = build
+    _write(docs / "a.pdf", "a one\na two")
+    _write(docs / "b.pdf", "b one")
+    _, chunks = run()
+
+    embedded, rebuilt = run(full_rebuild=True)
+
+    assert sorted(embedded) == ["a one", "a two", "b one"]
+    assert sorted(text for _, text in rebuilt) == sorted(text for _, text in chunks)
+    assert not {chunk_id for chunk_id, _ in rebuilt} & {chunk_id for chunk_id, _ in chunks}
+    manifest = IngestManifest(os.path.join(store_path, "manifest.json")).load()
+    assert sorted(manifest.chunk_ids(["a.pdf", "b.pdf"])) == sorted(chunk_id for chunk_id, _ in rebuilt)
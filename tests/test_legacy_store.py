@@ -0,0 +1,80 @@
+import sys
+import os
+import pickle
+import struct
+import types
+
+import numpy as np
+import pytest
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# The lexical index imports `utils` the way the app does, from inside src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from src.vector_dbs.providers.vector_store import VectorStore
+
+
+class InMemoryDocstore:
+    def __init__(self, documents):
+        self._dict = documents
+
+
+class Document:
+    def __init__(self, page_content, metadata):
+        self.page_content = page_content
+        self.metadata = metadata
+
+    def __getstate__(self):
+        # As pydantic models pickle themselves
+        return {"__dict__": dict(self.__dict__), "__pydantic_extra__": None,
+                "__pydantic_fields_set__": {"page_content", "metadata"}, "__pydantic_private__": None}
+
+
+def _write_legacy_store(path, vectors, texts, monkeypatch):
+    """Writes the files LangChain's FAISS.save_local does, without LangChain or FAISS."""
+    for module_name, cls in (("langchain_community.docstore.in_memory", InMemoryDocstore),
+                             ("langchain_core.documents.base", Document)):
+        for package in (module_name.split(".")[0], module_name.rsplit(".", 1)[0]):
+            monkeypatch.setitem(sys.modules, package, types.ModuleType(package))
+        module = types.ModuleType(module_name)
+        setattr(module, cls.__name__, cls)
+        monkeypatch.setitem(sys.modules, module_name, module)
+        monkeypatch.setattr(cls, "__module__", module_name)
+
+    count, dimension = vectors.shape
+    with open(os.path.join(path, "index.faiss"), "wb") as f:
+        f.write(struct.pack("<4siqqq?iQ", b"IxF2", dimension, count, 1 << 20, 1 << 20, True, 1, vectors.size))
+        f.write(vectors.astype("<f4").tobytes())
+
+    ids = [f"chunk-{row}" for row in range(count)]
+    docstore = InMemoryDocstore({chunk_id: Document(text, {"source": "policy.pdf"})
+                                 for chunk_id, text in zip(ids, texts)})
+    with open(os.path.join(path, "index.pkl"), "wb") as f:
+        pickle.dump((docstore, dict(enumerate(ids))), f)
+
+
+def test_legacy_store_is_migrated_on_load(tmp_path, monkeypatch):
+    vectors = np.random.default_rng(0).normal(size=(5, 16)).astype(np.float32)
+    texts = [f"chunk {row}" for row in range(5)]
+    _write_legacy_store(str(tmp_path), vectors, texts, monkeypatch)
+
+    store = VectorStore(hybrid_search=True)
+    store.load_vector_store(str(tmp_path), embeddings_function=lambda text: None)
+
+    assert VectorStore.exists(str(tmp_path))
+    assert np.array_equal(np.load(os.path.join(tmp_path, "vectors.npy")), vectors)
+    results = store.search("chunk 3", vectors[3], k=1)
+    assert results[0][0].id == "chunk-3"
+    assert results[0][0].page_content == "chunk 3"
+    assert results[0][0].metadata == {"source": "policy.pdf"}
+
+
+def test_legacy_docstore_refuses_other_classes(tmp_path, monkeypatch):
+    vectors = np.zeros((1, 4), dtype=np.float32)
+    _write_legacy_store(str(tmp_path), vectors, ["text"], monkeypatch)
+    with open(os.path.join(tmp_path, "index.pkl"), "wb") as f:
+        pickle.dump((types.SimpleNamespace(_dict={}), {0: "chunk-0"}), f)
+
+    with pytest.raises(pickle.UnpicklingError):
+        VectorStore().migrate_legacy_store(str(tmp_path))
@@ -0,0 +1,66 @@
+import sys
+import os
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# lexical_index imports `utils` the way the app does, from inside src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from src.utils.cleaning import normalize_arabic
+from src.vector_dbs.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_normalize_arabic():
+    assert normalize_arabic("أَسْعَارُ") == "اسعار"
+    assert normalize_arabic("الـــمدرسة") == "المدرسه"
+    assert normalize_arabic("إلى") == "الي"
+    assert normalize_arabic("١٢٣ Pricing") == "123 pricing"
+
+def test_tokenize_splits_product_codes():
+    assert tokenize("سعر XPro-200؟") == ["سعر", "xpro", "200"]
+
+def test_bm25_ranks_rare_terms_first():
+    index = BM25Index()
+    index.add(["الأسعار العامة", "سعر المنتج XPro-200", "منتج آخر"])
+    index.add(["الاسعار والخصومات"])
+
+    _, rows = index.search("كم سعر xpro 200", k=3)
+    assert rows[0] == 1
+
+    _, rows = index.search("الإسعار", k=3)
+    assert sorted(rows.tolist()) == [0, 3]
+
+def test_bm25_incremental_add_matches_one_add():
+    texts = ["alpha beta", "gamma", "beta beta delta", "", "alpha epsilon", "delta gamma alpha"]
+    whole = BM25Index()
+    whole.add(texts)
+
+    parts = BM25Index()
+    for start, end in ((0, 2), (2, 3), (3, 6)):
+        parts.add(texts[start:end])
+
+    # alpha, beta, gamma, delta, epsilon
+    assert whole.offsets.tolist() == [0, 3, 5, 7, 9, 10]
+    assert whole.postings.tolist() == [0, 4, 5, 0, 2, 1, 5, 2, 5, 4]
+    assert parts.vocabulary == whole.vocabulary
+    assert parts.offsets.tolist() == whole.offsets.tolist()
+    assert parts.postings.tolist() == whole.postings.tolist()
+    assert parts.term_freqs.tolist() == whole.term_freqs.tolist()
+
+def test_bm25_filter_renumbers_rows(tmp_path):
+    index = BM25Index()
+    index.add(["alpha", "beta", "gamma", "beta gamma"])
+    index.filter([True, False, True, True])
+
+    _, rows = index.search("beta", k=5)
+    assert rows.tolist() == [2]
+
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert len(loaded) == 3
+    assert loaded.search("gamma", k=5)[1].tolist() == index.search("gamma", k=5)[1].tolist()
+
+def test_reciprocal_rank_fusion():
+    rows, scores = reciprocal_rank_fusion([[1, 2, 3], [3, 4, -1]], k=60, limit=2)
+    assert rows == [3, 1]
+    assert scores[0] > scores[1]
@@ -0,0 +1,54 @@
+import sys
+import os
+import time
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.lru_cache import LRUCache
+from src.utils.cleaning import normalize_query
+
+def test_lru_eviction_order():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" becomes most recently used
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_expiry_counts_as_miss():
+    cache = LRUCache(max_size=4, ttl=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+    assert len(cache) == 0
+
+def test_hit_rate():
+    cache = LRUCache(max_size=4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_weight_limit_evicts_least_recently_used():
+    cache = LRUCache(max_size=10, max_weight=10, weigher=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("a", "xxxxxxx")  # replacing an entry re-weighs it
+
+    assert "b" not in cache
+    assert cache.get("a") == "xxxxxxx"
+    assert cache.stats()["weight"] == 7
+
+def test_normalize_query():
+    assert normalize_query("  What does   Desaisiv DO?\n") == "what does desaisiv do?"
@@ -0,0 +1,55 @@
+import sys
+import os
+import asyncio
+
+import pytest
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.metrics import MetricsRegistry, track_request, timed, STAGE_SECONDS, ERRORS
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("stage_seconds", "Stage latency.", ["stage"], buckets=(0.1, 1.0))
+    hits = registry.counter("cache_total", "Cache lookups.", ["result"])
+
+    for seconds in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(seconds, "search")
+    hits.inc("hit", amount=2)
+
+    text = registry.render()
+    assert '# TYPE stage_seconds histogram' in text
+    assert 'stage_seconds_bucket{stage="search",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="search",le="1"} 3' in text
+    assert 'stage_seconds_bucket{stage="search",le="+Inf"} 4' in text
+    assert 'stage_seconds_count{stage="search"} 4' in text
+    assert 'cache_total{result="hit"} 2' in text
+
+
+def test_stages_are_timed_per_request_and_errors_counted():
+    async def handle(fail):
+        with track_request() as timings:
+            with timed("test_search"):
+                await asyncio.sleep(0.02)
+            try:
+                with timed("test_generation"):
+                    if fail:
+                        raise RuntimeError("model unavailable")
+            except RuntimeError:
+                pass
+        return timings
+
+    async def scenario():
+        return await asyncio.gather(handle(False), handle(True))
+
+    errors_before = ERRORS.value("test_generation")
+    ok, failed = asyncio.run(scenario())
+
+    # Concurrent requests keep their own breakdowns
+    assert ok.stages["test_search"] == pytest.approx(0.02, abs=0.015)
+    assert set(failed.stages) == {"test_search", "test_generation"}
+    assert "test_search;dur=" in ok.server_timing() and "total;dur=" in ok.server_timing()
+    assert ERRORS.value("test_generation") == errors_before + 1
+    assert STAGE_SECONDS.snapshot("test_search")["count"] >= 2
@@ -0,0 +1,45 @@
+import sys
+import os
+import asyncio
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.micro_batcher import MicroBatcher
+
+
+def test_concurrent_items_are_batched_and_routed_back():
+    batches = []
+
+    async def square_all(items):
+        batches.append(list(items))
+        await asyncio.sleep(0.001)
+        return [item * item for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(square_all, max_batch_size=4, max_wait=0.01)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        await batcher.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    assert results == [i * i for i in range(10)]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+
+
+def test_batch_failure_reaches_its_callers_only():
+    async def fail_on_negative(items):
+        if any(item < 0 for item in items):
+            raise ValueError("negative input")
+        return items
+
+    async def scenario():
+        batcher = MicroBatcher(fail_on_negative, max_batch_size=2, max_wait=0.01)
+        results = await asyncio.gather(batcher.submit(-1), batcher.submit(2),
+                                       batcher.submit(3), return_exceptions=True)
+        await batcher.aclose()
+        return results
+
+    failed, also_failed, ok = asyncio.run(scenario())
+    assert isinstance(failed, ValueError) and isinstance(also_failed, ValueError)
+    assert ok == 3
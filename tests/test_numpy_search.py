@@ -0,0 +1,87 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.vector_dbs.numpy_search import quantize, blocked_top_k
+from src.vector_dbs.recall import exact_top_k, recall_at_k, sample_queries
+
+
+def _vectors(n=2000, d=64):
+    return np.random.default_rng(0).normal(size=(n, d)).astype(np.float32)
+
+def test_blocked_top_k_matches_brute_force():
+    vectors = _vectors()
+    queries = sample_queries(vectors, 20)
+    _, rows = blocked_top_k(vectors, queries, 10, block_size=300)
+
+    distances = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    expected = np.argsort(distances, axis=1)[:, :10]
+    assert (rows == expected).all()
+
+def test_quantized_recall():
+    vectors = _vectors()
+    queries = sample_queries(vectors, 50)
+    exact_rows = exact_top_k(vectors, queries, 10)
+
+    for dtype in ("float16", "int8"):
+        codes, scales = quantize(vectors, dtype)
+        _, rows = blocked_top_k(codes, queries, 10, scales=scales, block_size=512)
+        assert recall_at_k(exact_rows, rows) >= 0.9
+
+def test_similarity_scores_are_best_first():
+    vectors = _vectors(500)
+    scores, rows = blocked_top_k(vectors, vectors[:3], 5, distance_method="cosine")
+
+    assert (rows[:, 0] == np.arange(3)).all()
+    assert np.allclose(scores[:, 0], 1.0, atol=1e-5)
+    assert (np.diff(scores, axis=1) <= 0).all()
+
+def test_faiss_index_types_recall():
+    pytest.importorskip("faiss")
+    from src.vector_dbs.providers.faiss_db_provider import FaissDBProvider
+
+    # Clustered, like real embeddings; ANN indexes gain little on uniform noise
+    rng = np.random.default_rng(0)
+    centroids = rng.normal(size=(50, 64))
+    vectors = (centroids[rng.integers(0, 50, 4000)] + 0.3 * rng.normal(size=(4000, 64))).astype(np.float32)
+    queries = sample_queries(vectors, 50)
+    exact_rows = exact_top_k(vectors, queries, 10)
+
+    for index_type in ("flat", "ivf_flat", "hnsw"):
+        provider = FaissDBProvider(db_path=None, index_type=index_type, nprobe=32)
+        provider.create_collection("chunks", vectors.shape[1])
+        provider.insert_many("chunks", [""] * len(vectors), vectors)
+
+        _, rows = provider.search_rows("chunks", queries, 10)
+        assert provider.get_collection_info("chunks")["index_type"] == index_type
+        assert recall_at_k(exact_rows, rows) >= 0.9
+
+def test_faiss_saved_collection_accepts_inserts(tmp_path):
+    pytest.importorskip("faiss")
+    from src.vector_dbs.providers.faiss_db_provider import FaissDBProvider
+
+    rng = np.random.default_rng(0)
+    centroids = rng.normal(size=(50, 64))
+    vectors = (centroids[rng.integers(0, 50, 4000)] + 0.3 * rng.normal(size=(4000, 64))).astype(np.float32)
+    saved, added = vectors[:3000], vectors[3000:]
+
+    for index_type in ("flat", "ivf_flat", "ivf_pq", "hnsw"):
+        path = str(tmp_path / index_type)
+        # 6-bit codes, so 3000 vectors are enough to train the product quantizer
+        provider = FaissDBProvider(db_path=None, index_type=index_type, nprobe=32, pq_nbits=6)
+        provider.create_collection("chunks", saved.shape[1])
+        provider.insert_many("chunks", [str(i) for i in range(len(saved))], saved)
+        provider.save_collection("chunks", path)
+
+        # Loaded to build on, as incremental builds do
+        provider = FaissDBProvider(db_path=None, index_type=index_type, nprobe=32, pq_nbits=6)
+        provider.load_collection("chunks", path, writable=True)
+        provider.insert_many("chunks", [str(i) for i in range(len(saved), len(vectors))], added)
+
+        _, rows = provider.search_rows("chunks", added[:20], 1)
+        assert provider.get_collection_info("chunks")["index_type"] == index_type
+        assert (rows[:, 0] == np.arange(len(saved), len(saved) + 20)).mean() >= 0.9
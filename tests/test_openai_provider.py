@@ -0,0 +1,104 @@
+import sys
+import os
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# openai_provider imports `utils` the way the app does, from inside src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from src.llms.providers import openai_provider
+from src.llms.providers.openai_provider import OpenAIProvider, parse_retry_after, MAX_RETRY_DELAY
+
+
+class StubEmbeddings:
+    """Fails with a 429 carrying `retry_after` headers, then embeds each text as [len(text)]."""
+
+    def __init__(self, retry_after_headers):
+        self.retry_after_headers = list(retry_after_headers)
+        self.calls = 0
+
+    def create(self, model, input, dimensions):
+        self.calls += 1
+        if self.retry_after_headers:
+            request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+            response = httpx.Response(429, request=request,
+                                      headers={"retry-after": self.retry_after_headers.pop(0)})
+            raise RateLimitError("rate limited", response=response, body=None)
+
+        # Out of order, as the API may return them
+        data = [SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=data[::-1])
+
+
+class StubClient:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def with_options(self, **options):
+        return self
+
+
+def _provider(monkeypatch, retry_after_headers=(), **kwargs):
+    provider = OpenAIProvider(api_key="test", **kwargs)
+    provider.set_embedding_model("text-embedding-3-small", 1)
+    provider.client = StubClient(StubEmbeddings(retry_after_headers))
+    # One token per word, whether or not tiktoken can load its encodings here
+    monkeypatch.setattr(openai_provider, "count_tokens", lambda text, model_id=None: len(text.split()))
+    return provider
+
+
+def test_embedding_batches_respect_count_and_token_limits(monkeypatch):
+    provider = _provider(monkeypatch, embedding_batch_size=3, embedding_batch_max_tokens=5)
+    texts = ["a", "b", "c", "d", "e e e", "f f", "g g g g g g", "h"]
+
+    batches = provider._make_embedding_batches(texts)
+    assert batches == [[0, 1, 2], [3, 4], [5], [6], [7]]  # a text over the limit gets its own batch
+    assert [idx for batch in batches for idx in batch] == list(range(len(texts)))
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-3") == 0.0
+    in_ten_seconds = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), usegmt=True)
+    assert 8 <= parse_retry_after(in_ten_seconds) <= 10
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("nan") is None
+
+def test_embed_many_retries_on_any_retry_after(monkeypatch):
+    delays = []
+    monkeypatch.setattr(openai_provider.time, "sleep", delays.append)
+    in_an_hour = format_datetime(datetime.now(timezone.utc) + timedelta(hours=1), usegmt=True)
+    provider = _provider(monkeypatch, retry_after_headers=[in_an_hour, "soon", "0.5"],
+                         embedding_batch_size=2, embedding_max_concurrency=1)
+
+    embeddings = provider.embed_many(["a", "bb", "ccc"])
+
+    assert embeddings == [[1.0], [2.0], [3.0]]
+    assert provider.client.embeddings.calls == 5
+    assert delays[0] == MAX_RETRY_DELAY  # an HTTP date, capped
+    assert 0 < delays[1] <= MAX_RETRY_DELAY  # invalid, so jittered backoff
+    assert delays[2] == 0.5
+
+def test_embed_batch_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(openai_provider.time, "sleep", lambda seconds: None)
+    provider = _provider(monkeypatch, retry_after_headers=["1"] * 3, embedding_max_retries=2)
+
+    with pytest.raises(RateLimitError):
+        provider._embed_batch(["a"])
+
+def test_cached_embedding_is_not_shared_with_callers(monkeypatch):
+    provider = _provider(monkeypatch, embedding_cache_size=8)
+
+    first = provider.embed_text("a")
+    first.append(99.0)
+    second = provider.embed_text("a")
+    second[0] = -1.0
+
+    assert provider.embed_text("a") == [1.0]
+    assert provider.client.embeddings.calls == 1
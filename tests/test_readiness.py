@@ -0,0 +1,38 @@
+import sys
+import os
+import asyncio
+
+import pytest
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.readiness import ReadinessTracker
+
+
+def test_components_warm_up_concurrently_and_report_state():
+    async def load(seconds, fail=False):
+        await asyncio.sleep(seconds)
+        if fail:
+            raise RuntimeError("index missing")
+        return seconds
+
+    async def scenario():
+        tracker = ReadinessTracker(["model", "index", "templates"])
+        results = await asyncio.gather(
+            tracker.run("model", load, 0.05),
+            tracker.run("index", load, 0.05, True),
+            tracker.run_in_thread("templates", sum, [1, 2]),
+            return_exceptions=True,
+        )
+        return tracker, results
+
+    tracker, results = asyncio.run(scenario())
+    report = tracker.report()
+    components = report["components"]
+
+    assert results[0] == 0.05 and results[2] == 3
+    assert components["model"]["state"] == "ready"
+    assert components["index"]["state"] == "failed" and "index missing" in components["index"]["error"]
+    assert components["model"]["seconds"] == pytest.approx(0.05, abs=0.04)
+    assert report["ready"] is False
@@ -0,0 +1,55 @@
+import sys
+import os
+import asyncio
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    executions = []
+
+    async def embed(text):
+        executions.append(text)
+        await asyncio.sleep(0.01)
+        return [len(text)]
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("hello", embed, "hello") for _ in range(5)))
+        # Once completed, the next call runs again
+        results.append(await flight.do("hello", embed, "hello"))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert results == [[5]] * 6
+    assert executions == ["hello", "hello"]
+    assert flight.stats()["saved_calls"] == 4
+    assert len(flight) == 0
+
+
+def test_exceptions_reach_every_waiter_and_cancellation_is_isolated():
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("generation failed")
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def scenario():
+        flight = SingleFlight()
+        failures = await asyncio.gather(*(flight.do("q", failing) for _ in range(3)),
+                                        return_exceptions=True)
+
+        first = asyncio.ensure_future(flight.do("slow", slow))
+        second = asyncio.ensure_future(flight.do("slow", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        return failures, await second
+
+    failures, answer = asyncio.run(scenario())
+    assert all(isinstance(failure, RuntimeError) for failure in failures)
+    assert answer == "answer"
@@ -0,0 +1,80 @@
+import sys
+import os
+import asyncio
+import time
+
+import pytest
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.stage_graph import StageGraph
+
+
+def sleep_stage(seconds, value):
+    async def stage(run):
+        await asyncio.sleep(seconds)
+        return value
+    return stage
+
+
+def test_independent_stages_run_concurrently():
+    async def prompt(run):
+        return f"{await run.result('history')} + {await run.result('passages')} for {run.inputs['query']}"
+
+    graph = StageGraph() \
+        .add_stage("history", sleep_stage(0.05, "history")) \
+        .add_stage("embedding", sleep_stage(0.05, [0.1, 0.2])) \
+        .add_stage("passages", sleep_stage(0.05, "passages"), depends_on=("embedding",)) \
+        .add_stage("prompt", prompt, depends_on=("history", "passages"))
+
+    async def scenario():
+        async with graph.start(query="q") as run:
+            return await run.result("prompt")
+
+    start = time.perf_counter()
+    result = asyncio.run(scenario())
+    elapsed = time.perf_counter() - start
+
+    assert result == "history + passages for q"
+    # embedding -> passages is the critical path; history overlaps with it
+    assert elapsed == pytest.approx(0.1, abs=0.04)
+
+
+def test_unneeded_stages_are_cancelled_and_failures_propagate():
+    cancelled = []
+
+    async def slow_retrieval(run):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append("passages")
+            raise
+
+    async def failing(run):
+        raise RuntimeError("index unavailable")
+
+    graph = StageGraph() \
+        .add_stage("cached", sleep_stage(0.01, "cached answer")) \
+        .add_stage("passages", slow_retrieval) \
+        .add_stage("broken", failing) \
+        .add_stage("after_broken", sleep_stage(0, "never"), depends_on=("broken",))
+
+    async def scenario():
+        async with graph.start() as run:
+            cached = await run.result("cached")
+            with pytest.raises(RuntimeError):
+                await run.result("after_broken")
+        return cached
+
+    assert asyncio.run(scenario()) == "cached answer"
+    assert cancelled == ["passages"]
+
+
+def test_stages_depend_on_earlier_stages_only():
+    graph = StageGraph().add_stage("passages", sleep_stage(0, []))
+
+    with pytest.raises(ValueError):
+        graph.add_stage("prompt", sleep_stage(0, ""), depends_on=("rerank",))
+    with pytest.raises(ValueError):
+        graph.replace_stage("passages", sleep_stage(0, []), depends_on=("passages",))
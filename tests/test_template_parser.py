@@ -0,0 +1,32 @@
+import sys
+import os
+from string import Template
+
+# Add the src directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.llms.templates.template_parser import CompiledTemplate, TemplateParser
+
+
+def test_compiled_template_matches_string_template():
+    template = Template("Price: $$${amount} for $item, ${item}s\n")
+    values = {"amount": 10, "item": "book"}
+    assert CompiledTemplate(template).substitute(values) == template.substitute(values)
+
+def test_rag_prompt_renders_in_one_call():
+    parser = TemplateParser(language="en")
+    prompt = parser.render_rag_prompt(["first passage", "second passage"], "What is X?")
+
+    expected = "\n\n".join([
+        "\n".join(parser.get("rag", "document_prompt", {"doc_num": i + 1, "chunk_text": text})
+                  for i, text in enumerate(["first passage", "second passage"])),
+        parser.get("rag", "footer_prompt", {"query": "What is X?"}),
+    ])
+    assert prompt == expected
+    assert "## Document No: 2" in prompt
+
+def test_unknown_language_falls_back_to_default():
+    parser = TemplateParser(language="fr", default_language="en")
+    assert parser.language == "en"
+    assert parser.get("rag", "system_prompt")
+    assert parser.get("rag", "missing_prompt") is None